@@ -1,21 +1,28 @@
-from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTextEdit, QPushButton, QSizePolicy, QLineEdit
-from PyQt5.QtCore import Qt, QSettings, pyqtSignal, QTimer, QThread, QObject, QUrl
-from PyQt5.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply
+from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTextEdit, QPushButton, QSizePolicy, QLineEdit, QComboBox
+from PyQt5.QtCore import Qt, QSettings, pyqtSignal, QTimer, QThread, QObject
 from PyQt5 import QtCore
 import sys
 import os
 import time
 import numpy as np
 import imageio
-from scipy.optimize import curve_fit
-import PySpin
 from PIL import Image  # Only used for resizing if needed
-from urllib.parse import urlencode
 
 from motor import MotorSettings
+from motor_client import MotorClient, TelemetryClient, MOTOR_TRANSPORTS
 from cam import Controls
 from dpad import DPad
 from visuals import ImagePlotWidget
+from acquisition import AcquisitionWorker
+from correction import FrameCorrector
+from guiding import Guider, GuideStarSelector
+from calibration import StepCalibration, CalibrationRun
+from prediction import create_predictor
+from guide_controls import GuideSettings
+from star_measure import brightest_star, measure_stars
+from star_detect import StarDetector
+from trajectory import TrajectoryStore, GUIDE_STAR, ZOOM_REGION
+from camera_backend import create_backend, PySpin
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -26,36 +33,107 @@ class MainWindow(QMainWindow):
         self.stdout_stream = Stream(newText=self.onUpdateText)
         sys.stdout = self.stdout_stream
         self.settings = QSettings("Auranox", "Mothpy")  # Unique organization/app name
-        self.trajectory = np.zeros((3,10000))
-        self.tracked_points = 0
+        self.trajectory = None  # TrajectoryStore, created on the first recorded position
+        self.trajectory_directory = "trajectories"
+        self.motor_position = [0, 0]  # Commanded steps since start (Alt, Azi), forward positive
         
-        # Setup continuous capture timer
-        self.capture_timer = QTimer()
-        self.capture_timer.timeout.connect(self.capture_single_frame)
+        # Camera acquisition runs in its own thread (created in connect_camera)
+        self.acquisition_worker = None
+        self.camera = None  # camera_backend.CameraBackend
         self.is_capturing = False
         
-        # Setup tracking timer
-        self.tracking_timer = QTimer()
-        self.tracking_timer.timeout.connect(self.perform_tracking_update)
+        # Closed-loop guiding, run on every displayed frame while tracking
+        self.guider = Guider()
         self.is_tracking = False
-        self.tracking_interval = 6000  # 6 seconds in milliseconds
-        
-        # Initialize Qt Network Manager for async HTTP requests (no threads!)
-        self.network_manager = QNetworkAccessManager(self)
-        self.network_manager.setTransferTimeout(5000)  # 5 second timeout (for motor movements)
-        self.pending_requests = []  # Track pending network requests
-        self.max_concurrent_requests = 5  # Limit concurrent requests
-        self.is_closing = False  # Flag to prevent new requests during shutdown
+        self.guide_summary_interval = 10.0  # Seconds between RMS summaries in the log
+        self.guide_summary_at = 0.0
+        self.tracking_status = None  # Last star search message, printed only when it changes
+        self.star_box = 31  # Measurement stamp size in pixels
+        self.min_star_snr = 5.0
+        self.min_star_fwhm = 1.0  # Narrower detections are hot pixels or noise
+        self.star_detector = StarDetector()  # Run on every frame by the acquisition worker while tracking
+        self.guide_star = GuideStarSelector()
+        self.guide_star_box = 15  # Stamp size for the guide star fit
+        self.calibration = None  # StepCalibration from the last calibration run (kept in QSettings)
+        self.guide_calibration = None  # Pixel -> step conversion in use while tracking
+        self.calibration_run = None  # CalibrationRun in progress
+        self.calibration_star = GuideStarSelector(search_radius=100, lost_limit=30)  # Jogs move the star far
+        self.calibration_failures = 0  # Consecutive usable frames without the calibration star
+        self.prediction = "Off"  # Predictor currently set on the guider
+
+        # Feed-forward: follow the predicted target motion between frames
+        self.feed_forward_timer = QTimer()
+        self.feed_forward_timer.timeout.connect(self.feed_forward_update)
+        self.feed_forward_interval = 250  # ms
+        self.feed_forward_residual = [0.0, 0.0]  # Fractional steps not sent yet
+        
+        # Motor commands are queued, merged per axis and sent as one batch request at a time (no threads!)
+        self.motor_client = MotorClient(self.get_esp32_url, parent=self)
+        # Mount position pushed by the ESP32; read from the cache, never requested
+        self.telemetry = TelemetryClient(self.get_esp32_url, parent=self)
+        self.motor_client.mount_state = self.telemetry.state
+        self.mount_label_timer = QTimer()
+        self.mount_label_timer.timeout.connect(self.update_mount_label)
+
+        # Jog mode: held arrow keys run the motors until released (the ESP32 needs a renewal every 0.5 s)
+        self.held_keys = set()
+        self.jog_rates = (0, 0)  # Last sent (Alt, Azi) steps/s
+        self.jog_keepalive_timer = QTimer()
+        self.jog_keepalive_timer.setInterval(200)
+        self.jog_keepalive_timer.timeout.connect(self.jog_keepalive)
+
+        # Long exposure progress, driven from the start time the worker reports
+        self.exposure_started_at = None  # time.perf_counter() at the trigger
+        self.exposure_seconds = 0.0
+        self.exposure_timer = QTimer()
+        self.exposure_timer.setInterval(100)
+        self.exposure_timer.timeout.connect(self.update_exposure_progress)
         
         # Hotspot calibration
         self.hotspot_mask = None  # Will store the hot pixel values to subtract
-        self.calibration_frames = []  # Buffer for collecting calibration frames
+        self.calibration_sum = None  # Running sum of calibration frames (allocated once per calibration)
+        self.calibration_count = 0  # Number of frames in calibration_sum
         self.is_calibrating = False  # Flag for calibration mode
+
+        # Dark subtraction, colour gains and grayscale conversion in one pass,
+        # into a preallocated buffer (the raw pool frame is left untouched)
+        self.corrector = FrameCorrector()
+        self.corrected_image = None
+        self.dark_roi = None  # Camera window the corrector's dark frame was cropped for
+
+        # Guide window: the camera streams only the area around ROI1
+        self.full_frame_size = None  # (width, height) of the last full sensor frame
+        self.guide_window_margin = 2.0  # Window size relative to ROI1, so the star has room to move
+        self.displayed_roi = None  # Camera window of the image on screen
+
+        # Pool buffer currently on screen (imgplot.image_data is a view of it).
+        # Retained until the next frame replaces it.
+        self.displayed_frame = None
+
+        # Display pacing: every frame is corrected and guided on, but the image
+        # is only redrawn at the display rate, or slower if drawing takes long
+        self.display_fps = 20.0
+        self.render_load = 0.5  # Largest share of the GUI thread drawing may use
+        self.render_time = 0.0  # Smoothed time to draw one frame, seconds
+        self.last_render = 0.0
+        self.rendered_shape = None
+        self.render_timer = QTimer()
+        self.render_timer.setSingleShot(True)  # Draws the newest frame once its turn comes
+        self.render_timer.timeout.connect(self.render_image)
+        self.frames_received = 0
+        self.frames_rendered = 0
+        self.process_time = 0.0  # Smoothed time to process one frame, seconds
+        self.pacing_counts = (0, 0, time.perf_counter())  # Received, rendered and time at the last status update
+        self.pacing_timer = QTimer()
+        self.pacing_timer.timeout.connect(self.update_pacing_status)
         self.dark_frame_path = "dark_frame.npy"  # Path to save/load dark frame
         
         self.initUI()
         self.loadSettings()
         self.update_settings()
+        self.telemetry.start()
+        self.mount_label_timer.start(100)
+        self.pacing_timer.start(1000)
         self.load_dark_frame()  # Load dark frame if available
         self.connect_camera()
 
@@ -75,6 +153,12 @@ class MainWindow(QMainWindow):
         # Add ESP32 IP address field
         self.esp32_ip_edit = QLineEdit("192.168.1.100")  # Default IP
         self.esp32_ip_edit.setPlaceholderText("ESP32 IP Address")
+        # Motor command transport and a round-trip measurement to compare them
+        self.esp32_transport_combobox = QComboBox()
+        self.esp32_transport_combobox.addItems(MOTOR_TRANSPORTS)
+        self.esp32_transport_combobox.currentTextChanged.connect(self.set_motor_transport)
+        self.esp32_ping_button = QPushButton("Ping")
+        self.esp32_ping_button.clicked.connect(lambda: self.motor_client.measure_latency())
         self.dpad = DPad()
         self.motor1 = MotorSettings("Alt", self)
         self.motor1.setFixedWidth(300)
@@ -82,6 +166,8 @@ class MainWindow(QMainWindow):
         self.motor2.setFixedWidth(300)
         self.motor3 = MotorSettings("Focus", self)
         self.motor3.setFixedWidth(300)
+        self.guide_settings = GuideSettings("Guiding", self)
+        self.guide_settings.setFixedWidth(300)
         self.camera_controls = Controls()
         self.camera_controls.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
         self.imgplot = ImagePlotWidget()
@@ -96,6 +182,10 @@ class MainWindow(QMainWindow):
         esp32_ip_layout = QHBoxLayout()
         esp32_ip_layout.addWidget(QLabel("ESP32 IP:"))
         esp32_ip_layout.addWidget(self.esp32_ip_edit)
+        esp32_ip_layout.addWidget(self.esp32_transport_combobox)
+        esp32_ip_layout.addWidget(self.esp32_ping_button)
+        self.mount_label = QLabel("No telemetry")
+        self.mount_label.setStyleSheet("color: #888888; font-size: 10px;")
         
         # Arrow key hint label
         self.arrow_key_hint = QLabel("⌨️ Arrow Keys: ↑↓ = Alt | ←→ = Azi | [ ] = Steps")
@@ -105,11 +195,13 @@ class MainWindow(QMainWindow):
         # Create controls layout with fixed width
         controols = QVBoxLayout()
         controols.addLayout(esp32_ip_layout)
+        controols.addWidget(self.mount_label)
         controols.addWidget(self.arrow_key_hint)
         controols.addWidget(self.dpad)
         controols.addWidget(self.motor1)
         controols.addWidget(self.motor2)
         controols.addWidget(self.motor3)
+        controols.addWidget(self.guide_settings)
         controols.addWidget(self.camera_controls)
         controols.setAlignment(Qt.AlignTop)
         
@@ -129,6 +221,10 @@ class MainWindow(QMainWindow):
 
         central_widget.setLayout(self.main_layout)
         self.setCentralWidget(central_widget)
+
+        # Frame rates and drops, refreshed every second
+        self.pacing_label = QLabel("Camera not connected")
+        self.statusBar().addPermanentWidget(self.pacing_label)
         self.setWindowTitle("PyQt5 Main Window with SimpleWidgets")
 
         self.dpad.up_button.clicked.connect(self.up_clicked)
@@ -138,13 +234,25 @@ class MainWindow(QMainWindow):
         self.dpad.near_button.clicked.connect(self.near_clicked)
         self.dpad.far_button.clicked.connect(self.far_clicked)
         self.dpad.track_button.clicked.connect(self.track_clicked)
+        self.dpad.calibrate_button.clicked.connect(self.calibrate_clicked)
         self.camera_controls.connect_camera.clicked.connect(self.connect_camera)
         self.camera_controls.rm_hotspots_button.clicked.connect(self.calibrate_hotspots)
         self.camera_controls.capture_button.clicked.connect(self.capture_image)
+        self.camera_controls.cancel_exposure_button.clicked.connect(self.cancel_exposure)
         self.camera_controls.capture_mode_combobox.currentIndexChanged.connect(self.on_capture_mode_changed)
+        self.camera_controls.exposure_edit.editingFinished.connect(self.push_capture_parameters)
+        self.camera_controls.gain_edit.editingFinished.connect(self.push_capture_parameters)
+        self.camera_controls.display_fps_edit.editingFinished.connect(self.update_display_fps)
+        self.camera_controls.color_mode_combobox.currentIndexChanged.connect(self.push_capture_parameters)
         self.camera_controls.red_slider.valueChanged.connect(self.update_color_correction)
         self.camera_controls.green_slider.valueChanged.connect(self.update_color_correction)
         self.camera_controls.blue_slider.valueChanged.connect(self.update_color_correction)
+        self.camera_controls.guide_window_button.toggled.connect(self.set_guide_window)
+        self.camera_controls.binning_combobox.currentIndexChanged.connect(self.update_guide_window)
+        self.imgplot.ROI1.sigRegionChangeFinished.connect(self.update_guide_window)
+        for line_edit in self.guide_settings.fields.values():
+            line_edit.editingFinished.connect(self.apply_guide_settings)
+        self.guide_settings.prediction_combobox.currentIndexChanged.connect(self.apply_guide_settings)
         
 
     def set_dark_theme(self):
@@ -212,6 +320,13 @@ class MainWindow(QMainWindow):
     def keyPressEvent(self, event):
         """Handle arrow key presses for motor control and bracket keys for step adjustment"""
         key = event.key()
+
+        # With a jog speed set, arrow keys run the motors until released
+        if key in self.jog_keys and self.jog_rate() is not None:
+            if not event.isAutoRepeat():
+                self.held_keys.add(key)
+                self.update_jog()
+            return
         
         # Arrow Up = Motor 1 (Alt) Forward
         if key == Qt.Key_Up:
@@ -235,6 +350,52 @@ class MainWindow(QMainWindow):
             # Pass other keys to parent handler
             super().keyPressEvent(event)
     
+    # Arrow key -> (motor, sign) while jogging, the same directions as the D-pad
+    jog_keys = {Qt.Key_Up: (1, -1), Qt.Key_Down: (1, 1), Qt.Key_Left: (2, 1), Qt.Key_Right: (2, -1)}
+
+    def keyReleaseEvent(self, event):
+        """End the jog of a released arrow key (autorepeat releases are ignored)"""
+        if event.key() in self.held_keys and not event.isAutoRepeat():
+            self.held_keys.discard(event.key())
+            self.update_jog()
+            return
+        super().keyReleaseEvent(event)
+
+    def jog_rate(self):
+        """Jog speed from the D-pad field in steps/s, or None for step moves"""
+        try:
+            rate = int(self.dpad.jog_lineedit.text())
+        except ValueError:
+            return None
+        return rate if rate > 0 else None
+
+    def update_jog(self):
+        """Send the jog rates for the held keys: one message per change, renewed while held"""
+        rate = self.jog_rate() or 0
+        rates = [0, 0]
+        for key in self.held_keys:
+            motor, sign = self.jog_keys[key]
+            rates[motor - 1] += sign * rate
+        rates = tuple(rates)
+        if rates == self.jog_rates:
+            return
+        self.jog_rates = rates
+        self.motor_client.jog(*rates)
+        if any(rates):
+            print(f"Jogging Alt {rates[0]}, Azi {rates[1]} steps/s")
+            self.jog_keepalive_timer.start()
+        else:
+            print("Jog stopped")
+            self.jog_keepalive_timer.stop()
+
+    def jog_keepalive(self):
+        """Timer: renew the jog; stop it if the window lost focus (no key release arrives then)"""
+        if not self.isActiveWindow():
+            self.held_keys.clear()
+            self.update_jog()
+            return
+        self.motor_client.jog(*self.jog_rates)
+
     def adjust_step_size(self, delta):
         """Adjust step size for all motors by delta amount"""
         # Get current step value from U/D field
@@ -256,9 +417,6 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         """ Triggered when the window is closed, used to save settings. """
-        # Set closing flag to prevent new requests
-        self.is_closing = True
-        
         sys.stdout = self.original_stdout
         self.stdout_stream.newText.disconnect()  
         self.saveSettings()
@@ -270,15 +428,20 @@ class MainWindow(QMainWindow):
         # Stop tracking if running
         if hasattr(self, 'is_tracking') and self.is_tracking:
             self.is_tracking = False
-            self.tracking_timer.stop()
-        
-        # Abort all pending network requests
-        if hasattr(self, 'pending_requests'):
-            for reply in self.pending_requests[:]:
-                if reply and not reply.isFinished():
-                    reply.abort()
-            self.pending_requests.clear()
-            print(f"Aborted all pending network requests")
+            self.guider.stop()
+            self.feed_forward_timer.stop()
+        if self.trajectory is not None:
+            self.trajectory.close()
+        
+        # Abort queued and pending motor commands
+        if any(self.jog_rates):
+            self.jog_keepalive_timer.stop()  # The ESP32 stops the jog within 0.5 s
+        print(f"ESP32: {self.motor_client.summary()}")
+        self.motor_client.abort()
+        self.mount_label_timer.stop()
+        self.pacing_timer.stop()
+        self.render_timer.stop()
+        self.telemetry.stop()
         
         self.disconnec_camera()
         event.accept()
@@ -288,6 +451,7 @@ class MainWindow(QMainWindow):
         self.settings.setValue("ud_text", self.dpad.ud_lineedit.text())
         self.settings.setValue("lr_text", self.dpad.lr_lineedit.text())
         self.settings.setValue("nf_text", self.dpad.nf_lineedit.text())
+        self.settings.setValue("jog_text", self.dpad.jog_lineedit.text())
 
         self.settings.setValue("m1_visibility", self.motor1.toggle_button.isChecked())
         self.settings.setValue("m1_res", self.motor1.fields["Resolution"].text())
@@ -307,12 +471,27 @@ class MainWindow(QMainWindow):
         self.settings.setValue("m3_acc", self.motor3.fields["Acceleration"].text())
         self.settings.setValue("m3_back", self.motor3.fields["Backlash"].text())
 
+        self.settings.setValue("guide_visibility", self.guide_settings.toggle_button.isChecked())
+        self.settings.setValue("guide_kp", self.guide_settings.fields["Kp"].text())
+        self.settings.setValue("guide_ki", self.guide_settings.fields["Ki"].text())
+        self.settings.setValue("guide_kd", self.guide_settings.fields["Kd"].text())
+        self.settings.setValue("guide_dead_band", self.guide_settings.fields["Dead-band (px)"].text())
+        self.settings.setValue("guide_aggression", self.guide_settings.fields["Aggression"].text())
+        self.settings.setValue("guide_settle", self.guide_settings.fields["Settle (s)"].text())
+        self.settings.setValue("guide_prediction", self.guide_settings.prediction_combobox.currentText())
+        if self.calibration is not None:
+            self.settings.setValue("sensor_calibration", self.calibration.to_text())
+            self.settings.remove("guide_calibration")
+
         self.settings.setValue("exposure", self.camera_controls.exposure_edit.text())
         self.settings.setValue("gain", self.camera_controls.gain_edit.text())
+        self.settings.setValue("display_fps", self.camera_controls.display_fps_edit.text())
         self.settings.setValue("mode", self.camera_controls.color_mode_combobox.currentIndex())
+        self.settings.setValue("camera_backend", self.camera_controls.backend_combobox.currentText())
         
         # Save ESP32 IP address
         self.settings.setValue("esp32_ip", self.esp32_ip_edit.text())
+        self.settings.setValue("esp32_transport", self.esp32_transport_combobox.currentText())
         self.settings.sync()  # Force settings to be written to disk
 
     def loadSettings(self):
@@ -321,6 +500,7 @@ class MainWindow(QMainWindow):
             self.dpad.ud_lineedit.setText(self.settings.value("ud_text", ""))
             self.dpad.lr_lineedit.setText(self.settings.value("lr_text", ""))
             self.dpad.nf_lineedit.setText(self.settings.value("nf_text", ""))
+            self.dpad.jog_lineedit.setText(self.settings.value("jog_text", ""))
 
 
             val = self.settings.value("m1_visibility", True)
@@ -344,17 +524,45 @@ class MainWindow(QMainWindow):
             self.motor3.fields["Acceleration"].setText(self.settings.value("m3_acc", ""))
             self.motor3.fields["Backlash"].setText(self.settings.value("m3_back", ""))
 
+            val = self.settings.value("guide_visibility", False)
+            self.guide_settings.toggle_button.setChecked(val.lower()=="true" if isinstance(val,str) else val)
+            defaults = self.guide_settings.defaults
+            self.guide_settings.fields["Kp"].setText(self.settings.value("guide_kp", defaults["Kp"]))
+            self.guide_settings.fields["Ki"].setText(self.settings.value("guide_ki", defaults["Ki"]))
+            self.guide_settings.fields["Kd"].setText(self.settings.value("guide_kd", defaults["Kd"]))
+            self.guide_settings.fields["Dead-band (px)"].setText(self.settings.value("guide_dead_band", defaults["Dead-band (px)"]))
+            self.guide_settings.fields["Aggression"].setText(self.settings.value("guide_aggression", defaults["Aggression"]))
+            self.guide_settings.fields["Settle (s)"].setText(self.settings.value("guide_settle", defaults["Settle (s)"]))
+            self.guide_settings.prediction_combobox.setCurrentText(self.settings.value("guide_prediction", "Off"))
+            calibration = self.settings.value("sensor_calibration", "")
+            legacy_calibration = self.settings.value("guide_calibration", "")
+            if calibration:
+                self.calibration = StepCalibration.from_text(calibration)
+            elif legacy_calibration:
+                self.calibration = StepCalibration.from_display_text(legacy_calibration)
+            if self.calibration is not None:
+                print(f"Guiding calibration: {self.calibration.describe()}")
+
             self.camera_controls.exposure_edit.setText(self.settings.value("exposure", ""))
             self.camera_controls.gain_edit.setText(self.settings.value("gain", ""))
+            self.camera_controls.display_fps_edit.setText(self.settings.value("display_fps", "20"))
+            self.update_display_fps()
             
             # Load color mode (default to 0 = Color)
             color_mode_index = self.settings.value("mode", 0)
             if isinstance(color_mode_index, str):
                 color_mode_index = int(color_mode_index) if color_mode_index.isdigit() else 0
             self.camera_controls.color_mode_combobox.setCurrentIndex(color_mode_index)
+
+            # Without the Spinnaker SDK only the simulator can be used
+            default_backend = "FLIR" if PySpin is not None else "Simulator"
+            self.camera_controls.backend_combobox.setCurrentText(self.settings.value("camera_backend", default_backend))
+            if PySpin is None:
+                self.camera_controls.backend_combobox.setCurrentText("Simulator")
             
             # Load ESP32 IP address
             self.esp32_ip_edit.setText(self.settings.value("esp32_ip", "192.168.1.100"))
+            self.esp32_transport_combobox.setCurrentText(self.settings.value("esp32_transport", "HTTP"))
         except Exception as e:
             print(f"Error loading settings: {e}")
 
@@ -371,62 +579,29 @@ class MainWindow(QMainWindow):
         """Get the base URL for ESP32 from the IP address field"""
         esp32_ip = self.esp32_ip_edit.text()
         return f"http://{esp32_ip}"
-    
-    def send_http_request(self, endpoint, params=None, callback=None):
-        """Send async HTTP request using Qt's network manager (no threads!)"""
-        # Don't start new requests if we're closing
-        if self.is_closing:
-            return
-        
-        # Check if we've hit the concurrent request limit
-        active_requests = sum(1 for r in self.pending_requests if r and not r.isFinished())
-        if active_requests >= self.max_concurrent_requests:
-            print(f"Warning: Maximum concurrent HTTP requests ({self.max_concurrent_requests}) reached. Skipping request.")
-            return
-        
-        # Build URL with parameters
-        url = f"{self.get_esp32_url()}{endpoint}"
-        if params:
-            url += "?" + urlencode(params)
-        
-        # Create and send request
-        request = QNetworkRequest(QUrl(url))
-        reply = self.network_manager.get(request)
-        
-        # Store reply to track it
-        self.pending_requests.append(reply)
-        
-        # Connect completion signal
-        reply.finished.connect(lambda: self.on_request_finished(reply, callback))
-        
-    def on_request_finished(self, reply, callback=None):
-        """Handle completed network request"""
-        # Remove from pending list
-        if reply in self.pending_requests:
-            self.pending_requests.remove(reply)
-        
-        # Don't process if we're closing
-        if self.is_closing:
-            reply.deleteLater()
+
+    def update_mount_label(self):
+        """Timer: show the cached mount position"""
+        mount = self.telemetry.state
+        text = mount.describe()
+        if mount.lost:
+            text += f", {mount.lost} telemetry packets lost"
+        self.mount_label.setText(text)
+
+    def set_motor_transport(self, name):
+        """Replace the motor client with one for the selected transport"""
+        if name not in MOTOR_TRANSPORTS or self.motor_client.name == name:
             return
-        
-        # Check for errors
-        if reply.error() == QNetworkReply.NoError:
-            # Success
-            result = reply.readAll().data().decode('utf-8')
-            if callback:
-                callback(result)
-        else:
-            # Error
-            error_string = reply.errorString()
-            print(f"ESP32 Error: {error_string}")
-            print("Make sure the ESP32 is on the network and the IP is correct.")
-        
-        # Clean up
-        reply.deleteLater()
-            
+        print(f"ESP32: {self.motor_client.summary()}")
+        # Pending moves fail, so the guider does not wait for them
+        self.motor_client.abort(notify=True)
+        self.motor_client.deleteLater()
+        self.motor_client = MOTOR_TRANSPORTS[name](self.get_esp32_url, parent=self)
+        self.motor_client.mount_state = self.telemetry.state
+        print(f"ESP32 motor commands over {name}")
+    
     def send_motor_settings_to_esp32(self):
-        """Send motor settings to ESP32 via HTTP (call when settings change)"""
+        """Queue the motor settings for the ESP32 (call when settings change); they go out in one request"""
         # Motor 1 = Alt (altitude), Motor 2 = Azi (azimuth)
         motors_to_send = [
             (1, self.motor1),  # Motor 1 = Alt
@@ -434,65 +609,49 @@ class MainWindow(QMainWindow):
         ]
         
         for motor_num, motor in motors_to_send:
-            # Send resolution
             if motor.res:
-                self.send_http_request("/set_resolution", {
-                    "motor": motor_num,
-                    "res": motor.res,
-                    "unit": "degrees"
-                })
-            
-            # Send velocity
+                self.motor_client.setting("set_resolution", motor_num, motor.res)
             if motor.velo:
-                self.send_http_request("/set_velocity", {
-                    "motor": motor_num,
-                    "velocity": motor.velo
-                })
-            
-            # Send acceleration
+                self.motor_client.setting("set_velocity", motor_num, motor.velo)
             if motor.acc:
-                self.send_http_request("/set_acceleration", {
-                    "motor": motor_num,
-                    "accel": motor.acc
-                })
-            
-            # Send backlash
+                self.motor_client.setting("set_acceleration", motor_num, motor.acc)
             if motor.bac:
-                self.send_http_request("/set_backlash", {
-                    "motor": motor_num,
-                    "backlsh": motor.bac
-                })
-            
-            time.sleep(0.05)  # Small delay between requests
+                self.motor_client.setting("set_backlash", motor_num, motor.bac)
         
-        print("Motor settings sent to ESP32")
+        print("Motor settings queued for ESP32")
+
+    def jog(self, motor, steps_text, sign):
+        """Queue a D-pad move of motor by the steps in a step field; sign +1 = forward"""
+        try:
+            steps = int(steps_text)
+        except ValueError:
+            print(f"Invalid step count: {steps_text}")
+            return
+        self.motor_client.move(motor, sign * steps)
+        self.count_motor_move(motor, "F" if sign > 0 else "B", steps)
 
     def up_clicked(self):
         """Move Motor 1 (Alt) Backward (reversed for inverted mount)"""
         steps = self.dpad.ud_lineedit.text()
-        command = f"move:1,B,{steps}"
-        self.send_http_request("/command", {"cmd": command})
+        self.jog(1, steps, -1)
         print(f"Moving Alt up: {steps} steps")
 
     def down_clicked(self):
         """Move Motor 1 (Alt) Forward (reversed for inverted mount)"""
         steps = self.dpad.ud_lineedit.text()
-        command = f"move:1,F,{steps}"
-        self.send_http_request("/command", {"cmd": command})
+        self.jog(1, steps, 1)
         print(f"Moving Alt down: {steps} steps")
 
     def left_clicked(self):
         """Move Motor 2 (Azi) Forward"""
         steps = self.dpad.lr_lineedit.text()
-        command = f"move:2,F,{steps}"
-        self.send_http_request("/command", {"cmd": command})
+        self.jog(2, steps, 1)
         print(f"Moving Azi left: {steps} steps")
 
     def right_clicked(self):
         """Move Motor 2 (Azi) Backward"""
         steps = self.dpad.lr_lineedit.text()
-        command = f"move:2,B,{steps}"
-        self.send_http_request("/command", {"cmd": command})
+        self.jog(2, steps, -1)
         print(f"Moving Azi right: {steps} steps")
 
     def near_clicked(self):
@@ -508,14 +667,34 @@ class MainWindow(QMainWindow):
     def track_clicked(self):
         """Toggle star tracking on/off"""
         if self.dpad.track_button.isChecked():
+            if self.calibration_run is not None:
+                print("Calibration in progress; tracking not started")
+                self.dpad.track_button.setChecked(False)
+                self.dpad.toggle_track_button()
+                return
             # Start tracking
+            self.apply_guide_settings()
+            self.guider.start(time.strftime("guide_log_%Y%m%d_%H%M%S.csv"))
+            self.guide_summary_at = time.perf_counter() + self.guide_summary_interval
+            self.tracking_status = None
+            self.guide_calibration = self.calibration
+            self.feed_forward_residual = [0.0, 0.0]
+            self.feed_forward_timer.start(self.feed_forward_interval)
+            self.guide_star.reset()
+            self.imgplot.trajectory_plot.clear_data()
+            if self.acquisition_worker is not None:
+                self.acquisition_worker.set_detector(self.star_detector)
             self.is_tracking = True
             print("=" * 60)
             print("STAR TRACKING STARTED")
-            print(f"Update interval: {self.tracking_interval/1000} seconds")
+            print(f"Guiding on every frame, prediction: {self.prediction}")
             print(f"Max U/D steps: {self.dpad.ud_lineedit.text()}")
             print(f"Max L/R steps: {self.dpad.lr_lineedit.text()}")
-            print("Monitoring left ROI for bright spot...")
+            if self.calibration is not None:
+                print(f"Calibration: {self.calibration.describe()}")
+            else:
+                print("Not calibrated: pixel errors are scaled to steps by the ROI size")
+            print("Detecting stars in every frame; guide star picked automatically (ROI1 preferred)")
             print("=" * 60)
             
             # Ensure continuous capture is running for tracking
@@ -523,24 +702,190 @@ class MainWindow(QMainWindow):
                 print("Starting continuous capture for tracking...")
                 self.camera_controls.capture_mode_combobox.setCurrentText("Continuous")
                 self.start_continuous_capture()
-            
-            # Perform first tracking update immediately
-            self.perform_tracking_update()
-            
-            # Start timer for subsequent updates
-            self.tracking_timer.start(self.tracking_interval)
         else:
             # Stop tracking
             self.is_tracking = False
-            self.tracking_timer.stop()
+            self.guider.stop()
+            self.feed_forward_timer.stop()
+            if self.acquisition_worker is not None:
+                self.acquisition_worker.set_detector(None)
             # Hide the crosshair
             self.imgplot.update_star_crosshair(0, 0, visible=False)
             print("=" * 60)
             print("STAR TRACKING STOPPED")
+            print(f"Guiding: {self.guider.summary()}")
             print("=" * 60)
+
+    def apply_guide_settings(self):
+        """Push the guiding controller settings from the UI into the guider"""
+        values = self.guide_settings.values()
+        self.guider.configure(kp=values["Kp"], ki=values["Ki"], kd=values["Kd"],
+                              dead_band=values["Dead-band (px)"], aggression=values["Aggression"],
+                              settle_time=values["Settle (s)"])
+        prediction = self.guide_settings.prediction_combobox.currentText()
+        if prediction != self.prediction:
+            self.prediction = prediction
+            self.guider.set_predictor(create_predictor(prediction))
+            self.feed_forward_residual = [0.0, 0.0]
+            if self.is_tracking:
+                print(f"Guiding prediction: {prediction}")
+
+    def exposure_start(self, info):
+        """perf_counter time at which the frame's exposure started"""
+        if info.get('mode') != "Continuous":
+            return info['triggered_at']
+        # Free-running frames: the exposure ended at most a readout before arrival
+        return info['received_at'] - info.get('exposure_time', 0) / 1e6
+    
+    def find_star(self):
+        """
+        Locate the star in ROI1 of the displayed image. Returns
+        (offset_x, offset_y, roi_width, roi_height, star) with the offsets
+        relative to the ROI centre and sizes in display (full-frame) pixels
+        and star the star_measure record, or None if no star was found.
+        """
+        image_data = self.imgplot.image_data
+        
+        # Use getArraySlice to properly extract the ROI region
+        roi_slice, roi_transform = self.imgplot.ROI1.getArraySlice(image_data, self.imgplot.image_item)
+        
+        if roi_slice is None:
+            self.report_tracking("outside", "ROI is outside image bounds")
+            return None
+        
+        # Extract the ROI data
+        roi_img = image_data[roi_slice]
+        
+        if roi_img.size == 0:
+            self.report_tracking("outside", "ROI is outside image bounds")
+            return None
+        
+        # Convert to grayscale if image is in color
+        if len(roi_img.shape) == 3:
+            gray = np.dot(roi_img[..., :3], [0.114, 0.587, 0.299])  # BGR to grayscale
+        else:
+            gray = roi_img
+        
+        # Sub-pixel centroid, FWHM and SNR of the brightest star (moments refined by a Gaussian fit)
+        star = brightest_star(gray, box=self.star_box, fit=True)
+        
+        if star['snr'] < self.min_star_snr:
+            self.report_tracking("no_star", f"  No star found in ROI (SNR {star['snr']:.1f} < {self.min_star_snr})")
+            return None
+        
+        # A hot pixel or noise spike is much narrower than the seeing disc
+        if star['fwhm'] < self.min_star_fwhm:
+            self.report_tracking("too_small", f"  Object too small (FWHM {star['fwhm']:.1f} pixels), likely noise. "
+                                              f"Need at least {self.min_star_fwhm} pixels.")
+            return None
+        
+        star_x = star['x']
+        star_y = star['y']
+        self.report_tracking("found", f"  Star found (FWHM {star['fwhm']:.1f}px, peak {star['peak']:.0f}, "
+                                      f"SNR {star['snr']:.0f}{', PSF fit' if star['fitted'] else ''})")
+        
+        # Get ROI dimensions
+        roi_height, roi_width = gray.shape[:2]
+        
+        # Update crosshair to show tracked star position (in image coordinates).
+        # Array indices go through the image transform, which places a binned
+        # camera window at its full-frame position.
+        star_point = self.imgplot.image_item.mapToParent(
+            QtCore.QPointF(roi_slice[1].start + star_x, roi_slice[0].start + star_y))
+        self.imgplot.update_star_crosshair(star_point.x(), star_point.y(), visible=True)
+        
+        # Pixel offset from the ROI center
+        offset_x = star_x - roi_width / 2  # Positive = star is right of center
+        offset_y = star_y - roi_height / 2  # Positive = star is below center
+        
+        # Binned camera windows are scaled up on screen; report full-frame pixels
+        scale = self.imgplot.image_item.transform().m11()
+        return offset_x * scale, offset_y * scale, roi_width * scale, roi_height * scale, star
+    
+    def sensor_to_view(self, x, y):
+        """
+        Display coordinates of frame array positions (x = column, y = row).
+        Display coordinates are full-frame sensor pixels; the image transform
+        places a binned camera window at its position on the sensor.
+        """
+        transform = self.imgplot.image_item.transform()
+        view_x = transform.m11() * np.asarray(x) + transform.m31()
+        view_y = transform.m22() * np.asarray(y) + transform.m32()
+        return view_x, view_y
+
+    def image_bounds(self):
+        """(x0, y0, x1, y1) of the displayed image in display coordinates"""
+        rect = self.imgplot.image_item.mapRectToParent(self.imgplot.image_item.boundingRect())
+        return rect.left(), rect.top(), rect.right(), rect.bottom()
+
+    def roi1_bounds(self):
+        pos, size = self.imgplot.ROI1.pos(), self.imgplot.ROI1.size()
+        return pos[0], pos[1], pos[0] + size[0], pos[1] + size[1]
+
+    def find_catalog_star(self, frame, selector=None):
+        """
+        Follow the guide star through the frame's star catalog. The first
+        usable star (preferably inside ROI1) is picked automatically and
+        re-acquired, or replaced, when it is lost. Returns the same tuple as
+        find_star, or None. selector defaults to the guiding one.
+        """
+        catalog = frame.info['stars']
+        stars = catalog.copy()
+        stars['x'], stars['y'] = self.sensor_to_view(catalog['x'], catalog['y'])
+        if selector is None:
+            selector = self.guide_star
+        
+        if not selector.locked():
+            selector.saturation = 0.95 * np.iinfo(frame.array.dtype).max
+            roi = self.roi1_bounds()
+            index = selector.pick(stars, self.image_bounds(), prefer=roi)
+            if index is None:
+                self.report_tracking("no_guide_star", f"  No suitable guide star among {len(stars)} stars in the frame")
+                return None
+            star = stars[index]
+            inside = roi[0] <= star['x'] <= roi[2] and roi[1] <= star['y'] <= roi[3]
+            # A star in ROI1 is guided to the ROI1 centre, like the ROI tracker; any other star stays where it is
+            target = ((roi[0] + roi[2]) / 2, (roi[1] + roi[3]) / 2) if inside else None
+            selector.lock(star, target)
+            print(f"Guide star selected at ({star['x']:.1f}, {star['y']:.1f}): SNR {star['snr']:.0f}, "
+                  f"FWHM {star['fwhm']:.1f}px{' (in ROI1)' if inside else ''}")
+        else:
+            index = selector.track(stars)
+            if index is None:
+                if not selector.lost_too_long():
+                    self.report_tracking("lost", f"  Guide star lost, searching ({len(stars)} stars in frame)")
+                    return None
+                index = selector.pick(stars, self.image_bounds())
+                if index is None:
+                    self.report_tracking("lost", "  Guide star lost and no replacement found")
+                    return None
+                selector.switch(stars[index])
+                print(f"Guide star lost for {selector.lost_limit} frames, "
+                      f"switched to the star at ({stars['x'][index]:.1f}, {stars['y'][index]:.1f})")
+        
+        # Sub-pixel position of the guide star from a Gaussian fit on the raw frame
+        star = measure_stars(self.star_detector.luminance(frame.array), catalog['x'][index], catalog['y'][index],
+                             box=self.guide_star_box, fit=True)[0]
+        if star['fitted']:
+            view_x, view_y = self.sensor_to_view(star['x'], star['y'])
+            selector.position = (float(view_x), float(view_y))
+        else:
+            star = stars[index]
+        self.report_tracking("found", f"  Guiding on catalog star (FWHM {star['fwhm']:.1f}px, SNR {star['snr']:.0f})")
+        self.imgplot.update_star_crosshair(selector.position[0], selector.position[1], visible=True)
+        
+        error_x, error_y = selector.error()
+        size = self.imgplot.ROI1.size()
+        return error_x, error_y, size[0], size[1], star
+    
+    def report_tracking(self, status, message):
+        """Log the star search status once per change rather than on every frame"""
+        if status != self.tracking_status:
+            self.tracking_status = status
+            print(message)
     
     def perform_tracking_update(self):
-        """Analyze ROI and issue correction commands"""
+        """Measure the star in the displayed frame and run one guiding cycle"""
         if not self.is_tracking:
             return
         
@@ -548,101 +893,38 @@ class MainWindow(QMainWindow):
         if not hasattr(self.imgplot, 'image_data') or self.imgplot.image_data is None:
             print("No image available for tracking")
             return
+        if self.displayed_frame is None:
+            return
         
+        # Borrow the displayed frame so its pool buffer cannot be reused while we read it
+        frame = self.displayed_frame.retain()
         try:
-            # Get ROI1 (left box) using pyqtgraph's proper method
-            image_data = self.imgplot.image_data
-            
-            # Use getArraySlice to properly extract the ROI region
-            roi_slice, roi_transform = self.imgplot.ROI1.getArraySlice(image_data, self.imgplot.image_item)
-            
-            if roi_slice is None:
-                print("ROI is outside image bounds")
-                return
+            info = frame.info
+            exposure_start = self.exposure_start(info)
             
-            # Extract the ROI data
-            roi_img = image_data[roi_slice]
-            
-            if roi_img.size == 0:
-                print("ROI is outside image bounds")
+            # Frames exposed while the mount moved show a smeared, displaced star
+            if not self.guider.frame_usable(exposure_start):
+                self.guider.skipped += 1
                 return
             
-            # Get ROI position for coordinate transformation
-            roi_pos = self.imgplot.ROI1.pos()
-            x, y = int(roi_pos[0]), int(roi_pos[1])
-            
-            # Convert to grayscale if image is in color
-            if len(roi_img.shape) == 3:
-                gray = np.dot(roi_img[..., :3], [0.114, 0.587, 0.299])  # BGR to grayscale
+            # Full-frame star catalog when the detector runs, otherwise the brightest star in ROI1
+            if info.get('stars') is not None:
+                star = self.find_catalog_star(frame)
             else:
-                gray = roi_img
-            
-            # Find the star using weighted centroid of bright pixels
-            # This is more robust than single brightest pixel (which could be noise)
-            
-            # Get the maximum brightness value
-            max_brightness = np.max(gray)
-            
-            # Set threshold at 80% of max brightness to filter out noise (more aggressive)
-            threshold = max_brightness * 0.8
-            print(f"  Max brightness in ROI: {max_brightness:.0f}, threshold: {threshold:.0f}")
-            
-            # Create mask of pixels above threshold
-            bright_mask = gray >= threshold
-            
-            # Check if we found any bright pixels
-            if not np.any(bright_mask):
-                print("  No bright object found in ROI (all pixels below threshold)")
+                star = self.find_star()
+            if star is None:
                 return
+            offset_x, offset_y, roi_width, roi_height, star = star
             
-            # Calculate weighted centroid of bright pixels
-            # This gives us the center of the bright region (the star)
-            y_coords, x_coords = np.where(bright_mask)
-            weights = gray[bright_mask]
-            
-            # Check the spatial extent of the bright region to filter out noise
-            x_min, x_max = np.min(x_coords), np.max(x_coords)
-            y_min, y_max = np.min(y_coords), np.max(y_coords)
-            width_extent = x_max - x_min + 1
-            height_extent = y_max - y_min + 1
-            diameter = max(width_extent, height_extent)
-            
-            # Require object to be at least 5 pixels in diameter
-            if diameter < 5:
-                print(f"  Object too small ({diameter} pixels), likely noise. Need at least 5 pixels.")
+            correction = self.guider.update(offset_x, offset_y, info['received_at'], exposure_start,
+                                            fwhm=star['fwhm'], snr=star['snr'],
+                                            exposure_time=info.get('exposure_time', 0) / 1e6)
+            if correction is None:
                 return
-            
-            star_x = np.average(x_coords, weights=weights)
-            star_y = np.average(y_coords, weights=weights)
-            
-            # Print brightness info for debugging
-            num_bright_pixels = np.sum(bright_mask)
-            print(f"  Found {num_bright_pixels} bright pixels (diameter: {diameter}px)")
-            print(f"  Object bounding box in ROI: X=[{x_min}, {x_max}], Y=[{y_min}, {y_max}]")
-            
-            # Get ROI dimensions
-            roi_height, roi_width = gray.shape if len(gray.shape) == 2 else gray.shape[:2]
-            
-            # Update crosshair to show tracked star position (in image coordinates)
-            star_x_img = x + star_x
-            star_y_img = y + star_y
-            self.imgplot.update_star_crosshair(star_x_img, star_y_img, visible=True)
-            
-            print(f"  ROI position: ({x}, {y}), size: ({roi_width}, {roi_height})")
-            print(f"  Star centroid in ROI coords: ({star_x:.1f}, {star_y:.1f})")
-            print(f"  Star centroid in image coords: ({star_x_img:.1f}, {star_y_img:.1f})")
-            
-            # Calculate center of ROI
-            center_x = roi_width / 2
-            center_y = roi_height / 2
-            
-            # Calculate pixel offset from center
-            offset_x = star_x - center_x  # Positive = star is right of center
-            offset_y = star_y - center_y  # Positive = star is below center
-            
-            print(f"\n{'='*50}")
-            print(f"TRACKING UPDATE")
-            print(f"  Offset from ROI center: X={offset_x:.1f}px, Y={offset_y:.1f}px")
+            self.record_trajectory(info['received_at'], offset_x + self.guider.applied[0],
+                                   offset_y + self.guider.applied[1], flux=star['flux'])
+            self.imgplot.trajectory_plot.append(info['received_at'], offset_x, offset_y)
+            correction_x, correction_y = correction
             
             # Get maximum step sizes from UI
             try:
@@ -652,130 +934,257 @@ class MainWindow(QMainWindow):
                 print("  Error: Invalid step size in U/D or L/R fields")
                 return
             
-            # Calculate required steps (scale pixel offset to motor steps)
-            # Assume roughly linear relationship: max offset = half ROI size = max steps
-            # This gives: steps = offset * (max_steps / (roi_size/2))
-            steps_x = int(offset_x * max_lr_steps / (roi_width / 2))
-            steps_y = int(offset_y * max_ud_steps / (roi_height / 2))
+            # Pixel corrections to motor steps with the calibrated matrix; until the
+            # mount is calibrated, half the ROI size is taken to equal the maximum steps
+            if self.calibration is not None:
+                self.guide_calibration = self.calibration
+            else:
+                self.guide_calibration = StepCalibration.from_roi(max_ud_steps, max_lr_steps, roi_width, roi_height)
+            steps_alt, steps_azi = self.guide_calibration.steps(correction_x, correction_y)
             
             # Clamp to maximum step sizes
-            steps_x = max(min(steps_x, max_lr_steps), -max_lr_steps)
-            steps_y = max(min(steps_y, max_ud_steps), -max_ud_steps)
+            steps_alt = max(min(int(round(steps_alt)), max_ud_steps), -max_ud_steps)
+            steps_azi = max(min(int(round(steps_azi)), max_lr_steps), -max_lr_steps)
             
-            # Determine movement directions
-            # Positive offset_x = star right of center = need to move RIGHT (motor 2 backward)
-            # Negative offset_x = star left of center = need to move LEFT (motor 2 forward)
-            # Positive offset_y = star below center = need to move UP (motor 1 forward)
-            # Negative offset_y = star above center = need to move DOWN (motor 1 backward)
-            
-            # Issue correction commands
-            if abs(steps_y) > 5:  # Only move if offset is significant (>5 steps)
-                direction_ud = "F" if steps_y > 0 else "B"  # UP/DOWN normal
-                command = f"move:1,{direction_ud},{abs(steps_y)}"
-                print(f"  Altitude correction: {abs(steps_y)} steps {'UP' if steps_y > 0 else 'DOWN'}")
-                self.send_http_request("/command", {"cmd": command})
-            else:
-                print(f"  Altitude: centered (offset {steps_y} steps)")
-            
-            if abs(steps_x) > 5:  # Only move if offset is significant (>5 steps)
-                direction_lr = "B" if steps_x > 0 else "F"  # LEFT/RIGHT inverted
-                command = f"move:2,{direction_lr},{abs(steps_x)}"
-                print(f"  Azimuth correction: {abs(steps_x)} steps {'RIGHT' if steps_x > 0 else 'LEFT'}")
-                self.send_http_request("/command", {"cmd": command})
-            else:
-                print(f"  Azimuth: centered (offset {steps_x} steps)")
+            if steps_alt or steps_azi:
+                print(f"Guide: error X={offset_x:+.2f}px Y={offset_y:+.2f}px -> "
+                      f"Alt {steps_alt:+d} steps, Azi {steps_azi:+d} steps")
+            self.move_mount(steps_alt, steps_azi)
             
         except Exception as e:
             print(f"Tracking error: {e}")
+        finally:
+            frame.release()
+            now = time.perf_counter()
+            if self.is_tracking and now >= self.guide_summary_at:
+                self.guide_summary_at = now + self.guide_summary_interval
+                print(f"Guiding: {self.guider.summary()}")
+
+    def calibrate_clicked(self):
+        """Start or cancel the pixel-to-step calibration"""
+        if not self.dpad.calibrate_button.isChecked():
+            self.stop_calibration("Calibration cancelled")
+            return
+        if self.is_tracking:
+            print("Stop tracking before calibrating")
+            self.dpad.calibrate_button.setChecked(False)
+            return
+        if self.acquisition_worker is None:
+            print("Connect the camera before calibrating")
+            self.dpad.calibrate_button.setChecked(False)
+            return
+        try:
+            steps = (int(self.dpad.ud_lineedit.text()), int(self.dpad.lr_lineedit.text()))
+        except ValueError:
+            print("Calibration jogs by the U/D and L/R step counts; enter whole numbers")
+            self.dpad.calibrate_button.setChecked(False)
+            return
+        
+        self.apply_guide_settings()  # Settle time between a jog and the next measurement
+        self.calibration_run = CalibrationRun(steps)
+        self.calibration_star.reset()
+        self.calibration_failures = 0
+        self.tracking_status = None
+        self.acquisition_worker.set_detector(self.star_detector)
+        print(f"Calibrating: jogging Alt by {steps[0]} and Azi by {steps[1]} steps, "
+              f"twice forward and twice back")
+        if not self.is_capturing:
+            self.camera_controls.capture_mode_combobox.setCurrentText("Continuous")
+            self.start_continuous_capture()
+
+    def stop_calibration(self, message):
+        self.calibration_run = None
+        self.dpad.calibrate_button.setChecked(False)
+        if self.acquisition_worker is not None and not self.is_tracking:
+            self.acquisition_worker.set_detector(None)
+        self.imgplot.update_star_crosshair(0, 0, visible=False)
+        print(message)
+
+    def perform_calibration_update(self):
+        """Measure the star in the displayed frame and send the next calibration jog when due"""
+        if self.displayed_frame is None:
+            return
+        frame = self.displayed_frame.retain()
+        try:
+            info = frame.info
+            if not self.guider.frame_usable(self.exposure_start(info)):
+                return
+            star = None
+            if info.get('stars') is not None:
+                star = self.find_catalog_star(frame, self.calibration_star)
+            if star is None:
+                self.calibration_failures += 1
+                if self.calibration_failures >= self.calibration_star.lost_limit:
+                    self.stop_calibration("Calibration failed: star lost; try fewer steps")
+                return
+            self.calibration_failures = 0
+            
+            offset_x, offset_y = star[0], star[1]
+            move = self.calibration_run.add_sample(offset_x, offset_y)
+            if move is not None:
+                motor, direction, steps = move
+                print(f"Calibration {self.calibration_run.progress()}: motor {motor} {direction} {steps} steps")
+                self.send_guide_move(motor, steps if direction == "F" else -steps)
+                self.count_motor_move(motor, direction, steps)
+            elif self.calibration_run.finished():
+                self.finish_calibration()
+        except Exception as e:
+            print(f"Calibration error: {e}")
+        finally:
+            frame.release()
+
+    def finish_calibration(self):
+        try:
+            calibration = self.calibration_run.result()
+        except ValueError as e:
+            self.stop_calibration(f"Calibration failed: {e}")
+            return
+        self.calibration = calibration
+        self.settings.setValue("sensor_calibration", calibration.to_text())
+        self.apply_backlash(calibration.backlash)
+        self.stop_calibration(f"Calibration done: {calibration.describe()}")
+
+    def apply_backlash(self, residual):
+        """Add the measured residual backlash to the ESP32's compensation of motors 1 and 2"""
+        for motor_num, motor, extra in ((1, self.motor1, residual[0]), (2, self.motor2, residual[1])):
+            if abs(extra) < 2:
+                continue
+            try:
+                current = int(motor.fields["Backlash"].text() or 0)
+            except ValueError:
+                current = 0
+            backlash = max(0, current + extra)
+            motor.fields["Backlash"].setText(str(backlash))
+            self.motor_client.setting("set_backlash", motor_num, backlash)
+            print(f"Motor {motor_num} backlash compensation: {current} -> {backlash} steps")
+        self.update_settings()
+
+    def move_mount(self, steps_alt, steps_azi, settle=True):
+        """
+        Send a guiding correction in signed motor steps (positive = forward)
+        to altitude (motor 1) and azimuth (motor 2). With settle the guider
+        ignores frames until the moves are done; feed-forward moves follow
+        the target and keep frames usable. Backlash is compensated by the
+        ESP32 when a motor changes direction.
+        """
+        for motor, steps in ((1, steps_alt), (2, steps_azi)):
+            if steps:
+                self.send_guide_move(motor, steps, settle)
+                self.count_motor_move(motor, "F" if steps > 0 else "B", abs(steps))
+        
+        # What was sent, in pixels, so the predictor can tell target motion from mount motion
+        if (steps_alt or steps_azi) and self.guide_calibration is not None:
+            self.guider.correction_applied(*self.guide_calibration.pixels(steps_alt, steps_azi))
+
+    def send_guide_move(self, motor, steps, settle=True):
+        """
+        Queue a guiding move of signed steps. The callback runs once the
+        ESP32 reports the move complete, so with settle its completion (or a
+        failure) ends the guider's moving state.
+        """
+        if not settle:
+            self.motor_client.move(motor, steps)
+            return
+        self.guider.move_started()
+        self.motor_client.move(motor, steps,
+                               callback=lambda result: self.guider.move_finished(),
+                               error_callback=lambda error: self.guider.move_finished())
+
+    def feed_forward_update(self):
+        """Timer: move the mount along with the predicted target motion between measurements"""
+        if not self.is_tracking or self.guide_calibration is None:
+            return
+        # One move at a time; the next tick covers the time skipped here
+        if self.motor_client.busy():
+            return
+        correction = self.guider.feed_forward(time.perf_counter())
+        if correction is None:
+            return
+        
+        # Whole steps only; the remainder carries over to the next tick
+        steps = self.guide_calibration.steps(*correction)
+        self.feed_forward_residual[0] += steps[0]
+        self.feed_forward_residual[1] += steps[1]
+        steps_alt = int(self.feed_forward_residual[0])
+        steps_azi = int(self.feed_forward_residual[1])
+        self.feed_forward_residual[0] -= steps_alt
+        self.feed_forward_residual[1] -= steps_azi
+        if steps_alt or steps_azi:
+            self.move_mount(steps_alt, steps_azi, settle=False)
+
+    def count_motor_move(self, motor, direction, steps):
+        """Keep the commanded Alt/Azi positions that are stored with the trajectory"""
+        try:
+            steps = int(steps)
+        except ValueError:
+            return
+        if motor in (1, 2):
+            self.motor_position[motor - 1] += steps if direction == "F" else -steps
+
+    def record_trajectory(self, timestamp, x, y, flux=0.0, source=GUIDE_STAR):
+        """
+        Store a position (pixels) with the motor positions: the ESP32's
+        telemetry at that time if current, else the commanded positions.
+        timestamp is a perf_counter time and is stored as Unix time. The
+        store is opened in a new trajectories/<date_time> directory on the
+        first position.
+        """
+        try:
+            if self.trajectory is None:
+                directory = os.path.join(self.trajectory_directory, time.strftime("%Y%m%d_%H%M%S"))
+                self.trajectory = TrajectoryStore(directory)
+                print(f"Recording trajectory to {directory}")
+            unix_time = time.time() - (time.perf_counter() - timestamp)
+            mount = self.telemetry.state
+            motor1, motor2 = mount.position_at(timestamp) if mount.fresh() else self.motor_position
+            self.trajectory.append(unix_time, x, y, motor1, motor2, flux, source)
+        except Exception as e:
+            print(f"Error recording trajectory: {e}")
 
     def connect_camera(self):
+        # Reconnecting - release the current camera first
+        if self.acquisition_worker is not None:
+            if self.is_capturing:
+                self.stop_continuous_capture()
+            self.disconnec_camera()
+
         try: 
-            # Initialize the PySpin system and connect to the first available camera.
-            self.system = PySpin.System.GetInstance()
-            self.camList = self.system.GetCameras()
-            if self.camList.GetSize() == 0:
-                print("No cameras detected!")
+            backend_name = self.camera_controls.backend_combobox.currentText()
+            self.camera = create_backend(backend_name)
+            if not self.camera.open():
+                self.camera = None
                 self.camera_controls.connect_status.setText("Disconnected")
-                self.camList.Clear()
-                self.system.ReleaseInstance()
                 return  # Exit early if no camera found
-            
-            # Camera found - initialize it
+
+            # Camera found and initialized
             self.camera_controls.connect_status.setText("Connected")
-            self.cam = self.camList[0]
-            self.cam.Init()
-            
-            # Configure camera for long exposures immediately after init
+
+            # Start from the full sensor; a window left over from an earlier session would hide the sky
+            self.camera_controls.guide_window_button.setChecked(False)
             try:
-                nodemap = self.cam.GetNodeMap()
-                s_nodemap = self.cam.GetTLStreamNodeMap()
-                
-                # Configure stream layer for long exposures
-                try:
-                    # Set stream buffer count mode to manual
-                    stream_buffer_count_mode = PySpin.CEnumerationPtr(s_nodemap.GetNode('StreamBufferCountMode'))
-                    if PySpin.IsAvailable(stream_buffer_count_mode) and PySpin.IsWritable(stream_buffer_count_mode):
-                        stream_buffer_count_mode.SetIntValue(stream_buffer_count_mode.GetEntryByName('Manual').GetValue())
-                        print("Stream buffer count mode set to Manual")
-                    
-                    # Increase buffer count for long exposures
-                    stream_buffer_count = PySpin.CIntegerPtr(s_nodemap.GetNode('StreamBufferCountManual'))
-                    if PySpin.IsAvailable(stream_buffer_count) and PySpin.IsWritable(stream_buffer_count):
-                        stream_buffer_count.SetValue(10)
-                        print("Stream buffer count set to 10")
-                    
-                    # Set buffer handling mode to NewestOnly to prevent memory issues
-                    stream_buffer_handling = PySpin.CEnumerationPtr(s_nodemap.GetNode('StreamBufferHandlingMode'))
-                    if PySpin.IsAvailable(stream_buffer_handling) and PySpin.IsWritable(stream_buffer_handling):
-                        stream_buffer_handling.SetIntValue(stream_buffer_handling.GetEntryByName('NewestOnly').GetValue())
-                        print("Stream buffer handling mode set to NewestOnly")
-                except Exception as stream_error:
-                    print(f"Warning: Could not configure stream settings: {stream_error}")
-                
-                # Disable frame rate control to allow long exposures
-                try:
-                    frame_rate_enable = PySpin.CBooleanPtr(nodemap.GetNode('AcquisitionFrameRateEnable'))
-                    if PySpin.IsAvailable(frame_rate_enable) and PySpin.IsWritable(frame_rate_enable):
-                        frame_rate_enable.SetValue(False)
-                        print("Frame rate control disabled - long exposures enabled")
-                except:
-                    # Try alternative node name
-                    try:
-                        frame_rate_auto = PySpin.CEnumerationPtr(nodemap.GetNode('AcquisitionFrameRateAuto'))
-                        if PySpin.IsAvailable(frame_rate_auto) and PySpin.IsWritable(frame_rate_auto):
-                            frame_rate_auto.SetIntValue(frame_rate_auto.GetEntryByName('Off').GetValue())
-                            print("Frame rate auto set to Off - long exposures enabled")
-                    except:
-                        print("Could not disable frame rate control (may not be available)")
-                
-                # Set frame rate to very low value (0.1 fps = 10 second max exposure theoretically)
-                try:
-                    frame_rate = PySpin.CFloatPtr(nodemap.GetNode('AcquisitionFrameRate'))
-                    if PySpin.IsAvailable(frame_rate) and PySpin.IsWritable(frame_rate):
-                        frame_rate_min = frame_rate.GetMin()
-                        frame_rate.SetValue(frame_rate_min)
-                        print(f"Frame rate set to minimum: {frame_rate_min} fps")
-                except Exception as fr_error:
-                    print(f"Could not set frame rate: {fr_error}")
-                
-                # Disable trigger mode
-                try:
-                    trigger_mode = PySpin.CEnumerationPtr(nodemap.GetNode('TriggerMode'))
-                    if PySpin.IsAvailable(trigger_mode) and PySpin.IsWritable(trigger_mode):
-                        trigger_mode.SetIntValue(trigger_mode.GetEntryByName('Off').GetValue())
-                        print("Trigger mode disabled")
-                except:
-                    pass
-                    
-            except Exception as config_error:
-                print(f"Warning: Could not fully configure camera: {config_error}")
-            
+                if self.camera.supports_roi():
+                    self.camera.set_roi(None)
+            except Exception as roi_error:
+                print(f"Could not reset camera window: {roi_error}")
+
+            # Hand the camera to the acquisition thread
+            self.acquisition_worker = AcquisitionWorker(self.camera)
+            self.acquisition_worker.frame_ready.connect(self.on_frame_ready)
+            self.acquisition_worker.error_occurred.connect(self.on_acquisition_error)
+            self.acquisition_worker.exposure_started.connect(self.on_exposure_started)
+            self.acquisition_worker.exposure_ended.connect(self.on_exposure_ended)
+            self.push_capture_parameters()
+            if self.is_tracking:
+                self.acquisition_worker.set_detector(self.star_detector)
+            self.acquisition_worker.start()
+
             # Enable hotspot calibration button
             self.camera_controls.rm_hotspots_button.setEnabled(True)
             
-            print("Camera connected and initialized")
+            print(f"Camera connected and initialized ({backend_name})")
         except Exception as e:
             print(f"Error connecting camera: {e}")
+            self.camera = None
             self.camera_controls.connect_status.setText("Disconnected")
             self.camera_controls.rm_hotspots_button.setEnabled(False)
 
@@ -783,7 +1192,7 @@ class MainWindow(QMainWindow):
         """Load dark frame from disk if available"""
         try:
             if os.path.exists(self.dark_frame_path):
-                self.hotspot_mask = np.load(self.dark_frame_path)
+                self.set_dark_frame(np.load(self.dark_frame_path))
                 print("=" * 60)
                 print("DARK FRAME LOADED FROM DISK")
                 print(f"File: {self.dark_frame_path}")
@@ -796,8 +1205,25 @@ class MainWindow(QMainWindow):
                 print(f"No saved dark frame found at {self.dark_frame_path}")
         except Exception as e:
             print(f"Error loading dark frame: {e}")
-            self.hotspot_mask = None
+            self.set_dark_frame(None)
     
+    def set_dark_frame(self, hotspot_mask):
+        """Install a new dark frame (float32) or None to disable subtraction"""
+        self.hotspot_mask = hotspot_mask
+        self.dark_roi = None
+        self.corrector.set_dark_frame(hotspot_mask)
+
+    def dark_frame_for_window(self, roi):
+        """The dark frame cropped (and binned) to a camera window"""
+        if self.hotspot_mask is None or roi is None:
+            return self.hotspot_mask
+        offset_x, offset_y, width, height, binning = roi
+        dark = self.hotspot_mask[offset_y:offset_y + height, offset_x:offset_x + width]
+        if binning > 1 and dark.shape[0] % binning == 0 and dark.shape[1] % binning == 0:
+            shape = (dark.shape[0] // binning, binning, dark.shape[1] // binning, binning) + dark.shape[2:]
+            dark = dark.reshape(shape).mean(axis=(1, 3))
+        return dark
+
     def save_dark_frame(self):
         """Save dark frame to disk"""
         try:
@@ -809,6 +1235,10 @@ class MainWindow(QMainWindow):
     
     def calibrate_hotspots(self):
         """Start dark frame calibration using 10 frames (lens cap on)"""
+        if self.camera_controls.guide_window_button.isChecked():
+            print("Switch the guide window off before dark frame calibration (needs full frames)")
+            return
+
         print("=" * 60)
         print("DARK FRAME CALIBRATION STARTED")
         print("*** PUT LENS CAP ON NOW ***")
@@ -816,9 +1246,10 @@ class MainWindow(QMainWindow):
         print("=" * 60)
         
         # Reset calibration data
-        self.calibration_frames = []
+        self.calibration_sum = None
+        self.calibration_count = 0
         self.is_calibrating = True
-        self.hotspot_mask = None
+        self.set_dark_frame(None)
         
         # Set button text to show calibration is in progress
         self.camera_controls.rm_hotspots_button.setText("Calibrating...")
@@ -835,8 +1266,8 @@ class MainWindow(QMainWindow):
     
     def finish_hotspot_calibration(self):
         """Process collected frames to create dark frame (average of all frames)"""
-        if len(self.calibration_frames) < 10:
-            print(f"Error: Only collected {len(self.calibration_frames)} frames")
+        if self.calibration_count < 10:
+            print(f"Error: Only collected {self.calibration_count} frames")
             self.is_calibrating = False
             self.camera_controls.rm_hotspots_button.setText("Dark Frame")
             self.camera_controls.rm_hotspots_button.setEnabled(True)
@@ -844,12 +1275,9 @@ class MainWindow(QMainWindow):
         
         print("Creating dark frame from collected images...")
         
-        # Convert frames to numpy array and calculate mean
-        # This creates a dark frame by averaging all the lens-cap-on images
-        frames = np.array(self.calibration_frames)  # Shape: (10, height, width, [channels])
-        
-        # Calculate average across all frames - this is our dark frame
-        self.hotspot_mask = np.mean(frames, axis=0).astype(np.float32)
+        # Average of all the lens-cap-on images - this is our dark frame
+        self.calibration_sum /= self.calibration_count
+        self.set_dark_frame(self.calibration_sum)
         
         # Calculate some statistics for user feedback
         mean_value = np.mean(self.hotspot_mask)
@@ -857,7 +1285,7 @@ class MainWindow(QMainWindow):
         
         print("=" * 60)
         print(f"DARK FRAME CALIBRATION COMPLETE")
-        print(f"Created dark frame from {len(self.calibration_frames)} frames")
+        print(f"Created dark frame from {self.calibration_count} frames")
         print(f"Dark frame stats: Mean={mean_value:.1f}, Max={max_value:.1f}")
         print(f"Dark frame will be subtracted from all subsequent images")
         print("*** YOU CAN REMOVE THE LENS CAP NOW ***")
@@ -867,7 +1295,8 @@ class MainWindow(QMainWindow):
         self.save_dark_frame()
         
         # Clean up
-        self.calibration_frames = []
+        self.calibration_sum = None
+        self.calibration_count = 0
         self.is_calibrating = False
         self.camera_controls.rm_hotspots_button.setText("Dark Frame")
         self.camera_controls.rm_hotspots_button.setEnabled(True)
@@ -903,16 +1332,22 @@ class MainWindow(QMainWindow):
     
     def start_continuous_capture(self):
         """Start continuous image capture"""
+        if self.acquisition_worker is None:
+            print("Camera not connected")
+            self.camera_controls.capture_button.setChecked(False)
+            return
         self.is_capturing = True
         self.camera_controls.capture_button.setText("Stop")
-        # Capture at ~10 fps (100ms interval) - adjust as needed for your camera
-        self.capture_timer.start(100)  # milliseconds
+        # The worker free-runs at the camera's own frame rate
+        self.push_capture_parameters()
+        self.acquisition_worker.start_continuous()
         print("Started continuous capture mode")
     
     def stop_continuous_capture(self):
         """Stop continuous image capture"""
         self.is_capturing = False
-        self.capture_timer.stop()
+        if self.acquisition_worker is not None:
+            self.acquisition_worker.stop_continuous()
         
         # Update button based on current mode
         capture_mode = self.camera_controls.capture_mode_combobox.currentText()
@@ -921,21 +1356,14 @@ class MainWindow(QMainWindow):
         else:
             self.camera_controls.capture_button.setText("Capture")
         self.camera_controls.capture_button.setChecked(False)
-        
-        # Stop camera acquisition
-        try:
-            if self.cam.IsStreaming():
-                self.cam.EndAcquisition()
-        except:
-            pass
         print("Stopped continuous capture mode")
+        if self.camera is not None:
+            print(f"Camera: {self.camera.stats()}")
+        if self.acquisition_worker is not None:
+            print(f"Frame pool: {self.acquisition_worker.stats()}")
     
-    def capture_single_frame(self):
-        """Capture a single frame from the camera"""
-        # Determine if we're in continuous mode (check this first)
-        is_continuous = self.is_capturing
-        
-        # Read parameter values from UI fields with defaults.
+    def read_capture_parameters(self):
+        """Read exposure, gain and display mode from the camera controls"""
         try:
             exposure_time = float(self.camera_controls.exposure_edit.text())
             # Input is already in microseconds
@@ -948,236 +1376,134 @@ class MainWindow(QMainWindow):
             gain = 1.0  # default gain
 
         display_mode = self.camera_controls.color_mode_combobox.currentText()
+        return exposure_time, gain, display_mode
 
-        nodemap = self.cam.GetNodeMap()
-        # Set exposure time
-        try:
-            # First, disable frame rate control to allow long exposures
-            try:
-                frame_rate_enable = PySpin.CBooleanPtr(nodemap.GetNode('AcquisitionFrameRateEnable'))
-                if PySpin.IsAvailable(frame_rate_enable) and PySpin.IsWritable(frame_rate_enable):
-                    frame_rate_enable.SetValue(False)
-                    if not is_continuous:
-                        print("Disabled frame rate control to allow long exposures")
-            except:
-                # Try alternative node name
-                try:
-                    frame_rate_auto = PySpin.CEnumerationPtr(nodemap.GetNode('AcquisitionFrameRateAuto'))
-                    if PySpin.IsAvailable(frame_rate_auto) and PySpin.IsWritable(frame_rate_auto):
-                        frame_rate_auto.SetIntValue(frame_rate_auto.GetEntryByName('Off').GetValue())
-                        if not is_continuous:
-                            print("Set frame rate auto to Off")
-                except:
-                    pass  # Frame rate control might not be available
-            
-            # Ensure trigger mode is off for free-running capture
-            try:
-                trigger_mode = PySpin.CEnumerationPtr(nodemap.GetNode('TriggerMode'))
-                if PySpin.IsAvailable(trigger_mode) and PySpin.IsWritable(trigger_mode):
-                    trigger_mode.SetIntValue(trigger_mode.GetEntryByName('Off').GetValue())
-                    if not is_continuous:
-                        print("Set trigger mode to Off")
-            except:
-                pass
-            
-            exposure_auto = PySpin.CEnumerationPtr(nodemap.GetNode('ExposureAuto'))
-            if PySpin.IsAvailable(exposure_auto) and PySpin.IsWritable(exposure_auto):
-                exposure_auto.SetIntValue(exposure_auto.GetEntryByName('Off').GetValue())
-
-            exposure_mode = PySpin.CEnumerationPtr(nodemap.GetNode('ExposureMode'))
-            if PySpin.IsAvailable(exposure_mode) and PySpin.IsWritable(exposure_mode):
-                exposure_mode.SetIntValue(exposure_mode.GetEntryByName('Timed').GetValue())
-
-            # Now set the exposure time
-            exposure_node = PySpin.CFloatPtr(nodemap.GetNode("ExposureTime"))
-            if PySpin.IsAvailable(exposure_node) and PySpin.IsWritable(exposure_node):
-                # Get the exposure time range
-                exposure_min = exposure_node.GetMin()
-                exposure_max = exposure_node.GetMax()
-                # Ensure exposure_time is within valid range
-                requested_exposure = exposure_time
-                was_clamped = False
-                
-                if exposure_time > exposure_max:
-                    exposure_time = exposure_max
-                    was_clamped = True
-                    if not is_continuous:
-                        print(f"WARNING: Requested exposure {requested_exposure} µs exceeds camera maximum!")
-                        print(f"         Setting to maximum: {exposure_max} µs ({exposure_max/1000:.3f} ms)")
-                elif exposure_time < exposure_min:
-                    exposure_time = exposure_min
-                    was_clamped = True
-                    if not is_continuous:
-                        print(f"WARNING: Requested exposure {requested_exposure} µs below camera minimum!")
-                        print(f"         Setting to minimum: {exposure_min} µs")
-                
-                exposure_node.SetValue(exposure_time)
-                
-                # Read back the actual value set
-                actual_exposure = exposure_node.GetValue()
-                
-                # Only print if not in continuous mode to reduce spam
-                if not is_continuous and not was_clamped:
-                    print(f"Exposure set to: {actual_exposure} µs ({actual_exposure/1000:.3f} ms)")
-                    print(f"Camera range: {exposure_min/1000:.1f} - {exposure_max/1000:.1f} ms")
-            else:
-                if not is_continuous:
-                    print("Exposure time node not available/writable")
-        except Exception as e:
-            if not is_continuous:
-                print("Could not set exposure time:", e)
+    def push_capture_parameters(self):
+        """Forward the current camera controls to the acquisition worker"""
+        if self.acquisition_worker is not None:
+            self.acquisition_worker.set_parameters(*self.read_capture_parameters())
 
-        # Set gain mode to manual and adjust gain value
-        try:
-            gain_auto = PySpin.CEnumerationPtr(nodemap.GetNode('GainAuto'))
-            if PySpin.IsAvailable(gain_auto) and PySpin.IsWritable(gain_auto):
-                gain_auto.SetIntValue(gain_auto.GetEntryByName('Off').GetValue())
-
-            gain_node = PySpin.CFloatPtr(nodemap.GetNode("Gain"))
-            if PySpin.IsAvailable(gain_node) and PySpin.IsWritable(gain_node):
-                # Get the gain range
-                gain_min = gain_node.GetMin()
-                gain_max = gain_node.GetMax()
-                # Ensure gain is within valid range
-                gain = max(min(gain, gain_max), gain_min)
-                gain_node.SetValue(gain)
-                # Only print if not in continuous mode to reduce spam
-                if not is_continuous:
-                    print(f"Set gain to {gain} dB")
-            else:
-                if not is_continuous:
-                    print("Gain node not available/writable")
-        except Exception as e:
-            if not is_continuous:
-                print("Could not set gain:", e)
-        
-        try:
-            acquisition_mode_node = PySpin.CEnumerationPtr(nodemap.GetNode("AcquisitionMode"))
-            if PySpin.IsAvailable(acquisition_mode_node) and PySpin.IsWritable(acquisition_mode_node):
-                if is_continuous:
-                    acquisition_mode_node.SetIntValue(PySpin.AcquisitionMode_Continuous)
-                else:
-                    acquisition_mode_node.SetIntValue(PySpin.AcquisitionMode_SingleFrame)
-        except Exception as e:
-            if not is_continuous:
-                print("Could not set acquisition mode:", e)
+    def capture_single_frame(self):
+        """Request a single frame from the acquisition worker (returns immediately)"""
+        if self.acquisition_worker is None:
+            print("Camera not connected")
+            return
+        self.push_capture_parameters()
+        if not self.acquisition_worker.request_single_frame():
+            print("Exposure in progress; wait for it or cancel it")
+
+    def cancel_exposure(self):
+        """Abandon the exposure in progress (and stop continuous capture)"""
+        if self.is_capturing:
+            self.stop_continuous_capture()
+        if self.acquisition_worker is not None:
+            self.acquisition_worker.cancel_exposure()
+
+    def on_exposure_started(self, started_at, seconds):
+        self.exposure_started_at = started_at
+        self.exposure_seconds = seconds
+        self.camera_controls.cancel_exposure_button.setEnabled(True)
+        self.update_exposure_progress()
+        self.exposure_timer.start()
+
+    def update_exposure_progress(self):
+        """Progress bar and remaining time of the exposure in progress"""
+        if self.exposure_started_at is None:
+            return
+        elapsed = time.perf_counter() - self.exposure_started_at
+        fraction = min(elapsed / self.exposure_seconds, 1.0) if self.exposure_seconds > 0 else 1.0
+        self.camera_controls.exposure_progress.setValue(int(fraction * 1000))
+        remaining = self.exposure_seconds - elapsed
+        if remaining > 0:
+            self.camera_controls.exposure_remaining_label.setText(f"{remaining:.1f} s left")
+        else:
+            self.camera_controls.exposure_remaining_label.setText("Reading out...")
+
+    def on_exposure_ended(self, outcome):
+        """Reset the progress display; outcome is done, cancelled, stopped or failed"""
+        self.exposure_timer.stop()
+        self.exposure_started_at = None
+        self.camera_controls.cancel_exposure_button.setEnabled(False)
+        self.camera_controls.exposure_progress.setValue(1000 if outcome == "done" else 0)
+        self.camera_controls.exposure_remaining_label.setText("" if outcome == "done" else outcome.capitalize())
 
+    def on_acquisition_error(self, message):
+        print(message)
+
+    def on_frame_ready(self, frame):
+        """
+        Handle a frame delivered by the acquisition worker. frame is a pool
+        buffer owned by this call; it is released at the end and the display
+        keeps its own reference.
+        """
+        start = time.perf_counter()
         try:
-            # Only reset camera if not already in continuous mode
-            if not is_continuous or not self.cam.IsStreaming():
-                # Stop any existing acquisition
-                if self.cam.IsStreaming():
-                    self.cam.EndAcquisition()
-                    time.sleep(0.1)  # Give camera time to stop
-
-                # Reset the camera if needed (only for single frame mode)
-                if not is_continuous:
-                    self.cam.DeInit()
-                    time.sleep(0.2)  # Wait for camera to fully deinitialize
-                    self.cam.Init()
-                    time.sleep(0.3)  # Give camera time to initialize
-
-                # Begin new acquisition
-                self.cam.BeginAcquisition()
-                time.sleep(0.1)  # Wait for acquisition to start
-                if not is_continuous:
-                    print("Acquisition started, waiting for image...")
-
-            image_np = None
-
-            # Create an image processor instance
-            image_processor = PySpin.ImageProcessor()
-
-            # Calculate timeout based on exposure time with generous buffer
-            # For short exposures: exposure + 3 seconds
-            # For long exposures (>1s): exposure * 2 + 5 seconds (double exposure time plus buffer)
-            if exposure_time > 1000000:  # If exposure > 1 second
-                timeout_ms = int(exposure_time / 1000 * 2) + 5000
-            else:
-                timeout_ms = max(3000, int(exposure_time / 1000) + 3000)
-            
-            # Inform user about long exposure
-            if not is_continuous and exposure_time >= 500000:  # 500ms or longer
-                if exposure_time >= 1000000:  # 1 second or more
-                    print(f"Long exposure: {exposure_time/1000000:.1f} seconds. Please wait...")
-                    print(f"Using {timeout_ms/1000:.1f} second timeout")
-                else:
-                    print(f"Long exposure: {exposure_time/1000:.0f} ms. Please wait...")
-            
-            # Acquire image with timeout (use calculated timeout for both modes)
-            image_result = self.cam.GetNextImage(timeout_ms)
-            if image_result.IsIncomplete():
-                print("Image incomplete with status %d" % image_result.GetImageStatus())
-            else:
-                if display_mode == "Color":
-                    # Convert to color BGR8
-                    converted_image = image_processor.Convert(image_result, PySpin.PixelFormat_BGR8)
-                    image_np = converted_image.GetNDArray()
-                elif display_mode == "Grayscale":
-                    # Convert to color first, then to grayscale
-                    converted_image = image_processor.Convert(image_result, PySpin.PixelFormat_BGR8)
-                    image_color = converted_image.GetNDArray()
-                    if len(image_color.shape) == 3:
-                        image_np = np.dot(image_color[..., :3], [0.114, 0.587, 0.299])
-                        image_np = image_np.astype(np.uint8)
-                    else:
-                        image_np = image_color
-                else:  # Mono mode
-                    # Get raw monochrome data from camera
-                    try:
-                        converted_image = image_processor.Convert(image_result, PySpin.PixelFormat_Mono8)
-                        image_np = converted_image.GetNDArray()
-                    except:
-                        # Fallback to raw data if Mono8 conversion fails
-                        image_np = image_result.GetNDArray()
-            
-            image_result.Release()
-            
-            # Only end acquisition in single frame mode
-            if not is_continuous:
-                self.cam.EndAcquisition()
-
-            if image_np is not None:
-                # Collect frames for dark frame calibration
-                if self.is_calibrating and len(self.calibration_frames) < 10:
-                    self.calibration_frames.append(image_np.copy())
-                    print(f"Dark frame {len(self.calibration_frames)}/10 collected")
-                    
-                    if len(self.calibration_frames) == 10:
-                        # Stop capture and process calibration
-                        self.stop_continuous_capture()
-                        self.finish_hotspot_calibration()
-                
-                # Apply dark frame subtraction if available
-                if self.hotspot_mask is not None and not self.is_calibrating:
-                    # Subtract dark frame (clip to prevent negative values)
-                    # Handle both grayscale and color images
-                    if len(image_np.shape) == 3 and len(self.hotspot_mask.shape) == 2:
-                        # Color image with grayscale dark frame - subtract from each channel
-                        image_np = image_np.astype(np.float32)
-                        for i in range(image_np.shape[2]):
-                            image_np[:, :, i] = np.clip(image_np[:, :, i] - self.hotspot_mask, 0, 255)
-                        image_np = image_np.astype(np.uint8)
-                    elif image_np.shape == self.hotspot_mask.shape:
-                        # Same shape - direct subtraction
-                        image_np = np.clip(image_np.astype(np.float32) - self.hotspot_mask, 0, 255).astype(np.uint8)
-                    else:
-                        print(f"Warning: Dark frame shape {self.hotspot_mask.shape} doesn't match image shape {image_np.shape}. Skipping subtraction.")
-                
-                self.display_image(image_np)
+            self.process_frame(frame)
+        finally:
+            frame.release()
+        self.frames_received += 1
+        self.process_time = 0.9 * self.process_time + 0.1 * (time.perf_counter() - start)
+
+    def process_frame(self, frame):
+        image_np = frame.array
+        info = frame.info
+        if info.get('roi') is None:
+            self.full_frame_size = (image_np.shape[1], image_np.shape[0])
+
+        # Collect frames for dark frame calibration
+        if self.is_calibrating and self.calibration_count < 10:
+            # Accumulate instead of keeping copies of every frame
+            if self.calibration_sum is None or self.calibration_sum.shape != image_np.shape:
+                self.calibration_sum = np.zeros(image_np.shape, dtype=np.float32)
+                self.calibration_count = 0
+            np.add(self.calibration_sum, image_np, out=self.calibration_sum)
+            self.calibration_count += 1
+            print(f"Dark frame {self.calibration_count}/10 collected")
+
+            if self.calibration_count == 10:
+                # Stop capture and process calibration
+                self.stop_continuous_capture()
+                self.finish_hotspot_calibration()
 
-        except Exception as e:
-            print(f"Error capturing image: {e}")
-            # Recovery procedure
-            try:
-                if self.cam.IsStreaming():
-                    self.cam.EndAcquisition()
-                self.cam.DeInit()
-                time.sleep(0.5)  # Wait longer for camera to reset
-                self.cam.Init()
-            except Exception as recovery_error:
-                print(f"Error during recovery: {recovery_error}")
-            # Don't try to display image_np if it failed - it may be None
+        # Dark frame subtraction, colour gains and grayscale conversion
+        self.display_image(self.correct_frame(frame), frame, throttle=True)
+
+        # Guide on every displayed frame
+        if self.is_tracking:
+            self.perform_tracking_update()
+        elif self.calibration_run is not None:
+            self.perform_calibration_update()
+
+        # Report shot-to-display latency for single shots
+        if info.get('requested_at') is not None:
+            displayed_at = time.perf_counter()
+            latency_ms = (displayed_at - info['requested_at']) * 1000
+            readout_ms = (info['received_at'] - info['triggered_at']) * 1000
+            print(f"Shot-to-display latency: {latency_ms:.1f} ms "
+                  f"(trigger-to-frame {readout_ms:.1f} ms, exposure {info['exposure_time']/1000:.1f} ms, {info['mode']} mode)")
+
+    def correct_frame(self, frame):
+        """
+        Run the correction stage on a raw pool frame and return the image to
+        display: the frame itself if there is nothing to correct, otherwise
+        the preallocated corrected_image buffer.
+        """
+        image_np = frame.array
+        luma = frame.info.get('display_mode') == "Grayscale"
+
+        # Windowed frames need the matching part of the dark frame
+        roi = frame.info.get('roi')
+        if roi != self.dark_roi:
+            self.dark_roi = roi
+            self.corrector.set_dark_frame(self.dark_frame_for_window(roi))
+
+        if self.corrector.is_identity(image_np, luma):
+            return image_np
+
+        shape = self.corrector.output_shape(image_np, luma)
+        if self.corrected_image is None or self.corrected_image.shape != shape or self.corrected_image.dtype != image_np.dtype:
+            self.corrected_image = np.empty(shape, dtype=image_np.dtype)
+        return self.corrector.correct(image_np, self.corrected_image, luma)
 
     def update_color_correction(self):
         """Update color correction labels and apply to current image"""
@@ -1186,40 +1512,40 @@ class MainWindow(QMainWindow):
         self.camera_controls.green_label.setText(f"Green: {self.camera_controls.green_slider.value()/100:.1f}x")
         self.camera_controls.blue_label.setText(f"Blue: {self.camera_controls.blue_slider.value()/100:.1f}x")
         
-        # If we have an image, apply color correction
-        if hasattr(self.imgplot, 'image_data') and self.imgplot.image_data is not None:
-            self.apply_color_correction()
+        self.apply_color_correction()
 
 
     def apply_color_correction(self):
-        """Apply color correction to the current image"""
-        if len(self.imgplot.image_data.shape) != 3:
-            return  # Skip if image is not RGB/BGR
-            
-        # Get correction factors
+        """Pass the slider gains to the correction stage and redo the frame on screen"""
         r_factor = self.camera_controls.red_slider.value() / 100
         g_factor = self.camera_controls.green_slider.value() / 100
         b_factor = self.camera_controls.blue_slider.value() / 100
-        
-        # Make a copy of the original image
-        corrected_image = self.imgplot.image_data.copy()
-        
-        # Apply correction factors (assuming BGR format from OpenCV)
-        corrected_image[:, :, 0] = np.clip(corrected_image[:, :, 0] * b_factor, 0, 255)
-        corrected_image[:, :, 1] = np.clip(corrected_image[:, :, 1] * g_factor, 0, 255)
-        corrected_image[:, :, 2] = np.clip(corrected_image[:, :, 2] * r_factor, 0, 255)
-        
-        # Update the display
-        self.imgplot.image_item.setImage(corrected_image)
-        
-        # Update pixel info display if mouse is hovering
-        self.imgplot.update_pixel_info()
+        self.corrector.set_gains(r_factor, g_factor, b_factor)
+
+        # The raw frame is still retained by the display, so correct it again
+        if self.displayed_frame is not None:
+            self.display_image(self.correct_frame(self.displayed_frame), self.displayed_frame)
+
+
+    def update_display_fps(self):
+        try:
+            self.display_fps = max(float(self.camera_controls.display_fps_edit.text()), 0.1)
+        except ValueError:
+            print("Invalid display fps, using 20")
+            self.camera_controls.display_fps_edit.setText("20")
+            self.display_fps = 20.0
 
+    def render_interval(self):
+        """Seconds between redraws: the display rate, stretched when drawing is slow"""
+        return max(1.0 / self.display_fps, self.render_time / self.render_load)
 
-    def display_image(self, image_np):
+    def display_image(self, image_np, frame=None, throttle=False):
         """
         Convert the NumPy image (which might be grayscale or color) to a QImage
-        and display it in the QLabel.
+        and display it in the QLabel. frame is the pool buffer image_np lives
+        in; it stays retained for as long as it is on screen. With throttle
+        the image becomes the current one (for guiding) straight away, but is
+        only drawn once render_interval() has passed since the last drawing.
         """
         # Safety check: make sure we have a valid image
         if image_np is None:
@@ -1234,15 +1560,39 @@ class MainWindow(QMainWindow):
         #     height, width = image_np.shape
         #     qimage = QImage(image_np.tobytes(), width, height, width, QImage.Format_Grayscale8)
         # else:
-        image_np = np.rot90(image_np, k=-1)  # k=-1 rotates 90 degrees clockwise
+        # The frame goes to pyqtgraph as it is; the row-major image item with
+        # the y axis pointing down shows it the right way up
+
+        # The image item keeps referencing this buffer (or corrected_image made
+        # from it) and slider changes correct it again, so hold on to it and
+        # hand the previous one back to the pool
+        if frame is not None:
+            frame.retain()
+        if self.displayed_frame is not None:
+            self.displayed_frame.release()
+        self.displayed_frame = frame
 
         self.imgplot.image_data = image_np
 
-        # Apply any existing color correction
-        if hasattr(self, 'red_slider'):
-            self.apply_color_correction()
-        else:
-            self.imgplot.image_item.setImage(image_np)
+        # A new size or window must be drawn at once so ROI slicing matches the image item
+        roi = frame.info.get('roi') if frame is not None else None
+        if throttle and image_np.shape == self.rendered_shape and roi == self.displayed_roi:
+            wait = self.render_interval() - (time.perf_counter() - self.last_render)
+            if wait > 0:
+                if not self.render_timer.isActive():
+                    self.render_timer.start(int(wait * 1000) + 1)
+                return
+        self.render_image()
+
+    def render_image(self):
+        """Draw the current image (imgplot.image_data) and the ROI views"""
+        self.render_timer.stop()
+        image_np = getattr(self.imgplot, 'image_data', None)
+        if image_np is None:
+            return
+        start = time.perf_counter()
+        self.imgplot.image_item.setImage(image_np)
+        self.place_image(self.displayed_frame.info.get('roi') if self.displayed_frame is not None else None)
         
         # Update pixel info display if mouse is hovering
         self.imgplot.update_pixel_info()
@@ -1254,6 +1604,86 @@ class MainWindow(QMainWindow):
             
         self.imgplot.update_roi_images()
 
+        self.rendered_shape = image_np.shape
+        self.last_render = time.perf_counter()
+        self.render_time = 0.8 * self.render_time + 0.2 * (self.last_render - start)
+        self.frames_rendered += 1
+
+    def update_pacing_status(self):
+        """Camera, processing and display rates and dropped frames in the status bar"""
+        received, rendered, since = self.pacing_counts
+        now = time.perf_counter()
+        elapsed = now - since
+        self.pacing_counts = (self.frames_received, self.frames_rendered, now)
+        if self.acquisition_worker is None:
+            self.pacing_label.setText("Camera not connected")
+            return
+        text = f"Frames {(self.frames_received - received) / elapsed:.1f} fps"
+        camera_fps = self.acquisition_worker.camera_fps
+        if camera_fps:
+            text += f" (camera {camera_fps:.1f})"
+        text += (f" | display {(self.frames_rendered - rendered) / elapsed:.1f} fps, "
+                 f"draw {self.render_time * 1000:.0f} ms, process {self.process_time * 1000:.0f} ms"
+                 f" | dropped {self.acquisition_worker.dropped}")
+        self.pacing_label.setText(text)
+
+    def place_image(self, roi):
+        """
+        Position the image in full-frame display coordinates. A camera window
+        is drawn where it sits on the sensor (scaled up by the binning), so
+        ROIs, the crosshair and pixel coordinates keep their full-frame meaning.
+        """
+        if roi == self.displayed_roi:
+            return
+        self.displayed_roi = roi
+        if roi is None or self.full_frame_size is None:
+            self.imgplot.image_item.resetTransform()
+            return
+        offset_x, offset_y, width, height = roi[:4]
+        self.imgplot.image_item.setRect(QtCore.QRectF(offset_x, offset_y, width, height))
+
+    def guide_window_rect(self):
+        """
+        Sensor window around ROI1, (offset_x, offset_y, width, height, binning)
+        in unbinned sensor pixels. The camera aligns it to its increments.
+        """
+        sensor_width, sensor_height = self.full_frame_size
+        pos, size = self.imgplot.ROI1.pos(), self.imgplot.ROI1.size()
+        extra_x = size[0] * (self.guide_window_margin - 1) / 2
+        extra_y = size[1] * (self.guide_window_margin - 1) / 2
+
+        # ROI1 is in display coordinates, which are full-frame sensor (column, row)
+        col0 = max(0, int(pos[0] - extra_x))
+        col1 = min(sensor_width, int(pos[0] + size[0] + extra_x))
+        row0 = max(0, int(pos[1] - extra_y))
+        row1 = min(sensor_height, int(pos[1] + size[1] + extra_y))
+        binning = int(self.camera_controls.binning_combobox.currentText().split('x')[0])
+        return (col0, row0, col1 - col0, row1 - row0, binning)
+
+    def set_guide_window(self, enabled):
+        """Switch between streaming the window around ROI1 and the full frame"""
+        if self.acquisition_worker is None:
+            if enabled:
+                print("Camera not connected")
+                self.camera_controls.guide_window_button.setChecked(False)
+            return
+        if not enabled:
+            self.acquisition_worker.set_roi(None)
+            print("Guide window off - streaming the full frame")
+            return
+        if self.full_frame_size is None:
+            print("Capture a full frame first to place ROI1 on the star")
+            self.camera_controls.guide_window_button.setChecked(False)
+            return
+        roi = self.guide_window_rect()
+        self.acquisition_worker.set_roi(roi)
+        print(f"Guide window requested around ROI1: {roi[2]}x{roi[3]} at ({roi[0]}, {roi[1]}), binning {roi[4]}x{roi[4]}")
+
+    def update_guide_window(self):
+        """Follow ROI1 or binning changes while the guide window is active"""
+        if self.camera_controls.guide_window_button.isChecked():
+            self.set_guide_window(True)
+
     def resize_rois(self, image_np):
         """Resize ROIs to 10% of the smallest image dimension"""
         if image_np is None:
@@ -1282,79 +1712,25 @@ class MainWindow(QMainWindow):
 
 
     def disconnec_camera(self):
-        # Properly deinitialize and release the camera in correct order.
-        # Order matters: camera -> camList -> system
+        # Stop the acquisition thread first so nothing else touches the camera,
+        # then let the backend release the camera in the correct order
         try:
-            # Step 1: Stop streaming and deinitialize camera
-            if hasattr(self, 'cam') and self.cam is not None:
-                try:
-                    if self.cam.IsStreaming():
-                        self.cam.EndAcquisition()
-                    self.cam.DeInit()
-                except Exception as e:
-                    print(f"Error deinitializing camera: {e}")
-                # Delete the camera reference
-                del self.cam
-                self.cam = None
-            
-            # Step 2: Clear the camera list (releases camera references)
-            if hasattr(self, 'camList') and self.camList is not None:
-                try:
-                    self.camList.Clear()
-                    # Small delay to ensure references are released
-                    time.sleep(0.1)
-                except Exception as e:
-                    print(f"Error clearing camera list: {e}")
-                # Delete the camera list reference
-                del self.camList
-                self.camList = None
-            
-            # Step 3: Release the system instance (must be last)
-            if hasattr(self, 'system') and self.system is not None:
-                try:
-                    self.system.ReleaseInstance()
-                except Exception as e:
-                    print(f"Error releasing system: {e}")
-                # Don't delete system - ReleaseInstance handles it
-                
+            if self.acquisition_worker is not None:
+                self.acquisition_worker.stop()
+                if not self.acquisition_worker.wait(10000):
+                    print("Warning: acquisition thread did not stop in time")
+                self.acquisition_worker = None
+                self.on_exposure_ended("stopped")
+
+            if self.camera is not None:
+                self.camera.close()
+                self.camera = None
+                self.camera_controls.connect_status.setText("Disconnected")
+
             print("Camera disconnected successfully")
         except Exception as e:
             print(f"Unexpected error disconnecting camera: {e}")
 
-    def best_fit_curve(x, y, t, degree=2):
-        """
-        Create a best fit curve function given arrays of x positions, y positions, and time t.
-
-        Parameters:
-            x (array-like): Array of x positions.
-            y (array-like): Array of y positions.
-            t (array-like): Time array corresponding to x and y positions.
-            degree (int): Degree of the polynomial fit (default is 2 for quadratic).
-
-        Returns:
-            tuple: Two functions (fx, fy) that predict x and y positions given time.
-        """
-        # Fit polynomial to x(t) and y(t)
-        x_coeffs = np.polyfit(t, x, degree)
-        y_coeffs = np.polyfit(t, y, degree)
-
-        # Create polynomial functions
-        fx = np.poly1d(x_coeffs)
-        fy = np.poly1d(y_coeffs)
-
-
-        # fx, fy = best_fit_curve(x_data, y_data, t_data)
-
-        # # Predict positions at t=2.5
-        # t_test = 2.5
-        # print("Predicted x:", fx(t_test))
-        # print("Predicted y:", fy(t_test))
-
-        return fx, fy
-            
-
-
-
     def track_and_reposition_zoom_region(self, img):
         """Find the brightest feature inside the second zoom region and reposition it."""
         # Get ROI2 position and size
@@ -1384,8 +1760,7 @@ class MainWindow(QMainWindow):
         self.imgplot.ROI2.setPos([new_x, new_y])
 
         # Log center position over time
-        self.region_center_positions_x.append(new_x + width // 2)
-        self.region_center_positions_y.append(new_y + height // 2)
+        self.record_trajectory(time.perf_counter(), new_x + width // 2, new_y + height // 2, source=ZOOM_REGION)
 
     def check_idle(self, period=600):
         #TODO: if no motion command has been issued in the last 10 minutes, disable motors
@@ -0,0 +1,451 @@
+import time
+import numpy as np
+from PyQt5.QtCore import QThread, QMutex, QWaitCondition, pyqtSignal
+
+from camera_backend import CameraError, CameraTimeout
+from framepool import FramePool
+
+
+class AcquisitionWorker(QThread):
+    """
+    Worker thread that owns the camera while Mothy is running.
+
+    Every blocking camera call (begin_acquisition, get_next_image, ...) happens
+    here so long exposures never freeze the GUI. The camera is any
+    camera_backend.CameraBackend (FLIR or simulator). Frames are written in place
+    into buffers borrowed from a framepool.FramePool and handed to the main
+    window through the frame_ready signal as a FrameBuffer, whose info dict
+    holds timestamps (time.perf_counter) describing the shot. The receiver
+    owns that reference and must release() it. When every buffer is still in
+    use the frame is read into a scratch array and dropped. With a star
+    detector set, info['stars'] also carries the frame's star catalog.
+    dropped counts those frames and camera_fps is the rate the camera
+    reports for the current settings (both read by the GUI for its status).
+
+    Single frames use software triggering when the camera supports it: the
+    camera stays initialized and streaming, and each shot only costs the
+    exposure plus readout.
+
+    Exposures of progress_min_exposure or longer are announced with
+    exposure_started (start time, seconds) and always followed by
+    exposure_ended ("done", "cancelled", "stopped" or "failed"), so the GUI
+    can show progress. cancel_exposure() abandons the shot within one poll
+    slice. Only one single frame is in flight at a time: request_single_frame()
+    refuses while a shot is pending instead of queueing another behind it.
+    """
+    frame_ready = pyqtSignal(object)  # framepool.FrameBuffer
+    error_occurred = pyqtSignal(str)
+    acquisition_started = pyqtSignal()
+    acquisition_stopped = pyqtSignal()
+    exposure_started = pyqtSignal(float, float)  # time.perf_counter() at the trigger, exposure in seconds
+    exposure_ended = pyqtSignal(str)
+
+    # GetNextImage is called in slices of this length so stop/mode requests
+    # are picked up even while waiting on a multi-second exposure
+    poll_timeout_ms = 500
+
+    # Frames that can be in flight at once (queued signal, display, tracking)
+    pool_size = 4
+
+    # Exposures at least this long (µs) report progress and can be cancelled
+    progress_min_exposure = 500000
+
+    def __init__(self, camera):
+        super().__init__()
+        self.camera = camera
+        self.mutex = QMutex()  # Protects the request flags and parameters below
+        self.condition = QWaitCondition()
+        self.is_running = False
+        self.continuous = False
+        self.single_requested = False
+        self.single_requested_at = None
+        self.single_active = False  # A single frame is being captured
+        self.cancel_requested = False
+        self.exposure_time = 10000  # µs
+        self.gain = 1.0
+        self.display_mode = "Color"
+        self.streaming_mode = None  # None, "Single", "Triggered" or "Continuous"
+        self.roi = None  # Sensor window in effect (offset_x, offset_y, width, height, binning), None = full frame
+        self.roi_request = None
+        self.roi_pending = False
+        self.pool = None  # Created from the first frame, replaced when the frame size changes
+        self.scratch = {}  # display mode -> array that dropped frames are read into
+        self.detector = None  # star_detect.StarDetector run on every delivered frame, or None
+        self.dropped = 0  # Frames read into scratch memory because every buffer was in use
+        self.camera_fps = None  # Camera's resulting frame rate, refreshed when exposure or mode change
+        self.rate_exposure = None  # Exposure camera_fps was read for
+
+    def set_parameters(self, exposure_time, gain, display_mode):
+        """Update the values applied before the next frame (thread-safe)"""
+        self.mutex.lock()
+        self.exposure_time = exposure_time
+        self.gain = gain
+        self.display_mode = display_mode
+        self.mutex.unlock()
+
+    def set_roi(self, roi):
+        """
+        Stream only a window of the sensor, (offset_x, offset_y, width, height,
+        binning) in unbinned sensor pixels, or the full frame if roi is None.
+        Applied before the next frame (thread-safe).
+        """
+        self.mutex.lock()
+        self.roi_request = roi
+        self.roi_pending = True
+        self.mutex.unlock()
+
+    def set_detector(self, detector):
+        """Detect stars in every frame with detector (None to stop); thread-safe"""
+        self.mutex.lock()
+        self.detector = detector
+        self.mutex.unlock()
+
+    def request_single_frame(self):
+        """
+        Ask for one frame; returns immediately. Returns False (and requests
+        nothing) while an earlier single frame is still pending.
+        """
+        self.mutex.lock()
+        busy = self.single_requested or self.single_active
+        if not busy:
+            self.single_requested = True
+            self.single_requested_at = time.perf_counter()
+            self.condition.wakeAll()
+        self.mutex.unlock()
+        return not busy
+
+    def cancel_exposure(self):
+        """Abandon the frame being exposed and any pending single frame (thread-safe)"""
+        self.mutex.lock()
+        self.single_requested = False
+        self.cancel_requested = True
+        self.condition.wakeAll()
+        self.mutex.unlock()
+
+    def is_cancelled(self):
+        self.mutex.lock()
+        cancelled = self.cancel_requested
+        self.mutex.unlock()
+        return cancelled
+
+    def start_continuous(self):
+        """Free-run at the camera's frame rate until stop_continuous() is called"""
+        self.mutex.lock()
+        self.continuous = True
+        self.condition.wakeAll()
+        self.mutex.unlock()
+
+    def stop_continuous(self):
+        self.mutex.lock()
+        self.continuous = False
+        self.condition.wakeAll()
+        self.mutex.unlock()
+
+    def stop(self):
+        """Stop the worker loop; call wait() afterwards before touching the camera"""
+        self.mutex.lock()
+        self.is_running = False
+        self.continuous = False
+        self.single_requested = False
+        self.condition.wakeAll()
+        self.mutex.unlock()
+
+    def wants_continuous(self):
+        self.mutex.lock()
+        continuous = self.is_running and self.continuous
+        self.mutex.unlock()
+        return continuous
+
+    def run(self):
+        """
+        Main acquisition loop. Sleeps until a single frame or continuous
+        capture is requested.
+        """
+        self.mutex.lock()
+        self.is_running = True
+        self.mutex.unlock()
+        self.acquisition_started.emit()
+
+        while True:
+            self.mutex.lock()
+            while self.is_running and not self.continuous and not self.single_requested:
+                self.condition.wait(self.mutex)
+            if not self.is_running:
+                self.mutex.unlock()
+                break
+            is_continuous = self.continuous
+            requested_at = None if is_continuous else self.single_requested_at
+            self.single_requested = False
+            self.single_active = not is_continuous
+            self.cancel_requested = False
+            exposure_time = self.exposure_time
+            gain = self.gain
+            display_mode = self.display_mode
+            roi_pending, roi = self.roi_pending, self.roi_request
+            self.roi_pending = False
+            self.mutex.unlock()
+
+            if roi_pending:
+                self.apply_roi(roi)
+            self.capture_frame(exposure_time, gain, display_mode, is_continuous, requested_at)
+
+            self.mutex.lock()
+            self.single_active = False
+            self.mutex.unlock()
+
+        self.end_acquisition()
+        self.acquisition_stopped.emit()
+
+    def detect_stars(self, frame):
+        """Attach the star catalog of the frame (in frame array pixels) to its info"""
+        self.mutex.lock()
+        detector = self.detector
+        self.mutex.unlock()
+        if detector is None:
+            return
+        try:
+            start = time.perf_counter()
+            frame.info['stars'] = detector.detect(frame.array)
+            frame.info['detect_ms'] = (time.perf_counter() - start) * 1000
+        except Exception as e:
+            print(f"Star detection error: {e}")
+
+    def stats(self):
+        return self.pool.stats() if self.pool is not None else "no frames"
+
+    def end_acquisition(self):
+        try:
+            self.camera.end_acquisition()
+        except CameraError as ex:
+            print(f"Error ending acquisition: {ex}")
+        self.streaming_mode = None
+
+    def apply_roi(self, roi):
+        """Reprogram the sensor window; acquisition restarts with the next frame"""
+        if roi == self.roi:
+            return
+        try:
+            if not self.camera.supports_roi():
+                print("Camera does not support a sensor window (ROI)")
+                return
+            if self.camera.is_streaming():
+                self.camera.end_acquisition()
+            self.streaming_mode = None
+            self.roi = self.camera.set_roi(roi)
+            if self.roi is None:
+                print("Camera streaming the full frame")
+            else:
+                offset_x, offset_y, width, height, binning = self.roi
+                print(f"Camera window: {width}x{height} at ({offset_x}, {offset_y}), binning {binning}x{binning}")
+        except Exception as e:
+            self.error_occurred.emit(f"Error setting camera window: {e}")
+
+    def apply_settings(self, exposure_time, gain, is_continuous, acquisition_mode=None):
+        """Push exposure, gain and acquisition mode to the camera. Returns the exposure actually set."""
+        try:
+            exposure_time = self.camera.apply_settings(exposure_time, gain, is_continuous, acquisition_mode)
+            if not is_continuous:
+                print(f"Exposure: {exposure_time} µs ({exposure_time/1000:.3f} ms), gain: {gain} dB")
+        except CameraError as ex:
+            print(f"Could not apply camera settings: {ex}")
+        return exposure_time
+
+    def update_frame_rate(self, exposure_time):
+        """Ask the camera what frame rate the current settings allow"""
+        self.rate_exposure = exposure_time
+        try:
+            self.camera_fps = self.camera.frame_rate()
+        except Exception as e:
+            print(f"Could not read camera frame rate: {e}")
+            self.camera_fps = None
+
+    def read_image(self, timeout_ms, display_mode, out=None):
+        """
+        Get the next image from the camera as a numpy array for the selected
+        display mode, written into out when it has the right shape.
+        Grayscale frames are delivered in color; the main window's
+        correction stage converts them together with the dark frame and gains.
+        """
+        if display_mode in ("Color", "Grayscale"):
+            image_np = self.camera.get_next_image(timeout_ms, "BGR8", out)
+        else:  # Mono mode
+            image_np = self.camera.get_next_image(timeout_ms, "Mono8", out)
+        return image_np
+
+    def acquire_buffer(self):
+        """Borrow a buffer from the pool. Returns None if there is no pool yet or it is exhausted."""
+        if self.pool is None:
+            return None
+        return self.pool.acquire()
+
+    def fill_buffer(self, frame, image_np):
+        """
+        Make sure image_np ends up in a pool buffer. Normally the camera already
+        wrote it into frame; otherwise (first frame, new frame size) the pool
+        is rebuilt for the new size and the image copied once.
+        """
+        if frame is not None and image_np is frame.array:
+            return frame
+        if frame is not None:
+            frame.release()
+        if self.pool is None or not self.pool.matches(image_np.shape, image_np.dtype):
+            if self.pool is not None:
+                print(f"Frame pool: {self.pool.stats()}")
+            self.pool = FramePool(image_np.shape, image_np.dtype, self.pool_size)
+        frame = self.pool.acquire()
+        if frame is not None:
+            np.copyto(frame.array, image_np)
+        return frame
+
+    def wait_for_image(self, timeout_ms, display_mode, is_continuous, out=None):
+        """
+        Read the next image in poll_timeout_ms slices until it arrives, the
+        overall timeout expires, or the capture is cancelled or no longer wanted.
+        Returns (image or None, received) where received is False if we gave up.
+        """
+        deadline = time.monotonic() + timeout_ms / 1000.0
+        while True:
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                raise CameraTimeout(f"Timed out after {timeout_ms} ms waiting for image")
+            try:
+                return self.read_image(min(remaining_ms, self.poll_timeout_ms), display_mode, out), True
+            except CameraTimeout:
+                # Timeout slice expired - give up quietly if we were asked to stop
+                if is_continuous and not self.wants_continuous():
+                    return None, False
+                if not self.is_running or self.is_cancelled():
+                    return None, False
+                if time.monotonic() >= deadline:
+                    raise
+
+    def capture_frame(self, exposure_time, gain, display_mode, is_continuous, requested_at=None):
+        """Capture a single frame from the camera"""
+        if is_continuous:
+            capture_mode = "Continuous"
+        elif self.camera.supports_software_trigger():
+            capture_mode = "Triggered"
+        else:
+            capture_mode = "Single"  # Legacy SingleFrame acquisition with a camera reset
+
+        frame = None
+        announced = False  # exposure_started was emitted
+        outcome = "failed"
+        try:
+            # Only restart acquisition when the mode changed or it is a legacy single shot
+            restart = capture_mode == "Single" or self.streaming_mode != capture_mode or not self.camera.is_streaming()
+            if restart:
+                # Stop any existing acquisition (AcquisitionMode/TriggerMode are locked while streaming)
+                if self.camera.is_streaming():
+                    self.camera.end_acquisition()
+                    self.streaming_mode = None
+                    time.sleep(0.1)  # Give camera time to stop
+
+                if capture_mode == "Single":
+                    # Reset the camera - only needed when software trigger is unavailable
+                    self.camera.reset()
+                self.camera.set_trigger(software=(capture_mode == "Triggered"))
+
+            # Only values that changed since the last frame are written
+            acquisition_mode = "SingleFrame" if capture_mode == "Single" else "Continuous"
+            exposure_time = self.apply_settings(exposure_time, gain, is_continuous, acquisition_mode)
+            if restart or exposure_time != self.rate_exposure:
+                self.update_frame_rate(exposure_time)
+
+            if restart:
+                # Begin new acquisition
+                self.camera.begin_acquisition()
+                self.streaming_mode = capture_mode
+                if capture_mode == "Single":
+                    time.sleep(0.1)  # Wait for acquisition to start
+                    print("Acquisition started, waiting for image...")
+
+            # Calculate timeout based on exposure time with generous buffer
+            # For short exposures: exposure + 3 seconds
+            # For long exposures (>1s): exposure * 2 + 5 seconds (double exposure time plus buffer)
+            if exposure_time > 1000000:  # If exposure > 1 second
+                timeout_ms = int(exposure_time / 1000 * 2) + 5000
+            else:
+                timeout_ms = max(3000, int(exposure_time / 1000) + 3000)
+
+            # Inform user about long exposure
+            if not is_continuous and exposure_time >= 500000:  # 500ms or longer
+                if exposure_time >= 1000000:  # 1 second or more
+                    print(f"Long exposure: {exposure_time/1000000:.1f} seconds. Please wait...")
+                    print(f"Using {timeout_ms/1000:.1f} second timeout")
+                else:
+                    print(f"Long exposure: {exposure_time/1000:.0f} ms. Please wait...")
+
+            # Borrow the buffer the camera writes into; if the consumers still
+            # hold every buffer, read into scratch memory and drop the frame
+            frame = self.acquire_buffer()
+            out = frame.array if frame is not None else self.scratch.get(display_mode)
+
+            triggered_at = time.perf_counter()
+            if capture_mode == "Triggered":
+                self.camera.fire_software_trigger()
+            if exposure_time >= self.progress_min_exposure:
+                self.exposure_started.emit(triggered_at, exposure_time / 1e6)
+                announced = True
+
+            image_np, received = self.wait_for_image(timeout_ms, display_mode, is_continuous, out)
+            if not received or image_np is None:
+                if frame is not None:
+                    frame.release()
+                outcome = "stopped"
+                if self.is_cancelled():
+                    # The camera is still exposing; restart acquisition so the
+                    # abandoned image is never delivered as the next shot
+                    outcome = "cancelled"
+                    print("Exposure cancelled")
+                    if self.camera.is_streaming():
+                        self.end_acquisition()
+                return
+            received_at = time.perf_counter()
+
+            # Only end acquisition for legacy single frames
+            if capture_mode == "Single":
+                self.camera.end_acquisition()
+                self.streaming_mode = None
+
+            outcome = "done"
+            if frame is None and self.pool is not None and self.pool.matches(image_np.shape, image_np.dtype):
+                if is_continuous:
+                    self.scratch[display_mode] = image_np  # Dropped, keep the array for the next drop
+                    self.dropped += 1
+                    return
+                # A requested shot is never dropped; give it a buffer of its own
+                frame = FramePool(image_np.shape, image_np.dtype, 1).acquire()
+                np.copyto(frame.array, image_np)
+                image_np = frame.array
+            frame = self.fill_buffer(frame, image_np)
+            if frame is None:
+                self.dropped += 1
+                return
+
+            frame.info = {
+                'mode': capture_mode,
+                'display_mode': display_mode,
+                'roi': self.roi,
+                'exposure_time': exposure_time,
+                'requested_at': requested_at,
+                'triggered_at': triggered_at,
+                'received_at': received_at,
+            }
+            self.detect_stars(frame)
+            self.frame_ready.emit(frame)
+            frame = None
+
+        except Exception as e:
+            if frame is not None:
+                frame.release()
+            self.error_occurred.emit(f"Error capturing image: {e}")
+            # Recovery procedure
+            try:
+                self.streaming_mode = None
+                self.camera.reset()
+            except Exception as recovery_error:
+                self.error_occurred.emit(f"Error during recovery: {recovery_error}")
+        finally:
+            if announced:
+                self.exposure_ended.emit(outcome)
@@ -0,0 +1,185 @@
+import numpy as np
+
+
+class StepCalibration:
+    """
+    Pixel -> motor step conversion for the guider.
+
+    matrix is 2x2 with rows Alt (motor 1) and Azi (motor 2) and columns the
+    guiding error axes (x, y) in sensor pixels (x along the columns, y down
+    the rows): the signed steps (positive =
+    forward) that move a star at error (x, y) back onto its target. A full
+    matrix handles camera rotation, mirrored axes and unequal scales; the
+    inverse converts sent steps back to pixels for the predictor.
+    """
+    def __init__(self, matrix, backlash=(0, 0)):
+        self.matrix = np.asarray(matrix, dtype=np.float64).reshape(2, 2)
+        self.inverse = np.linalg.inv(self.matrix)
+        self.backlash = tuple(int(round(b)) for b in backlash)  # Residual backlash measured, steps
+
+    @classmethod
+    def from_roi(cls, max_ud_steps, max_lr_steps, roi_width, roi_height):
+        """
+        Uncalibrated fallback: an error of half the ROI size maps to the
+        maximum D-pad steps, altitude forward for positive x and azimuth
+        forward for positive y.
+        """
+        return cls([[max_ud_steps / (roi_width / 2), 0.0],
+                    [0.0, max_lr_steps / (roi_height / 2)]])
+
+    def steps(self, error_x, error_y):
+        """Signed (Alt, Azi) steps that correct an error in pixels"""
+        alt, azi = self.matrix @ (error_x, error_y)
+        return float(alt), float(azi)
+
+    def pixels(self, steps_alt, steps_azi):
+        """Error in pixels that (Alt, Azi) steps correct"""
+        x, y = self.inverse @ (steps_alt, steps_azi)
+        return float(x), float(y)
+
+    def to_text(self):
+        """For QSettings: the four matrix entries and the two backlash values"""
+        return ",".join(f"{v:.6g}" for v in list(self.matrix.ravel()) + list(self.backlash))
+
+    @classmethod
+    def from_text(cls, text):
+        values = [float(v) for v in text.split(",")]
+        return cls(values[:4], values[4:6])
+
+    @classmethod
+    def from_display_text(cls, text):
+        """
+        Calibration saved while the display was rotated, when the error axes
+        were (up, right) on screen instead of sensor (column, row)
+        """
+        old = cls.from_text(text)
+        return cls(old.matrix @ [[0, -1], [1, 0]], old.backlash)
+
+    def describe(self):
+        # Star motion per 1000 steps of each motor and the angle between the two motions
+        motion = -self.inverse
+        alt_scale, azi_scale = np.hypot(motion[0], motion[1]) * 1000
+        angle = np.degrees(np.arctan2(motion[1], motion[0]))
+        between = abs((angle[1] - angle[0] + 180) % 360 - 180)
+        return (f"Alt {alt_scale:.1f} px/1000 steps at {angle[0]:.0f}°, Azi {azi_scale:.1f} px/1000 steps "
+                f"at {angle[1]:.0f}° ({between:.0f}° apart), residual backlash Alt {self.backlash[0]}, "
+                f"Azi {self.backlash[1]} steps")
+
+
+class CalibrationRun:
+    """
+    Jog sequence that measures a StepCalibration from the guide star.
+
+    Each motor is moved forward twice and backward twice by a known step
+    count, with the star position averaged over `samples` settled frames
+    after every move:
+
+    - the first forward move takes up the gear slack, so the second one
+      gives the star motion per step without backlash
+    - the first backward move loses the backlash before the star moves;
+      the shortfall against the forward motion is the residual backlash
+    - the second backward move brings the star back near its start
+
+    Feed add_sample() one position per usable frame; it returns the next
+    move as (motor, direction, steps), or None while averaging or when the
+    run is finished. result() raises ValueError if the star barely moved or
+    the two motors move it along nearly the same line.
+    """
+    sequence = [(1, "F"), (1, "F"), (1, "B"), (1, "B"),
+                (2, "F"), (2, "F"), (2, "B"), (2, "B")]
+
+    def __init__(self, steps, samples=3, min_shift=3.0, min_angle=30.0):
+        self.steps = steps  # (Alt, Azi) jog size in steps
+        self.samples = samples
+        self.min_shift = min_shift  # Star motion per jog needed for a usable calibration, px
+        self.min_angle = min_angle  # Smallest angle between the two motor directions, degrees
+        self.positions = []  # Averaged position at the start and after every move
+        self.pending = []
+
+    def add_sample(self, x, y):
+        self.pending.append((x, y))
+        if len(self.pending) < self.samples or self.finished():
+            return None
+        self.positions.append(np.mean(self.pending, axis=0))
+        self.pending = []
+        if self.finished():
+            return None
+        motor, direction = self.sequence[len(self.positions) - 1]
+        return motor, direction, self.steps[motor - 1]
+
+    def progress(self):
+        return f"{len(self.positions)}/{len(self.sequence) + 1}"
+
+    def finished(self):
+        return len(self.positions) > len(self.sequence)
+
+    def result(self):
+        """StepCalibration from the measured positions"""
+        columns = []
+        backlash = []
+        for motor in (1, 2):
+            base = 4 * (motor - 1)
+            slack_taken, forward, backward = self.positions[base + 1:base + 4]
+            steps = self.steps[motor - 1]
+            shift = forward - slack_taken
+            if np.hypot(*shift) < self.min_shift:
+                raise ValueError(f"Motor {motor} moved the star only {np.hypot(*shift):.1f} px in {steps} steps; "
+                                 f"use more steps")
+            column = shift / steps  # Star motion per forward step
+            # Steps of the backward move that actually moved the star along the forward direction
+            moved = np.dot(forward - backward, column) / np.dot(column, column)
+            columns.append(column)
+            backlash.append(steps - moved)
+
+        motion = np.column_stack(columns)  # Star pixels per (Alt, Azi) step
+        sine = abs(np.linalg.det(motion)) / (np.hypot(*columns[0]) * np.hypot(*columns[1]))
+        if sine < np.sin(np.radians(self.min_angle)):
+            raise ValueError(f"Motors move the star along nearly the same line "
+                             f"({np.degrees(np.arcsin(min(sine, 1.0))):.0f}° apart)")
+        # A correction moves the star against its error
+        return StepCalibration(-np.linalg.inv(motion), backlash)
+
+
+if __name__ == '__main__':
+    # Calibrate a simulated mount (rotated, mirrored, unequal scales, backlash) and guide with the result
+    rng = np.random.default_rng(0)
+    rotation = np.radians(25)
+    true_motion = np.array([[np.cos(rotation), -np.sin(rotation)],
+                            [np.sin(rotation), np.cos(rotation)]]) @ np.diag([0.08, -0.05])
+    true_backlash = np.array([40, 15])
+
+    class Mount:
+        """Star position driven by motors with gear slack"""
+        def __init__(self):
+            self.shaft = np.zeros(2)  # Output positions in steps
+            self.slack = np.zeros(2)  # Motor position within the slack band, 0..backlash
+            self.start = np.array([3.0, -2.0])
+
+        def move(self, motor, steps):
+            i = motor - 1
+            new_slack = np.clip(self.slack[i] + steps, 0, true_backlash[i])
+            self.shaft[i] += steps - (new_slack - self.slack[i])
+            self.slack[i] = new_slack
+
+        def star(self):
+            return self.start + true_motion @ self.shaft + rng.normal(0, 0.1, 2)
+
+    mount = Mount()
+    run = CalibrationRun(steps=(300, 400))
+    move = None
+    while not run.finished():
+        move = run.add_sample(*mount.star())
+        if move is not None:
+            motor, direction, steps = move
+            mount.move(motor, steps if direction == "F" else -steps)
+    calibration = run.result()
+    print(calibration.describe())
+    print(f"True residual backlash Alt {true_backlash[0]}, Azi {true_backlash[1]} steps")
+    ideal = -np.linalg.inv(true_motion)
+    print(f"Matrix error {np.abs(calibration.matrix - ideal).max() / np.abs(ideal).max() * 100:.1f}%")
+
+    # One full correction from a 12 px error
+    for name, cal in (("Calibrated", calibration), ("Uncalibrated (ROI scale)", StepCalibration.from_roi(100, 100, 40, 40))):
+        error = np.array([10.0, -6.0])
+        residual = error + true_motion @ np.array(cal.steps(*error))
+        print(f"{name:<26} error {np.hypot(*error):.1f} px -> {np.hypot(*residual):.2f} px after one correction")
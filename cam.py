@@ -1,5 +1,6 @@
 from PyQt5.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QSlider, QPushButton, QComboBox
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QSlider, QPushButton, QComboBox,
+    QProgressBar
 )
 from PyQt5.QtCore import Qt 
 import sys
@@ -26,6 +27,17 @@ class Controls(QWidget):
         connection_layout.addWidget(self.rm_hotspots_button)
         self.layout.addLayout(connection_layout)
 
+        # Camera backend (real FLIR camera or the star-field simulator)
+        backend_layout = QHBoxLayout()
+        backend_label = QLabel("Camera:")
+        backend_label.setFixedWidth(label_width)
+        self.backend_combobox = QComboBox()
+        self.backend_combobox.addItems(["FLIR", "Simulator"])
+        self.backend_combobox.setFixedWidth(edit_width)
+        backend_layout.addWidget(backend_label)
+        backend_layout.addWidget(self.backend_combobox)
+        self.layout.addLayout(backend_layout)
+
         # Exposure Time row
         exposure_layout = QHBoxLayout()
         exposure_label = QLabel("Exposure Time (µs):")
@@ -46,6 +58,16 @@ class Controls(QWidget):
         gain_layout.addWidget(self.gain_edit)
         self.layout.addLayout(gain_layout)
 
+        # Display rate, independent of the camera frame rate (every frame is still guided on)
+        display_fps_layout = QHBoxLayout()
+        display_fps_label = QLabel("Display fps:")
+        display_fps_label.setFixedWidth(label_width)
+        self.display_fps_edit = QLineEdit("20")
+        self.display_fps_edit.setFixedWidth(edit_width)
+        display_fps_layout.addWidget(display_fps_label)
+        display_fps_layout.addWidget(self.display_fps_edit)
+        self.layout.addLayout(display_fps_layout)
+
         color_mode_layout = QHBoxLayout()
         color_mode_label = QLabel("Color Mode:")
         color_mode_label.setFixedWidth(label_width)
@@ -55,7 +77,20 @@ class Controls(QWidget):
         color_mode_layout.addWidget(color_mode_label)
         color_mode_layout.addWidget(self.color_mode_combobox)
         self.layout.addLayout(color_mode_layout)
-        
+
+        # Guide window: stream only the area around ROI1 (with optional binning) for high frame rates
+        guide_window_layout = QHBoxLayout()
+        guide_window_label = QLabel("Guide Window:")
+        guide_window_label.setFixedWidth(label_width)
+        self.guide_window_button = QPushButton("Camera ROI")
+        self.guide_window_button.setCheckable(True)
+        self.binning_combobox = QComboBox()
+        self.binning_combobox.addItems(["1x1", "2x2", "4x4"])
+        guide_window_layout.addWidget(guide_window_label)
+        guide_window_layout.addWidget(self.guide_window_button)
+        guide_window_layout.addWidget(self.binning_combobox)
+        self.layout.addLayout(guide_window_layout)
+
         # Mode selection and start/stop button
         capture_layout = QHBoxLayout()
         
@@ -70,6 +105,20 @@ class Controls(QWidget):
         capture_layout.addWidget(capture_mode_label)
         capture_layout.addWidget(self.capture_mode_combobox)
         capture_layout.addWidget(self.capture_button)
+
+        # Long exposure progress, remaining time and cancel
+        exposure_progress_layout = QHBoxLayout()
+        self.exposure_progress = QProgressBar()
+        self.exposure_progress.setRange(0, 1000)
+        self.exposure_progress.setValue(0)
+        self.exposure_progress.setTextVisible(False)
+        self.exposure_remaining_label = QLabel("")
+        self.exposure_remaining_label.setFixedWidth(label_width)
+        self.cancel_exposure_button = QPushButton("Cancel")
+        self.cancel_exposure_button.setEnabled(False)
+        exposure_progress_layout.addWidget(self.exposure_progress)
+        exposure_progress_layout.addWidget(self.exposure_remaining_label)
+        exposure_progress_layout.addWidget(self.cancel_exposure_button)
         
              # Add RGB sliders
         color_layout = QVBoxLayout()
@@ -102,6 +151,7 @@ class Controls(QWidget):
         color_layout.addWidget(self.blue_slider)
         
         self.layout.addLayout(capture_layout)
+        self.layout.addLayout(exposure_progress_layout)
         self.layout.addLayout(color_layout)
         
         self.setLayout(self.layout)
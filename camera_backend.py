@@ -0,0 +1,646 @@
+import time
+import numpy as np
+
+try:
+    import PySpin
+except ImportError:  # Allows running against the simulator without the Spinnaker SDK
+    PySpin = None
+
+
+class CameraError(Exception):
+    """Raised by camera backends for acquisition failures"""
+
+
+class CameraTimeout(CameraError):
+    """No image arrived within the requested timeout"""
+
+
+class CameraBackend:
+    """
+    Interface between the acquisition threads and a camera.
+
+    A backend is opened once, then driven from a single acquisition thread:
+    settings are applied with apply_settings(), acquisition is started with
+    begin_acquisition(), and frames are read with get_next_image(), which
+    returns a numpy array that stays valid after the call. If an out array of
+    the right shape and dtype is passed, the frame is written into it instead
+    of a newly allocated array.
+
+    pixel_format is one of "BGR8", "RGB8" or "Mono8".
+    """
+    name = "Camera"
+
+    def open(self):
+        """Connect and initialize the camera. Returns True on success."""
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def is_streaming(self):
+        raise NotImplementedError
+
+    def begin_acquisition(self):
+        raise NotImplementedError
+
+    def end_acquisition(self):
+        raise NotImplementedError
+
+    def reset(self):
+        """Deinitialize and reinitialize the camera (legacy single frames and error recovery)"""
+        raise NotImplementedError
+
+    def supports_software_trigger(self):
+        return False
+
+    def set_trigger(self, software):
+        """Switch between free-running and software-triggered frame start (not while streaming)"""
+        raise NotImplementedError
+
+    def fire_software_trigger(self):
+        raise NotImplementedError
+
+    def apply_settings(self, exposure_time, gain, is_continuous, acquisition_mode=None):
+        """Write exposure (µs), gain (dB) and acquisition mode. Returns the exposure in effect."""
+        raise NotImplementedError
+
+    def set_acquisition_mode(self, acquisition_mode):
+        """Set the acquisition mode, "Continuous" or "SingleFrame" (not while streaming)"""
+        raise NotImplementedError
+
+    def supports_roi(self):
+        return False
+
+    def sensor_size(self):
+        """Full sensor size (width, height) in unbinned pixels"""
+        raise NotImplementedError
+
+    def set_roi(self, roi):
+        """
+        Stream only a window of the sensor (not while streaming). roi is
+        (offset_x, offset_y, width, height, binning) in unbinned sensor
+        pixels, or None for the full frame. Returns the window in effect
+        (aligned to what the camera accepts), or None for the full frame.
+        """
+        raise NotImplementedError
+
+    def get_next_image(self, timeout_ms, pixel_format, out=None):
+        """
+        Wait for the next frame. Returns the image as a numpy array (out, if
+        the frame fits it), None if the frame was incomplete, and raises
+        CameraTimeout if nothing arrived.
+        """
+        raise NotImplementedError
+
+    def frame_rate(self):
+        """Frame rate the camera can deliver with the current settings, or None if unknown"""
+        return None
+
+    def stats(self):
+        return ""
+
+
+class PySpinCamera(CameraBackend):
+    """FLIR camera driven through the Spinnaker SDK"""
+    name = "FLIR"
+
+    pixel_formats = {
+        "BGR8": "PixelFormat_BGR8",
+        "RGB8": "PixelFormat_RGB8",
+        "Mono8": "PixelFormat_Mono8",
+    }
+
+    def __init__(self, index=0):
+        if PySpin is None:
+            raise CameraError("PySpin is not installed")
+        self.index = index
+        self.system = None
+        self.cam_list = None
+        self.cam = None
+        self.config = None
+        self.processor = None
+
+    @staticmethod
+    def enumerate():
+        """Return a description string for every connected FLIR camera"""
+        if PySpin is None:
+            return []
+        descriptions = []
+        system = PySpin.System.GetInstance()
+        cam_list = system.GetCameras()
+        try:
+            for i in range(cam_list.GetSize()):
+                cam = cam_list[i]
+                nodemap_tldevice = cam.GetTLDeviceNodeMap()
+                node_device_serial_number = PySpin.CStringPtr(nodemap_tldevice.GetNode('DeviceSerialNumber'))
+                device_serial_number = "Unknown"
+                if PySpin.IsReadable(node_device_serial_number):
+                    device_serial_number = node_device_serial_number.GetValue()
+
+                node_device_model = PySpin.CStringPtr(nodemap_tldevice.GetNode('DeviceModelName'))
+                device_model = "Unknown"
+                if PySpin.IsReadable(node_device_model):
+                    device_model = node_device_model.GetValue()
+                descriptions.append(f"{device_model} ({device_serial_number})")
+                del cam
+        finally:
+            cam_list.Clear()
+            system.ReleaseInstance()
+        return descriptions
+
+    def open(self):
+        from camera_config import CameraConfig
+
+        # Initialize the PySpin system and connect to the requested camera.
+        self.system = PySpin.System.GetInstance()
+        self.cam_list = self.system.GetCameras()
+        if self.cam_list.GetSize() <= self.index:
+            print("No cameras detected!")
+            self.cam_list.Clear()
+            self.cam_list = None
+            self.system.ReleaseInstance()
+            self.system = None
+            return False
+
+        self.cam = self.cam_list[self.index]
+        self.cam.Init()
+        self.processor = PySpin.ImageProcessor()
+
+        # Resolve node handles once; only values that change are written afterwards
+        self.config = CameraConfig(self.cam)
+
+        # Configure camera for long exposures immediately after init
+        try:
+            s_nodemap = self.cam.GetTLStreamNodeMap()
+
+            # Configure stream layer for long exposures
+            try:
+                # Set stream buffer count mode to manual
+                stream_buffer_count_mode = PySpin.CEnumerationPtr(s_nodemap.GetNode('StreamBufferCountMode'))
+                if PySpin.IsAvailable(stream_buffer_count_mode) and PySpin.IsWritable(stream_buffer_count_mode):
+                    stream_buffer_count_mode.SetIntValue(stream_buffer_count_mode.GetEntryByName('Manual').GetValue())
+                    print("Stream buffer count mode set to Manual")
+
+                # Increase buffer count for long exposures
+                stream_buffer_count = PySpin.CIntegerPtr(s_nodemap.GetNode('StreamBufferCountManual'))
+                if PySpin.IsAvailable(stream_buffer_count) and PySpin.IsWritable(stream_buffer_count):
+                    stream_buffer_count.SetValue(10)
+                    print("Stream buffer count set to 10")
+
+                # Set buffer handling mode to NewestOnly to prevent memory issues
+                stream_buffer_handling = PySpin.CEnumerationPtr(s_nodemap.GetNode('StreamBufferHandlingMode'))
+                if PySpin.IsAvailable(stream_buffer_handling) and PySpin.IsWritable(stream_buffer_handling):
+                    stream_buffer_handling.SetIntValue(stream_buffer_handling.GetEntryByName('NewestOnly').GetValue())
+                    print("Stream buffer handling mode set to NewestOnly")
+            except Exception as stream_error:
+                print(f"Warning: Could not configure stream settings: {stream_error}")
+
+            # Disable frame rate control to allow long exposures
+            try:
+                if self.config.disable_frame_rate_limit():
+                    print("Frame rate control disabled - long exposures enabled")
+                else:
+                    print("Could not disable frame rate control (may not be available)")
+            except:
+                print("Could not disable frame rate control (may not be available)")
+
+            # Set frame rate to very low value (0.1 fps = 10 second max exposure theoretically)
+            try:
+                frame_rate = self.config.writable_node('AcquisitionFrameRate')
+                if frame_rate is not None:
+                    frame_rate_min = frame_rate.GetMin()
+                    frame_rate.SetValue(frame_rate_min)
+                    print(f"Frame rate set to minimum: {frame_rate_min} fps")
+            except Exception as fr_error:
+                print(f"Could not set frame rate: {fr_error}")
+
+            # Disable trigger mode
+            try:
+                if self.config.set_enum('TriggerMode', 'Off'):
+                    print("Trigger mode disabled")
+            except:
+                pass
+
+        except Exception as config_error:
+            print(f"Warning: Could not fully configure camera: {config_error}")
+        return True
+
+    def close(self):
+        # Properly deinitialize and release the camera in correct order.
+        # Order matters: camera -> camList -> system
+        if self.cam is not None:
+            try:
+                if self.cam.IsStreaming():
+                    self.cam.EndAcquisition()
+                self.cam.DeInit()
+            except Exception as e:
+                print(f"Error deinitializing camera: {e}")
+            del self.cam
+            self.cam = None
+            self.config = None
+
+        if self.cam_list is not None:
+            try:
+                self.cam_list.Clear()
+                # Small delay to ensure references are released
+                time.sleep(0.1)
+            except Exception as e:
+                print(f"Error clearing camera list: {e}")
+            self.cam_list = None
+
+        # Release the system instance (must be last)
+        if self.system is not None:
+            try:
+                self.system.ReleaseInstance()
+            except Exception as e:
+                print(f"Error releasing system: {e}")
+            self.system = None
+
+    def wrap_error(self, ex):
+        """Translate a SpinnakerException into CameraError/CameraTimeout"""
+        if getattr(ex, 'errorcode', None) == -1011 or 'timeout' in str(ex).lower():
+            return CameraTimeout(str(ex))
+        return CameraError(str(ex))
+
+    def is_streaming(self):
+        return self.cam is not None and self.cam.IsStreaming()
+
+    def begin_acquisition(self):
+        try:
+            self.cam.BeginAcquisition()
+        except PySpin.SpinnakerException as ex:
+            raise self.wrap_error(ex) from ex
+
+    def end_acquisition(self):
+        try:
+            if self.cam.IsStreaming():
+                self.cam.EndAcquisition()
+        except PySpin.SpinnakerException as ex:
+            raise self.wrap_error(ex) from ex
+
+    def reset(self):
+        try:
+            if self.cam.IsStreaming():
+                self.cam.EndAcquisition()
+            self.cam.DeInit()
+            time.sleep(0.2)  # Wait for camera to fully deinitialize
+            self.cam.Init()
+            time.sleep(0.3)  # Give camera time to initialize
+        except PySpin.SpinnakerException as ex:
+            raise self.wrap_error(ex) from ex
+        self.config.resolve_nodes()  # Node handles do not survive DeInit
+        self.config.invalidate()
+
+    def supports_software_trigger(self):
+        return self.config.supports_software_trigger()
+
+    def set_trigger(self, software):
+        try:
+            return self.config.set_trigger(software)
+        except PySpin.SpinnakerException as ex:
+            raise self.wrap_error(ex) from ex
+
+    def fire_software_trigger(self):
+        try:
+            self.config.fire_software_trigger()
+        except PySpin.SpinnakerException as ex:
+            raise self.wrap_error(ex) from ex
+
+    def apply_settings(self, exposure_time, gain, is_continuous, acquisition_mode=None):
+        try:
+            return self.config.apply(exposure_time, gain, is_continuous, acquisition_mode)
+        except PySpin.SpinnakerException as ex:
+            raise self.wrap_error(ex) from ex
+
+    def set_acquisition_mode(self, acquisition_mode):
+        try:
+            return self.config.set_enum('AcquisitionMode', acquisition_mode)
+        except PySpin.SpinnakerException as ex:
+            raise self.wrap_error(ex) from ex
+
+    def supports_roi(self):
+        return self.config.supports_roi()
+
+    def sensor_size(self):
+        try:
+            return self.config.sensor_size()
+        except PySpin.SpinnakerException as ex:
+            raise self.wrap_error(ex) from ex
+
+    def set_roi(self, roi):
+        try:
+            if roi is None:
+                self.config.set_full_frame()
+                return None
+            return self.config.set_roi(*roi)
+        except PySpin.SpinnakerException as ex:
+            raise self.wrap_error(ex) from ex
+
+    def get_next_image(self, timeout_ms, pixel_format, out=None):
+        try:
+            image_result = self.cam.GetNextImage(timeout_ms)
+        except PySpin.SpinnakerException as ex:
+            raise self.wrap_error(ex) from ex
+
+        try:
+            if image_result.IsIncomplete():
+                print("Image incomplete with status %d" % image_result.GetImageStatus())
+                return None
+            try:
+                fmt = getattr(PySpin, self.pixel_formats[pixel_format])
+                converted_image = self.processor.Convert(image_result, fmt)
+                image_np = converted_image.GetNDArray()
+            except (PySpin.SpinnakerException, AttributeError):
+                # Fallback to raw data if conversion fails
+                image_np = image_result.GetNDArray()
+            # Copy so the array stays valid once the camera buffer is released
+            if out is not None and out.shape == image_np.shape and out.dtype == image_np.dtype:
+                np.copyto(out, image_np)
+                return out
+            return np.array(image_np, copy=True)
+        finally:
+            image_result.Release()
+
+    def frame_rate(self):
+        if self.config is None:
+            return None
+        return self.config.get_float('AcquisitionResultingFrameRate')
+
+    def stats(self):
+        return self.config.stats() if self.config is not None else ""
+
+
+class SimulatedCamera(CameraBackend):
+    """
+    Synthetic star-field camera for running and load-testing Mothy without
+    hardware.
+
+    Renders drifting Gaussian stars on a noisy background with fixed hot
+    pixels. Frames are paced at min(fps, 1/exposure) and honour the same
+    continuous / single frame / software trigger semantics as the FLIR backend.
+    A sensor window (set_roi) is read out proportionally faster, like a
+    rolling-shutter CMOS sensor, and binning averages bin x bin blocks.
+    """
+    name = "Simulator"
+
+    def __init__(self, width=4096, height=3000, fps=60.0, num_stars=40,
+                 drift=(2.0, -1.0), fwhm=4.0, read_noise=3.0, bias=12,
+                 num_hot_pixels=300, seeing=0.15, noise_frames=3, seed=0):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.drift = np.asarray(drift, dtype=np.float64)  # pixels per second
+        self.sigma = fwhm / 2.3548
+        self.read_noise = read_noise
+        self.bias = bias
+        self.seeing = seeing  # RMS jitter in pixels per frame
+        self.noise_frames = noise_frames
+        self.rng = np.random.default_rng(seed)
+
+        # Star field: positions (x, y), peak brightness at 10 ms exposure and a colour tint (B, G, R)
+        self.star_xy = self.rng.uniform([0, 0], [width, height], size=(num_stars, 2))
+        self.star_peak = self.rng.uniform(20, 400, size=num_stars)
+        self.star_tint = self.rng.uniform(0.7, 1.0, size=(num_stars, 3))
+
+        # Hot pixels stay in place from frame to frame, like the real sensor
+        self.hot_y = self.rng.integers(0, height, size=num_hot_pixels)
+        self.hot_x = self.rng.integers(0, width, size=num_hot_pixels)
+        self.hot_value = self.rng.integers(80, 256, size=num_hot_pixels).astype(np.uint8)
+
+        self.noise_bank = {}  # pixel_format -> list of precomputed background frames
+        self.opened = False
+        self.streaming = False
+        self.trigger_software = False
+        self.acquisition_mode = "Continuous"
+        self.exposure_time = 10000.0
+        self.gain = 0.0
+        self.start_time = None
+        self.next_frame_time = None
+        self.pending_trigger_time = None
+        self.frame_count = 0
+        self.roi = None  # (offset_x, offset_y, width, height, binning) or None for the full sensor
+
+    def open(self):
+        self.opened = True
+        self.start_time = time.perf_counter()
+        print(f"Simulated camera: {self.width}x{self.height} @ {self.fps:g} fps, {len(self.star_xy)} stars")
+        return True
+
+    def close(self):
+        self.streaming = False
+        self.opened = False
+
+    def is_streaming(self):
+        return self.streaming
+
+    def frame_period(self):
+        rows = self.roi[3] if self.roi is not None else self.height
+        return max(rows / (self.fps * self.height), self.exposure_time / 1e6)
+
+    def begin_acquisition(self):
+        if not self.opened:
+            raise CameraError("Camera not initialized")
+        self.streaming = True
+        self.pending_trigger_time = None
+        self.next_frame_time = time.perf_counter() + self.exposure_time / 1e6
+
+    def end_acquisition(self):
+        self.streaming = False
+
+    def reset(self):
+        self.streaming = False
+
+    def supports_software_trigger(self):
+        return True
+
+    def set_trigger(self, software):
+        if self.streaming:
+            raise CameraError("Trigger mode cannot change while streaming")
+        self.trigger_software = software
+        return True
+
+    def fire_software_trigger(self):
+        self.pending_trigger_time = time.perf_counter()
+
+    def apply_settings(self, exposure_time, gain, is_continuous, acquisition_mode=None):
+        self.exposure_time = min(max(float(exposure_time), 10.0), 30e6)
+        self.gain = min(max(float(gain), 0.0), 47.0)
+        if acquisition_mode is None:
+            acquisition_mode = 'Continuous' if is_continuous else 'SingleFrame'
+        if not self.streaming:
+            self.acquisition_mode = acquisition_mode
+        return self.exposure_time
+
+    def set_acquisition_mode(self, acquisition_mode):
+        if self.streaming:
+            raise CameraError("Acquisition mode cannot change while streaming")
+        self.acquisition_mode = acquisition_mode
+        return True
+
+    def supports_roi(self):
+        return True
+
+    def sensor_size(self):
+        return self.width, self.height
+
+    def set_roi(self, roi):
+        if self.streaming:
+            raise CameraError("Sensor window cannot change while streaming")
+        if roi is None:
+            self.roi = None
+            return None
+        offset_x, offset_y, width, height, binning = roi
+        binning = max(1, int(binning))
+        # Sizes and offsets in multiples of 4 binned pixels, like typical camera increments
+        align = 4 * binning
+        width = max(align, min(int(width), self.width) // align * align)
+        height = max(align, min(int(height), self.height) // align * align)
+        offset_x = min(max(int(offset_x), 0), self.width - width) // align * align
+        offset_y = min(max(int(offset_y), 0), self.height - height) // align * align
+        self.roi = (offset_x, offset_y, width, height, binning)
+        return self.roi
+
+    def get_next_image(self, timeout_ms, pixel_format, out=None):
+        if not self.streaming:
+            raise CameraError("Camera is not streaming")
+
+        # When is the next frame due?
+        if self.trigger_software:
+            ready_at = None
+            if self.pending_trigger_time is not None:
+                ready_at = self.pending_trigger_time + self.exposure_time / 1e6
+        else:
+            ready_at = self.next_frame_time
+
+        now = time.perf_counter()
+        if ready_at is None or ready_at - now > timeout_ms / 1000.0:
+            time.sleep(timeout_ms / 1000.0)
+            raise CameraTimeout(f"No image within {timeout_ms} ms")
+        if ready_at > now:
+            time.sleep(ready_at - now)
+
+        if self.trigger_software:
+            self.pending_trigger_time = None
+        elif self.acquisition_mode == 'SingleFrame':
+            self.next_frame_time = None
+        else:
+            # Free-running: keep the frame clock, but do not build up a backlog
+            self.next_frame_time = max(ready_at + self.frame_period(), time.perf_counter())
+
+        self.frame_count += 1
+        return self.render(ready_at - self.start_time, pixel_format, out)
+
+    def background(self, pixel_format):
+        """Bias + read noise frame, taken from a small bank of precomputed frames"""
+        bank = self.noise_bank.get(pixel_format)
+        if bank is None:
+            mono = self.noise_bank.get("Mono8")
+            if mono is None:
+                mono = []
+                for _ in range(self.noise_frames):
+                    noise = self.rng.standard_normal((self.height, self.width), dtype=np.float32)
+                    noise *= self.read_noise
+                    noise += self.bias
+                    mono.append(np.clip(noise, 0, 255).astype(np.uint8))
+                self.noise_bank["Mono8"] = mono
+            if pixel_format == "Mono8":
+                bank = mono
+            else:
+                # Colour frames reuse the mono noise, a different frame per channel
+                n = len(mono)
+                bank = [np.stack([mono[k], mono[(k + 1) % n], mono[(k + 2) % n]], axis=2) for k in range(n)]
+            self.noise_bank[pixel_format] = bank
+        return bank[self.frame_count % len(bank)]
+
+    def render(self, t, pixel_format, out=None):
+        offset_x, offset_y, width, height, binning = self.roi or (0, 0, self.width, self.height, 1)
+        background = self.background(pixel_format)[offset_y:offset_y + height, offset_x:offset_x + width]
+        if binning == 1 and out is not None and out.shape == background.shape and out.dtype == background.dtype:
+            frame = out
+            np.copyto(frame, background)
+        else:
+            frame = background.copy()
+
+        # Star positions at time t, with some seeing jitter, relative to the window
+        xy = self.star_xy + self.drift * t + self.rng.normal(0, self.seeing, size=self.star_xy.shape)
+        xy[:, 0] %= self.width
+        xy[:, 1] %= self.height
+        xy -= (offset_x, offset_y)
+
+        # Signal scales with exposure and gain (dB)
+        scale = (self.exposure_time / 10000.0) * 10 ** (self.gain / 20.0)
+        peaks = self.star_peak * scale
+
+        # All stamps are rendered in one batch: separable Gaussians, (N, S) x (N, S) -> (N, S, S)
+        radius = int(np.ceil(3 * self.sigma))
+        offsets = np.arange(-radius, radius + 1)
+        centers = np.floor(xy).astype(np.int64)
+        gx = np.exp(-((centers[:, 0:1] + offsets - xy[:, 0:1]) ** 2) / (2 * self.sigma ** 2))
+        gy = np.exp(-((centers[:, 1:2] + offsets - xy[:, 1:2]) ** 2) / (2 * self.sigma ** 2))
+        stamps = peaks[:, None, None] * gy[:, :, None] * gx[:, None, :]
+
+        for i in range(len(xy)):
+            cx, cy = centers[i]
+            x0, x1 = max(cx - radius, 0), min(cx + radius + 1, width)
+            y0, y1 = max(cy - radius, 0), min(cy + radius + 1, height)
+            if x0 >= x1 or y0 >= y1:
+                continue
+            stamp = stamps[i, y0 - (cy - radius):y1 - (cy - radius), x0 - (cx - radius):x1 - (cx - radius)]
+            region = frame[y0:y1, x0:x1]
+            if pixel_format == "Mono8":
+                frame[y0:y1, x0:x1] = np.minimum(region + stamp, 255)
+            else:
+                tint = self.star_tint[i] if pixel_format == "BGR8" else self.star_tint[i][::-1]
+                frame[y0:y1, x0:x1] = np.minimum(region + stamp[..., None] * tint, 255)
+
+        hot = (self.hot_x >= offset_x) & (self.hot_x < offset_x + width) & \
+              (self.hot_y >= offset_y) & (self.hot_y < offset_y + height)
+        hot_y, hot_x = self.hot_y[hot] - offset_y, self.hot_x[hot] - offset_x
+        if pixel_format == "Mono8":
+            frame[hot_y, hot_x] = self.hot_value[hot]
+        else:
+            frame[hot_y, hot_x] = self.hot_value[hot][:, None]
+
+        if binning > 1:
+            shape = (height // binning, binning, width // binning, binning) + frame.shape[2:]
+            binned = frame.reshape(shape).mean(axis=(1, 3)).astype(np.uint8)
+            if out is not None and out.shape == binned.shape and out.dtype == binned.dtype:
+                np.copyto(out, binned)
+                return out
+            return binned
+        return frame
+
+    def frame_rate(self):
+        return 1.0 / self.frame_period()
+
+    def stats(self):
+        return f"{self.frame_count} simulated frames"
+
+
+def create_backend(name, **kwargs):
+    """Create a camera backend by name ("FLIR" or "Simulator")"""
+    if name == SimulatedCamera.name:
+        return SimulatedCamera(**kwargs)
+    return PySpinCamera(**kwargs)
+
+
+if __name__ == '__main__':
+    # Quick throughput check of the simulator (no GUI)
+    import sys
+    width, height = 4096, 3000
+    if len(sys.argv) > 1:
+        width, height = (int(v) for v in sys.argv[1].split('x'))
+    for pixel_format in ("Mono8", "BGR8"):
+        sim = SimulatedCamera(width=width, height=height, fps=1000.0)
+        sim.open()
+        sim.apply_settings(1000, 0, True)
+        sim.set_trigger(False)
+        sim.begin_acquisition()
+        sim.get_next_image(1000, pixel_format)  # Builds the noise bank
+        n = 60
+        start = time.perf_counter()
+        for _ in range(n):
+            sim.get_next_image(1000, pixel_format)
+        elapsed = time.perf_counter() - start
+        print(f"{pixel_format}: {n / elapsed:.1f} fps max render rate at {width}x{height}")
+        sim.close()
@@ -0,0 +1,243 @@
+import PySpin
+
+
+class CameraConfig:
+    """
+    Cached GenICam node handles plus a shadow copy of the values last
+    written to the camera.
+
+    Node pointers are resolved once (resolve_nodes) instead of going through
+    nodemap.GetNode for every frame, and a setter only talks to the camera
+    when the requested value differs from the shadow copy. Every write that
+    could be skipped is counted in skipped_writes.
+    """
+    # name -> PySpin pointer type
+    NODE_TYPES = {
+        'AcquisitionFrameRateEnable': PySpin.CBooleanPtr,
+        'AcquisitionFrameRateAuto': PySpin.CEnumerationPtr,
+        'AcquisitionFrameRate': PySpin.CFloatPtr,
+        'TriggerMode': PySpin.CEnumerationPtr,
+        'TriggerSelector': PySpin.CEnumerationPtr,
+        'TriggerSource': PySpin.CEnumerationPtr,
+        'TriggerSoftware': PySpin.CCommandPtr,
+        'ExposureAuto': PySpin.CEnumerationPtr,
+        'ExposureMode': PySpin.CEnumerationPtr,
+        'ExposureTime': PySpin.CFloatPtr,
+        'GainAuto': PySpin.CEnumerationPtr,
+        'Gain': PySpin.CFloatPtr,
+        'AcquisitionMode': PySpin.CEnumerationPtr,
+        'OffsetX': PySpin.CIntegerPtr,
+        'OffsetY': PySpin.CIntegerPtr,
+        'Width': PySpin.CIntegerPtr,
+        'Height': PySpin.CIntegerPtr,
+        'WidthMax': PySpin.CIntegerPtr,
+        'HeightMax': PySpin.CIntegerPtr,
+        'BinningHorizontal': PySpin.CIntegerPtr,
+        'BinningVertical': PySpin.CIntegerPtr,
+        'AcquisitionResultingFrameRate': PySpin.CFloatPtr,
+    }
+
+    def __init__(self, cam):
+        self.cam = cam
+        self.nodes = {}
+        self.applied = {}  # Shadow copy: node name -> last value written
+        self.writes = 0
+        self.skipped_writes = 0
+        self.resolve_nodes()
+
+    def resolve_nodes(self):
+        """Look up every node once. Must be repeated after cam.DeInit()/Init()."""
+        nodemap = self.cam.GetNodeMap()
+        self.nodes = {}
+        for name, ptr_type in self.NODE_TYPES.items():
+            try:
+                node = ptr_type(nodemap.GetNode(name))
+                if PySpin.IsAvailable(node):
+                    self.nodes[name] = node
+            except PySpin.SpinnakerException:
+                pass
+
+    def invalidate(self):
+        """Forget the shadow copy so the next apply() writes everything again"""
+        self.applied = {}
+
+    def has_node(self, name):
+        return name in self.nodes
+
+    def writable_node(self, name):
+        node = self.nodes.get(name)
+        if node is not None and PySpin.IsWritable(node):
+            return node
+        return None
+
+    def is_current(self, name, value):
+        if name in self.applied and self.applied[name] == value:
+            self.skipped_writes += 1
+            return True
+        return False
+
+    def set_enum(self, name, entry_name):
+        """Set an enumeration node by entry name. Returns True if the value is in effect."""
+        if self.is_current(name, entry_name):
+            return True
+        node = self.writable_node(name)
+        if node is None:
+            return False
+        node.SetIntValue(node.GetEntryByName(entry_name).GetValue())
+        self.applied[name] = entry_name
+        self.writes += 1
+        return True
+
+    def set_bool(self, name, value):
+        if self.is_current(name, value):
+            return True
+        node = self.writable_node(name)
+        if node is None:
+            return False
+        node.SetValue(value)
+        self.applied[name] = value
+        self.writes += 1
+        return True
+
+    def set_float(self, name, value):
+        """
+        Set a float node, clamped to its range. Returns (value_in_effect, was_clamped),
+        or (None, False) if the node cannot be written.
+        """
+        if self.is_current(name, value):
+            return self.applied[name + '.actual'], False
+        node = self.writable_node(name)
+        if node is None:
+            return None, False
+        actual = max(min(value, node.GetMax()), node.GetMin())
+        node.SetValue(actual)
+        # Shadow the requested value so the same request is skipped next time,
+        # and remember what the camera actually accepted
+        self.applied[name] = value
+        self.applied[name + '.actual'] = actual
+        self.writes += 1
+        return actual, actual != value
+
+    def set_int(self, name, value):
+        """
+        Set an integer node, rounded down to its increment and clamped to its
+        range. Returns the value in effect, or None if the node cannot be written.
+        """
+        node = self.writable_node(name)
+        if node is None:
+            return None
+        minimum, maximum, increment = node.GetMin(), node.GetMax(), max(node.GetInc(), 1)
+        actual = max(min(value, maximum), minimum)
+        actual = minimum + (actual - minimum) // increment * increment
+        if self.is_current(name, actual):
+            return actual
+        node.SetValue(actual)
+        self.applied[name] = actual
+        self.writes += 1
+        return actual
+
+    def get_int(self, name):
+        node = self.nodes.get(name)
+        if node is None or not PySpin.IsReadable(node):
+            return None
+        return node.GetValue()
+
+    def get_float(self, name):
+        node = self.nodes.get(name)
+        if node is None or not PySpin.IsReadable(node):
+            return None
+        return node.GetValue()
+
+    def supports_roi(self):
+        return all(self.has_node(name) for name in ('OffsetX', 'OffsetY', 'Width', 'Height', 'WidthMax', 'HeightMax'))
+
+    def sensor_size(self):
+        """Full sensor size (width, height) in unbinned pixels"""
+        binning_h = self.get_int('BinningHorizontal') or 1
+        binning_v = self.get_int('BinningVertical') or 1
+        return self.get_int('WidthMax') * binning_h, self.get_int('HeightMax') * binning_v
+
+    def set_roi(self, offset_x, offset_y, width, height, binning=1):
+        """
+        Program the sensor window and binning. The arguments are in unbinned
+        sensor pixels; the camera's nodes count binned pixels, so values are
+        converted and aligned to the node increments. The camera must not be
+        streaming. Returns the window in effect as
+        (offset_x, offset_y, width, height, binning) in unbinned pixels.
+        """
+        # Offsets first, so the window may grow; binning next, since it changes the maximum sizes
+        self.set_int('OffsetX', 0)
+        self.set_int('OffsetY', 0)
+        binning_h = self.set_int('BinningHorizontal', binning) or 1
+        binning_v = self.set_int('BinningVertical', binning) or 1
+        width = self.set_int('Width', width // binning_h)
+        height = self.set_int('Height', height // binning_v)
+        offset_x = self.set_int('OffsetX', offset_x // binning_h) or 0
+        offset_y = self.set_int('OffsetY', offset_y // binning_v) or 0
+        return offset_x * binning_h, offset_y * binning_v, width * binning_h, height * binning_v, binning_h
+
+    def set_full_frame(self):
+        """Undo set_roi: no binning and the whole sensor"""
+        self.set_int('OffsetX', 0)
+        self.set_int('OffsetY', 0)
+        self.set_int('BinningHorizontal', 1)
+        self.set_int('BinningVertical', 1)
+        self.set_int('Width', self.get_int('WidthMax'))
+        self.set_int('Height', self.get_int('HeightMax'))
+
+    def disable_frame_rate_limit(self):
+        """Turn off frame rate control so exposures can be longer than one frame period"""
+        if self.set_bool('AcquisitionFrameRateEnable', False):
+            return True
+        # Older firmware uses AcquisitionFrameRateAuto instead
+        return self.set_enum('AcquisitionFrameRateAuto', 'Off')
+
+    def supports_software_trigger(self):
+        return all(self.has_node(name) for name in ('TriggerMode', 'TriggerSource', 'TriggerSoftware'))
+
+    def set_trigger(self, software):
+        """
+        Switch between free-running (software=False) and software-triggered
+        frame start. The camera must not be streaming when this changes.
+        """
+        if not software:
+            return self.set_enum('TriggerMode', 'Off')
+        # TriggerSource can only be changed while TriggerMode is Off
+        if self.applied.get('TriggerSource') != 'Software' or self.applied.get('TriggerMode') != 'On':
+            self.set_enum('TriggerMode', 'Off')
+            if self.has_node('TriggerSelector'):
+                self.set_enum('TriggerSelector', 'FrameStart')
+            self.set_enum('TriggerSource', 'Software')
+        return self.set_enum('TriggerMode', 'On')
+
+    def fire_software_trigger(self):
+        self.nodes['TriggerSoftware'].Execute()
+
+    def apply(self, exposure_time, gain, is_continuous, acquisition_mode=None):
+        """
+        Bring exposure, gain and acquisition mode up to date, writing only
+        what changed. Returns the exposure time in effect (µs).
+        """
+        self.set_enum('ExposureAuto', 'Off')
+        self.set_enum('ExposureMode', 'Timed')
+        actual_exposure, was_clamped = self.set_float('ExposureTime', exposure_time)
+        if actual_exposure is None:
+            if not is_continuous:
+                print("Exposure time node not available/writable")
+            actual_exposure = exposure_time
+        elif was_clamped and not is_continuous:
+            print(f"WARNING: Requested exposure {exposure_time} µs is outside the camera range!")
+            print(f"         Using {actual_exposure} µs ({actual_exposure/1000:.3f} ms)")
+
+        self.set_enum('GainAuto', 'Off')
+        actual_gain, _ = self.set_float('Gain', gain)
+        if actual_gain is None and not is_continuous:
+            print("Gain node not available/writable")
+
+        if acquisition_mode is None:
+            acquisition_mode = 'Continuous' if is_continuous else 'SingleFrame'
+        self.set_enum('AcquisitionMode', acquisition_mode)
+        return actual_exposure
+
+    def stats(self):
+        return f"{self.writes} node writes, {self.skipped_writes} skipped (unchanged)"
@@ -79,9 +79,23 @@ class DPad(QWidget):
         nf_layout.addWidget(lr_label)
         nf_layout.addWidget(self.nf_lineedit)
 
+        # Held arrow keys run the motors continuously at this speed (empty = one step move per press)
+        jog_layout = QHBoxLayout()
+        jog_label = QLabel("Jog:")
+        self.jog_lineedit = QLineEdit()
+        self.jog_lineedit.setPlaceholderText("steps/s for held arrow keys")
+        jog_layout.addWidget(jog_label)
+        jog_layout.addWidget(self.jog_lineedit)
+
         controls_layout.addLayout(ud_layout)
         controls_layout.addLayout(lr_layout)
         controls_layout.addLayout(nf_layout)
+        controls_layout.addLayout(jog_layout)
+
+        # Pixel-to-step calibration: jogs both axes by the U/D and L/R steps
+        self.calibrate_button = QPushButton("Calibrate")
+        self.calibrate_button.setCheckable(True)
+        controls_layout.addWidget(self.calibrate_button)
 
         self.layout.addLayout(controls_layout)
 
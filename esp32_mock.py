@@ -0,0 +1,654 @@
+import json
+import math
+import random
+import socket
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class MockMove:
+    """
+    One queued move and its speed profile, as the firmware's step timer runs
+    it: the longest axis ramps linearly in time from start_rate to max_rate
+    over accel_time, cruises, and ramps down over the same distance; the
+    other axes step in proportion.
+    """
+    def __init__(self, move_id, steps, max_rate, accel_time, start_rate=250.0):
+        self.id = move_id
+        self.steps = list(steps)  # Signed, including backlash take-up
+        self.total = max(abs(s) for s in steps)
+        self.start = None  # Device time the move started
+        if start_rate > max_rate or accel_time < 0.001:
+            start_rate = max_rate
+        self.start_rate = start_rate
+        self.accel = (max_rate - start_rate) / accel_time if max_rate > start_rate else 0.0
+        if self.accel > 0:
+            ramp = (start_rate + max_rate) / 2 * accel_time
+            if 2 * ramp > self.total:
+                max_rate = math.sqrt(start_rate ** 2 + self.accel * self.total)  # Triangle profile
+            self.ramp_time = (max_rate - start_rate) / self.accel
+        else:
+            self.ramp_time = 0.0
+        self.peak = max_rate
+        self.ramp_steps = (start_rate + max_rate) / 2 * self.ramp_time
+        self.cruise_time = (self.total - 2 * self.ramp_steps) / max_rate if max_rate > 0 else 0.0
+        self.duration = 2 * self.ramp_time + self.cruise_time
+
+    def progress(self, t):
+        """(steps done on the longest axis, its step rate) t seconds after the start"""
+        t = min(max(t, 0.0), self.duration)
+        if t < self.ramp_time:
+            rate = self.start_rate + self.accel * t
+            return (self.start_rate + rate) / 2 * t, rate
+        t -= self.ramp_time
+        if t < self.cruise_time:
+            return self.ramp_steps + self.peak * t, self.peak
+        t -= self.cruise_time
+        rate = self.peak - self.accel * t
+        return min(self.total, self.ramp_steps + self.peak * self.cruise_time + (self.peak + rate) / 2 * t), rate
+
+    def axis_steps(self, done):
+        """Signed steps of each axis after `done` steps of the longest axis"""
+        if self.total == 0:
+            return [0] * len(self.steps)
+        return [int(math.copysign(int(abs(s) * done / self.total), s)) for s in self.steps]
+
+
+class MockESP32:
+    """
+    Local stand-in for the inoesp32 firmware, for testing the motor command
+    paths (D-pad, guiding, calibration, benchmarks) without the board.
+
+    Serves the firmware's HTTP API (/command, /command_batch, /move_status,
+    /set_velocity, /get_positions, ...) from a single-threaded server like
+    the ESP32 WebServer, and the binary UDP control channel and telemetry
+    push on udp_port. Moves run from the same 8-entry queue with backlash
+    take-up and a simulated trapezoidal step profile (velocity / 2 steps/s,
+    as the firmware); jogs run at constant speed and stop when not
+    renewed. Every reply waits latency + uniform(0, jitter) seconds, and
+    loss is the fraction of replies and telemetry packets that are dropped
+    (an HTTP request then gets its connection closed).
+
+    Point Mothy.py at it with "127.0.0.1:<http_port>" as the ESP32 IP.
+    """
+    queue_size = 8  # Like MOVE_QUEUE_SIZE: one slot stays free
+    MOTOR_COUNT = 2
+
+    def __init__(self, http_port=8080, udp_port=4210, latency=0.0, jitter=0.0, loss=0.0, host="127.0.0.1"):
+        self.host = host
+        self.http_port = http_port
+        self.udp_port = udp_port
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.lock = threading.Lock()
+        self.booted = time.monotonic()
+
+        self.velocity = [15000, 15000]
+        self.accel_time = [0.1, 0.1]
+        self.backlash = [0, 0]
+        self.resolution = [200.0, 200.0]
+        self.units = ["degrees", "degrees"]
+        self.soft_limits = [(-1000000, 1000000)] * 2
+        self.enabled = [True, True]
+        self.positions = [0, 0]  # At the start of the running move
+        self.queue = []  # MockMove, the running one first
+        self.queued_direction = [True, True]
+        self.next_id = 1
+        self.completed = 0
+        self.aborted = 0  # Newest move an emergency stop cut short or dropped
+        self.jog_rates = [0, 0]  # Requested, steps/s
+        self.jog_renewed = 0.0
+        self.jog = None  # Running jog: (move ID, rates, start time), at constant speed without ramps
+
+        self.last_reply = None  # UDP retry cache: ((type, seq), reply)
+        self.subscriber = None  # (address, interval, lease start)
+        self.telemetry_seq = 0
+        self.requests = 0
+        self.dropped = 0
+        self.running = False
+
+    # Motion
+
+    def now(self):
+        return time.monotonic() - self.booted
+
+    jog_timeout = 0.5  # JOG_TIMEOUT_MS
+
+    def advance(self, now=None):
+        """Finish the moves that have ended by now and start the next ones"""
+        now = self.now() if now is None else now
+        if any(self.jog_rates) and now - self.jog_renewed > self.jog_timeout:
+            self.jog_rates = [0, 0]
+            if self.jog is not None:
+                self.end_jog(self.jog_renewed + self.jog_timeout)
+        if self.jog is not None:
+            if self.jog_rates == self.jog[1]:
+                return  # Moves wait for the jog to end
+            if self.same_line(self.jog_rates, self.jog[1]):
+                # Only the speed changed: the jog goes on at the new rates, like the firmware's retarget
+                move_id, rates, start = self.jog
+                for i in range(self.MOTOR_COUNT):
+                    self.positions[i] += int(rates[i] * (now - start))
+                self.jog = (move_id, list(self.jog_rates), now)
+                return
+            self.end_jog(now)
+        while self.queue:
+            move = self.queue[0]
+            if move.start is None:
+                move.start = now
+            if now < move.start + move.duration:
+                return
+            for i, steps in enumerate(move.steps):
+                self.positions[i] += steps
+            self.completed = move.id
+            self.queue.pop(0)
+            if self.queue:
+                self.queue[0].start = move.start + move.duration
+        if any(self.jog_rates):
+            self.jog = (self.next_id, list(self.jog_rates), now)
+            self.next_id += 1
+
+    @staticmethod
+    def same_line(rates, jog_rates):
+        """Same directions and axis ratio within 1%, as updateStepper() tests it"""
+        for rate, jog_rate in zip(rates, jog_rates):
+            if (rate > 0) != (jog_rate > 0) or (rate < 0) != (jog_rate < 0):
+                return False
+        cross = rates[0] * jog_rates[1] - rates[1] * jog_rates[0]
+        dot = rates[0] * jog_rates[0] + rates[1] * jog_rates[1]
+        return abs(cross) * 100 <= dot
+
+    def end_jog(self, end):
+        move_id, rates, start = self.jog
+        for i in range(self.MOTOR_COUNT):
+            self.positions[i] += int(rates[i] * (end - start))
+        self.completed = move_id
+        self.jog = None
+
+    def set_jog(self, rate1, rate2):
+        """Set or renew the jog rates (steps/s), limited to velocity / 2 like moves"""
+        rates = [rate1, rate2]
+        for i in range(self.MOTOR_COUNT):
+            limit = self.velocity[i] // 2
+            rates[i] = max(-limit, min(limit, int(rates[i])))
+        self.jog_rates = rates
+        self.jog_renewed = self.now()
+        self.advance()
+
+    def state(self, now=None):
+        """(positions, velocities, moving flags) now"""
+        now = self.now() if now is None else now
+        self.advance(now)
+        if self.jog is not None:
+            _, rates, start = self.jog
+            positions = [p + int(r * (now - start)) for p, r in zip(self.positions, rates)]
+            return positions, [float(r) for r in rates], [r != 0 for r in rates]
+        if not self.queue:
+            return list(self.positions), [0.0, 0.0], [False, False]
+        move = self.queue[0]
+        done, rate = move.progress(now - move.start)
+        positions = [p + s for p, s in zip(self.positions, move.axis_steps(done))]
+        velocities = [rate * abs(s) / move.total * (1 if s > 0 else -1) if move.total else 0.0 for s in move.steps]
+        return positions, velocities, [s != 0 for s in move.steps]
+
+    def running_id(self):
+        if self.jog is not None:
+            return self.jog[0]
+        return self.queue[0].id if self.queue else 0
+
+    def queued_count(self):
+        return max(0, len(self.queue) - 1)
+
+    def queue_move(self, steps):
+        """Queue a move of signed steps per axis; the move ID, or 0 if the queue is full"""
+        self.advance()
+        if len(self.queue) >= self.queue_size - 1:
+            return 0
+        steps = list(steps)
+        for i in range(self.MOTOR_COUNT):
+            if steps[i] == 0:
+                continue
+            forward = steps[i] > 0
+            if self.queued_direction[i] != forward and self.backlash[i] > 0:
+                steps[i] += self.backlash[i] if forward else -self.backlash[i]
+            self.queued_direction[i] = forward
+        rates = [self.velocity[i] / 2.0 for i in range(self.MOTOR_COUNT) if steps[i]]
+        accel_times = [self.accel_time[i] for i in range(self.MOTOR_COUNT) if steps[i]]
+        move = MockMove(self.next_id, steps, min(rates + [20000.0]), max(accel_times + [0.0]))
+        self.next_id += 1
+        self.queue.append(move)
+        self.advance()
+        return move.id
+
+    def emergency_stop(self):
+        positions, _, _ = self.state()
+        self.positions = positions
+        self.queue = []
+        self.jog = None
+        self.jog_rates = [0, 0]
+        if self.next_id - 1 > self.completed:
+            self.aborted = self.next_id - 1
+
+    @staticmethod
+    def parse_move(command, steps):
+        """Add a "move:1,F,100" or "1,F,100" command to steps; False if invalid"""
+        if command.startswith("move:"):
+            command = command[5:]
+        try:
+            motor, direction, count = command.split(",")
+            motor, count = int(motor), int(count)
+        except ValueError:
+            return False
+        if not 1 <= motor <= 2:
+            return False
+        steps[motor - 1] += count if direction in ("F", "f") else -count
+        return True
+
+    def apply_setting(self, key, motor, value):
+        """set_velocity, set_acceleration, set_backlash or set_resolution of motor (1-based)"""
+        i = motor - 1
+        if not 0 <= i < self.MOTOR_COUNT:
+            return False
+        try:
+            if key == "set_velocity":
+                self.velocity[i] = int(float(value))
+            elif key == "set_acceleration":
+                self.accel_time[i] = float(value)
+            elif key == "set_backlash":
+                self.backlash[i] = int(float(value))
+            elif key == "set_resolution":
+                self.resolution[i] = float(value)
+            else:
+                return False
+        except ValueError:
+            return False
+        return True
+
+    def process_batch(self, batch):
+        """
+        (command count, move ID), (-1, 0) when the move queue is full or
+        (-2, 0) when a command is invalid; as in the firmware, nothing is
+        applied unless every command is valid and the move fits.
+        """
+        steps = [0, 0]
+        any_move = False
+        actions = []  # Settings and jogs, applied once the whole batch is known to be accepted
+        count = 0
+        for command in batch.split(";"):
+            command = command.strip()
+            if not command:
+                continue
+            if command.startswith("set_"):
+                key, _, rest = command.partition(":")
+                motor, comma, value = rest.partition(",")
+                try:
+                    motor = int(motor)
+                except ValueError:
+                    return -2, 0
+                if not comma or key not in self.SETTING_KEYS.values() or not 1 <= motor <= self.MOTOR_COUNT:
+                    return -2, 0
+                actions.append(lambda key=key, motor=motor, value=value.strip(): self.apply_setting(key, motor, value))
+            elif command.startswith("jog:"):
+                try:
+                    rate1, rate2 = (int(v) for v in command[4:].split(","))
+                except ValueError:
+                    return -2, 0
+                actions.append(lambda rate1=rate1, rate2=rate2: self.set_jog(rate1, rate2))
+            elif self.parse_move(command, steps):
+                any_move = True
+            else:
+                return -2, 0
+            count += 1
+        self.advance()
+        if any_move and len(self.queue) >= self.queue_size - 1:
+            return -1, 0
+        for action in actions:
+            action()
+        return count, self.queue_move(steps) if any_move else 0
+
+    # HTTP API
+
+    def handle_http(self, path, args):
+        """(status code, content type, body) for one request, as the firmware answers it"""
+        arg = lambda name: args.get(name, [""])[0]
+        if path == "/":
+            return 200, "text/html", "<html><body>ESP32 mock</body></html>"
+        if path == "/command":
+            steps = [0, 0]
+            if not self.parse_move(arg("cmd"), steps):
+                return 400, "text/plain", f"Invalid command: {arg('cmd')}"
+            move_id = self.queue_move(steps)
+            if not move_id:
+                return 503, "text/plain", "Move queue full"
+            return 200, "text/plain", f"Command queued: {arg('cmd')} move {move_id}"
+        if path == "/command_batch":
+            count, move_id = self.process_batch(arg("cmd"))
+            if count == -2:
+                return 400, "text/plain", f"Invalid command in batch: {arg('cmd')}"
+            if count < 0:
+                return 503, "text/plain", "Move queue full"
+            return 200, "application/json", json.dumps({"move": move_id, "commands": count})
+        if path == "/move_status":
+            positions, _, _ = self.state()
+            return 200, "application/json", json.dumps({"running": self.running_id(), "completed": self.completed,
+                                                        "aborted": self.aborted, "queued": self.queued_count(),
+                                                        "positions": positions})
+        if path == "/emergency_stop":
+            self.emergency_stop()
+            return 200, "text/plain", "Emergency stop activated!"
+        if path == "/get_positions":
+            positions, _, _ = self.state()
+            motors = [{"id": i + 1, "steps": positions[i], "resolution": int(self.resolution[i]),
+                       "unit": self.units[i]} for i in range(self.MOTOR_COUNT)]
+            return 200, "application/json", json.dumps({"motors": motors})
+        if path not in ("/set_motor_state", "/set_resolution", "/set_soft_limits", "/set_backlash",
+                        "/set_velocity", "/set_acceleration", "/set_position"):
+            return 404, "text/plain", "Not found"
+        try:
+            motor = int(arg("motor") or 0) - 1
+        except ValueError:
+            motor = -1
+        if not 0 <= motor < self.MOTOR_COUNT:
+            return 400, "text/plain", "Invalid motor number."
+        try:
+            if path == "/set_motor_state":
+                self.enabled[motor] = bool(int(arg("state") or 0))
+                message = f"Motor {motor + 1} {'enabled' if self.enabled[motor] else 'disabled'}"
+            elif path == "/set_resolution":
+                self.resolution[motor] = float(arg("res") or 0)
+                self.units[motor] = arg("unit")
+                message = f"Motor {motor + 1} resolution set to {self.resolution[motor]} {self.units[motor]}"
+            elif path == "/set_soft_limits":
+                self.soft_limits[motor] = (int(arg("negLimit") or 0), int(arg("posLimit") or 0))
+                message = f"Motor {motor + 1} soft limits set"
+            elif path == "/set_backlash":
+                self.backlash[motor] = int(arg("backlsh") or 0)
+                message = f"Motor {motor + 1} backlash set to {self.backlash[motor]} steps"
+            elif path == "/set_velocity":
+                self.velocity[motor] = int(arg("velocity") or 0)
+                message = f"Motor {motor + 1} velocity set to {self.velocity[motor]} steps/sec"
+            elif path == "/set_acceleration":
+                self.accel_time[motor] = float(arg("accel") or 0)
+                message = f"Motor {motor + 1} acceleration set to {self.accel_time[motor]} seconds"
+            else:
+                # positions holds the start of the running move: shift it so the current position is pos
+                self.positions[motor] += int(arg("pos") or 0) - self.state()[0][motor]
+                message = f"Motor {motor + 1} position set to {arg('pos')}"
+        except ValueError:
+            return 400, "text/plain", "Invalid value."
+        return 200, "text/plain", message
+
+    # UDP control channel and telemetry (see UdpMotorClient)
+
+    REQUEST = struct.Struct('<BBHiif')
+    REPLY = struct.Struct('<BBHIIIHHiiI')
+    TELEMETRY = struct.Struct('<BBHIiiffIIIHHI')
+    SETTING_KEYS = {1: "set_velocity", 2: "set_acceleration", 3: "set_backlash", 4: "set_resolution"}
+
+    def handle_udp(self, data, address):
+        """The reply to one control datagram, or None"""
+        if len(data) != self.REQUEST.size:
+            return None
+        message_type, code, seq, steps1, steps2, value = self.REQUEST.unpack(data)
+        if message_type == 5:
+            rate = min(value, 50.0)
+            self.subscriber = (address, 1.0 / rate if rate >= 1 else 0.0, self.now())
+            return self.telemetry_packet()
+        if self.last_reply is None or self.last_reply[0] != (message_type, seq):
+            result = 0
+            move_id = 0
+            if message_type == 1:
+                if steps1 or steps2:
+                    move_id = self.queue_move([steps1, steps2])
+                    result = 0 if move_id else 1
+            elif message_type == 3:
+                key = self.SETTING_KEYS.get(code)
+                result = 0 if key and self.apply_setting(key, steps1, value) else 2
+            elif message_type == 7:
+                self.set_jog(steps1, steps2)
+            elif message_type not in (2, 4):
+                result = 2
+            self.last_reply = ((message_type, seq), (result, move_id))
+        result, move_id = self.last_reply[1]
+        positions, _, _ = self.state()
+        return self.REPLY.pack(message_type, result, seq, move_id, self.running_id(), self.completed,
+                               self.queued_count(), 0, *positions, self.aborted)
+
+    def telemetry_packet(self):
+        positions, velocities, moving = self.state()
+        self.telemetry_seq = (self.telemetry_seq + 1) % 65536
+        flags = (1 if moving[0] else 0) | (2 if moving[1] else 0)
+        return self.TELEMETRY.pack(6, flags, self.telemetry_seq, int(self.now() * 1000) % 2 ** 32,
+                                   positions[0], positions[1], velocities[0], velocities[1], self.running_id(),
+                                   self.completed, self.next_id - 1, self.queued_count(), 0, self.aborted)
+
+    # Servers
+
+    def delay(self):
+        """Wait the configured reply latency; False if this reply is to be dropped"""
+        wait = self.latency + random.uniform(0, self.jitter)
+        if wait > 0:
+            time.sleep(wait)
+        if self.loss and random.random() < self.loss:
+            self.dropped += 1
+            return False
+        return True
+
+    def start(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                with mock.lock:
+                    mock.requests += 1
+                    code, content_type, body = mock.handle_http(url.path, parse_qs(url.query))
+                if not mock.delay():
+                    self.close_connection = True
+                    return
+                data = body.encode('utf-8')
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        # Single-threaded, like the ESP32 WebServer: requests are answered one at a time
+        self.http_server = HTTPServer((self.host, self.http_port), Handler)
+        self.http_port = self.http_server.server_address[1]
+        self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp.bind((self.host, self.udp_port))
+        self.udp.settimeout(0.02)
+        self.udp_port = self.udp.getsockname()[1]
+        self.running = True
+        self.threads = [threading.Thread(target=self.http_server.serve_forever, daemon=True),
+                        threading.Thread(target=self.udp_loop, daemon=True)]
+        for thread in self.threads:
+            thread.start()
+        print(f"ESP32 mock: HTTP on {self.host}:{self.http_port}, UDP on port {self.udp_port}")
+        return self
+
+    def udp_loop(self):
+        last_telemetry = 0.0
+        while self.running:
+            try:
+                data, address = self.udp.recvfrom(64)
+            except socket.timeout:
+                data = None
+            except OSError:
+                break
+            if data is not None:
+                with self.lock:
+                    self.requests += 1
+                    reply = self.handle_udp(data, address)
+                if reply is not None and self.delay():
+                    self.udp.sendto(reply, address)
+            # Telemetry push, with the firmware's lease
+            with self.lock:
+                subscriber = self.subscriber
+                if subscriber is None or not subscriber[1]:
+                    continue
+                now = self.now()
+                if now - subscriber[2] > 5.0:
+                    self.subscriber = None
+                    continue
+                if now - last_telemetry < subscriber[1]:
+                    continue
+                last_telemetry = now
+                packet = self.telemetry_packet()
+            if not self.loss or random.random() >= self.loss:
+                self.udp.sendto(packet, subscriber[0])
+
+    def stop(self):
+        self.running = False
+        self.http_server.shutdown()
+        self.http_server.server_close()
+        self.udp.close()
+
+
+if __name__ == '__main__':
+    # Serve for Mothy.py:  python esp32_mock.py serve [http_port] [latency_ms]
+    # Otherwise benchmark the motor command clients against the mock at increasing command rates
+    import sys
+    import numpy as np
+    from PyQt5.QtCore import QCoreApplication, QUrl
+    from PyQt5.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply
+    from motor_client import MotorClient, UdpMotorClient, TelemetryClient
+
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        port = int(sys.argv[2]) if len(sys.argv) > 2 else 8080
+        latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.005
+        MockESP32(http_port=port, latency=latency, jitter=latency).start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        sys.exit()
+
+    app = QCoreApplication(sys.argv)
+
+    class PerCommandClient:
+        """
+        The original path: one /command request per click, at most 5 in
+        flight, extras skipped. The original never learned when a move had
+        finished; here completion is read from the mock directly, which
+        flatters its latency.
+        """
+        def __init__(self, base_url, mock):
+            self.base_url = base_url
+            self.mock = mock
+            self.network_manager = QNetworkAccessManager()
+            self.network_manager.setTransferTimeout(3000)
+            self.replies = []
+            self.waiting = []  # (move ID, callback) until the mock completes the move
+
+        def move(self, motor, steps, callback=None, error_callback=None):
+            if len(self.replies) >= 5:
+                error_callback("Skipped")
+                return
+            command = f"move:{motor},{'F' if steps > 0 else 'B'},{abs(steps)}"
+            reply = self.network_manager.get(QNetworkRequest(QUrl(f"{self.base_url()}/command?cmd={command}")))
+            self.replies.append(reply)
+            reply.finished.connect(lambda: self.finished(reply, callback, error_callback))
+
+        def finished(self, reply, callback, error_callback):
+            self.replies.remove(reply)
+            text = reply.readAll().data().decode('utf-8')
+            if reply.error() == QNetworkReply.NoError and " move " in text:
+                self.waiting.append((int(text.rsplit(" ", 1)[1]), callback))
+            else:
+                error_callback(reply.errorString())
+            reply.deleteLater()
+
+        def check(self):
+            with self.mock.lock:
+                self.mock.advance()
+            done = [entry for entry in self.waiting if entry[0] <= self.mock.completed]
+            for entry in done:
+                self.waiting.remove(entry)
+                entry[1]("done")
+
+        def busy(self):
+            return bool(self.replies or self.waiting)
+
+        def abort(self, notify=False):
+            for reply in list(self.replies):
+                reply.abort()
+
+    def run(client, rate, duration=2.0, steps=5):
+        """Issue `rate` moves/s for duration, then wait for the rest; returns the statistics"""
+        issued = {}
+        latencies = []
+        failed = []
+        start = time.perf_counter()
+        count = 0
+        while True:
+            now = time.perf_counter()
+            due = int((now - start) * rate) if now - start < duration else int(duration * rate)
+            while count < due:
+                i = count
+
+                def done(result, i=i):
+                    latencies.append(time.perf_counter() - issued.pop(i))
+
+                def error(message, i=i):
+                    issued.pop(i, None)
+                    failed.append(message)
+                issued[i] = time.perf_counter()
+                client.move(1 + i % 2, steps, callback=done, error_callback=error)
+                count += 1
+            app.processEvents()
+            if isinstance(client, PerCommandClient):
+                client.check()
+            if now - start >= duration and (not client.busy() or now - start > duration + 5.0):
+                break
+            time.sleep(0.0002)
+        elapsed = time.perf_counter() - start
+        latencies = np.array(latencies) * 1000
+        stats = {"issued": count, "completed": len(latencies), "failed": len(failed), "lost": len(issued),
+                 "throughput": len(latencies) / elapsed}
+        for name, q in (("p50", 50), ("p95", 95), ("p99", 99)):
+            stats[name] = np.percentile(latencies, q) if len(latencies) else float("nan")
+        stats["max"] = latencies.max() if len(latencies) else float("nan")
+        return stats
+
+    rates = [10, 50, 100, 200, 500, 1000]
+    print("Replies after 2-4 ms, 5-step moves alternating between the axes; "
+          "latency is from the call until the move has completed")
+    print(f"{'client':<18}{'rate/s':>7}{'issued':>8}{'done':>7}{'failed':>8}{'lost':>6}{'reqs':>7}"
+          f"{'done/s':>8}{'p50 ms':>8}{'p95 ms':>8}{'p99 ms':>8}{'max ms':>8}")
+    for name in ("HTTP per command", "HTTP batched", "HTTP + telemetry", "UDP batched"):
+        for rate in rates:
+            mock = MockESP32(http_port=0, udp_port=0, latency=0.002, jitter=0.002).start()
+            url = lambda mock=mock: f"http://127.0.0.1:{mock.http_port}"
+            if name == "HTTP per command":
+                client = PerCommandClient(url, mock)
+            elif name == "HTTP batched":
+                client = MotorClient(url)
+            elif name == "HTTP + telemetry":
+                # Moves finish from the 50 Hz telemetry instead of /move_status polls
+                client = MotorClient(url)
+                telemetry = TelemetryClient(url, rate=50)
+                telemetry.port = mock.udp_port
+                telemetry.start()
+                client.mount_state = telemetry.state
+                run(client, 0, duration=0.2)  # Let the first packets arrive
+            else:
+                client = UdpMotorClient(url)
+                client.port = mock.udp_port
+            stats = run(client, rate)
+            client.abort()
+            if name == "HTTP + telemetry":
+                telemetry.stop()
+            print(f"{name:<18}{rate:>7}{stats['issued']:>8}{stats['completed']:>7}{stats['failed']:>8}"
+                  f"{stats['lost']:>6}{mock.requests:>7}{stats['throughput']:>8.1f}{stats['p50']:>8.1f}"
+                  f"{stats['p95']:>8.1f}{stats['p99']:>8.1f}{stats['max']:>8.1f}")
+            mock.stop()
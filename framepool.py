@@ -0,0 +1,82 @@
+import threading
+from collections import deque
+import numpy as np
+
+
+class FrameBuffer:
+    """
+    One preallocated frame from a FramePool.
+
+    The acquisition thread fills array in place and hands the buffer to its
+    consumers. Anyone who keeps the frame beyond the call that received it
+    must retain() it and release() it when done; the buffer goes back to the
+    pool once the last reference is released.
+    """
+    def __init__(self, pool, index, shape, dtype):
+        self.pool = pool
+        self.index = index
+        self.array = np.empty(shape, dtype=dtype)
+        self.refcount = 0
+        self.info = {}  # Per-frame metadata (timestamps, exposure, ...)
+
+    def retain(self):
+        self.pool.retain(self)
+        return self
+
+    def release(self):
+        self.pool.release(self)
+
+
+class FramePool:
+    """
+    Fixed set of preallocated frame buffers shared between the acquisition
+    thread and its consumers (display, tracking, dark frame calibration).
+
+    acquire() hands out a free buffer with one reference, or returns None
+    when every buffer is still borrowed. The caller then drops the frame
+    instead of allocating, so a slow consumer causes dropped frames rather
+    than unbounded memory growth.
+    """
+    def __init__(self, shape, dtype=np.uint8, size=4):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.lock = threading.Lock()
+        self.buffers = [FrameBuffer(self, i, self.shape, self.dtype) for i in range(size)]
+        self.free = deque(self.buffers)
+        self.acquired = 0
+        self.dropped = 0
+
+    def matches(self, shape, dtype):
+        return self.shape == tuple(shape) and self.dtype == np.dtype(dtype)
+
+    def acquire(self):
+        with self.lock:
+            if not self.free:
+                self.dropped += 1
+                return None
+            buffer = self.free.popleft()
+            buffer.refcount = 1
+            buffer.info = {}
+            self.acquired += 1
+            return buffer
+
+    def retain(self, buffer):
+        with self.lock:
+            if buffer.refcount <= 0:
+                raise RuntimeError("retain() on a frame buffer that was already returned to the pool")
+            buffer.refcount += 1
+
+    def release(self, buffer):
+        with self.lock:
+            if buffer.refcount <= 0:
+                raise RuntimeError("Frame buffer released more times than it was retained")
+            buffer.refcount -= 1
+            if buffer.refcount == 0:
+                self.free.append(buffer)
+
+    def in_use(self):
+        with self.lock:
+            return len(self.buffers) - len(self.free)
+
+    def stats(self):
+        return f"{self.acquired} frames through {len(self.buffers)} buffers, {self.dropped} dropped (pool exhausted)"
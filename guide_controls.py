@@ -0,0 +1,83 @@
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QComboBox
+
+from prediction import PREDICTORS
+
+
+class GuideSettings(QWidget):
+    """Collapsible guiding controller settings (same layout as MotorSettings)"""
+    # Field label -> default value
+    defaults = {
+        "Kp": "1.0",
+        "Ki": "0.0",
+        "Kd": "0.0",
+        "Dead-band (px)": "0.5",
+        "Aggression": "0.7",
+        "Settle (s)": "0.2",
+    }
+
+    def __init__(self, title="Guiding", parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.initUI()
+
+    def initUI(self):
+        self.main_layout = QVBoxLayout()
+
+        # Toggle button
+        self.toggle_button = QPushButton(self.title)
+        self.toggle_button.setCheckable(True)
+        self.main_layout.addWidget(self.toggle_button)
+
+        # Widget container for collapsible section
+        self.container = QWidget()
+        self.fields_layout = QVBoxLayout()
+        self.container.setLayout(self.fields_layout)
+
+        self.fields = {}
+        for label, default in self.defaults.items():
+            row_layout = QHBoxLayout()
+            lbl = QLabel(f"{label}:")
+            lbl.setFixedWidth(100)
+            line_edit = QLineEdit(default)
+            line_edit.setFixedWidth(150)
+            self.fields[label] = line_edit
+            row_layout.addWidget(lbl)
+            row_layout.addWidget(line_edit)
+            self.fields_layout.addLayout(row_layout)
+
+        # Target motion prediction with feed-forward corrections
+        row_layout = QHBoxLayout()
+        lbl = QLabel("Prediction:")
+        lbl.setFixedWidth(100)
+        self.prediction_combobox = QComboBox()
+        self.prediction_combobox.addItems(PREDICTORS)
+        self.prediction_combobox.setFixedWidth(150)
+        row_layout.addWidget(lbl)
+        row_layout.addWidget(self.prediction_combobox)
+        self.fields_layout.addLayout(row_layout)
+
+        self.main_layout.addWidget(self.container)
+        self.setLayout(self.main_layout)
+
+        self.toggle_button.toggled.connect(self.toggle_fields)
+        return self.main_layout
+
+    def toggle_fields(self, checked):
+        if checked:
+            self.container.hide()
+            self.toggle_button.setText(f"Show {self.title}")
+        else:
+            self.container.show()
+            self.toggle_button.setText(self.title)
+
+    def values(self):
+        """Field values as floats; invalid entries fall back to the defaults"""
+        values = {}
+        for label, line_edit in self.fields.items():
+            try:
+                values[label] = float(line_edit.text())
+            except ValueError:
+                print(f"Invalid {label}, using {self.defaults[label]}")
+                line_edit.setText(self.defaults[label])
+                values[label] = float(self.defaults[label])
+        return values
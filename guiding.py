@@ -0,0 +1,328 @@
+import csv
+import math
+import time
+from collections import deque
+
+import numpy as np
+
+
+class AxisController:
+    """
+    PID controller for one mount axis, working in pixels.
+
+    update() takes the star's offset from the guide position and returns
+    the correction to apply, also in pixels. Errors inside the dead-band
+    produce no correction and are not integrated, so seeing noise neither
+    moves the mount nor winds up the integral term. aggression scales the
+    whole output (1.0 = full correction).
+    """
+    def __init__(self, kp=1.0, ki=0.0, kd=0.0, dead_band=0.5, aggression=0.7, integral_limit=20.0):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.dead_band = dead_band  # pixels
+        self.aggression = aggression
+        self.integral_limit = integral_limit  # pixel-seconds
+        self.reset()
+
+    def reset(self):
+        self.integral = 0.0
+        self.previous_error = None
+
+    def update(self, error, dt):
+        derivative = 0.0
+        if self.previous_error is not None and dt > 0:
+            derivative = (error - self.previous_error) / dt
+        self.previous_error = error
+
+        if abs(error) < self.dead_band:
+            return 0.0
+
+        if dt > 0:
+            self.integral = max(min(self.integral + error * dt, self.integral_limit), -self.integral_limit)
+        return self.aggression * (self.kp * error + self.ki * self.integral + self.kd * derivative)
+
+
+class Guider:
+    """
+    Closed-loop guiding: every frame with a measured star position goes in,
+    at most one correction per axis comes out.
+
+    The mount counts as moving from move_started() until move_finished()
+    plus settle_time. Frames whose exposure started in that interval show a
+    smeared or displaced star and are skipped instead of being fed to the
+    controllers. Each cycle is appended to a CSV log.
+
+    With a predictor (prediction.KalmanPredictor or PolynomialPredictor)
+    the target's motion is modelled on mount-compensated positions (error
+    plus all corrections applied so far). The controllers then act on the
+    error expected when the next exposure ends, and feed_forward() gives the
+    moves that keep a moving target centred between measurements.
+    """
+    log_columns = ["time", "error_x", "error_y", "correction_x", "correction_y", "dt", "fwhm", "snr",
+                   "predicted_x", "predicted_y"]
+
+    def __init__(self):
+        self.x = AxisController()
+        self.y = AxisController()
+        self.settle_time = 0.2  # seconds after a move before frames are trusted again
+        self.moves_pending = 0
+        self.move_done_at = 0.0
+        self.last_time = None
+        self.start_time = None
+        self.cycles = 0
+        self.skipped = 0
+        self.errors = deque(maxlen=100)  # Recent (error_x, error_y) for the RMS
+        self.log_file = None
+        self.log_writer = None
+        self.predictor = None
+        self.applied = [0.0, 0.0]  # Corrections sent to the mount so far, pixels
+        self.feed_forward_rate = (0.0, 0.0)  # px/s currently compensated by feed_forward()
+        self.feed_forward_time = None
+        self.move_times = deque()  # Send times of the moves in flight
+        self.command_latency = 0.0  # Smoothed send-to-done time of a move, seconds
+
+    def configure(self, kp, ki, kd, dead_band, aggression, settle_time):
+        for axis in (self.x, self.y):
+            axis.kp, axis.ki, axis.kd = kp, ki, kd
+            axis.dead_band = dead_band
+            axis.aggression = aggression
+        self.settle_time = settle_time
+
+    def start(self, log_path=None):
+        self.x.reset()
+        self.y.reset()
+        self.moves_pending = 0
+        self.move_done_at = 0.0
+        self.last_time = None
+        self.start_time = time.perf_counter()
+        self.cycles = 0
+        self.skipped = 0
+        self.errors.clear()
+        self.applied = [0.0, 0.0]
+        self.feed_forward_rate = (0.0, 0.0)
+        self.feed_forward_time = None
+        self.move_times.clear()
+        if self.predictor is not None:
+            self.predictor.reset()
+        if log_path:
+            try:
+                self.log_file = open(log_path, "w", newline="")
+                self.log_writer = csv.writer(self.log_file)
+                self.log_writer.writerow(self.log_columns)
+            except OSError as e:
+                print(f"Could not open guide log {log_path}: {e}")
+                self.log_file = None
+                self.log_writer = None
+
+    def stop(self):
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+            self.log_writer = None
+
+    def set_predictor(self, predictor):
+        self.predictor = predictor
+        self.feed_forward_rate = (0.0, 0.0)
+        self.feed_forward_time = None
+
+    def move_started(self):
+        self.moves_pending += 1
+        self.move_times.append(time.perf_counter())
+
+    def move_finished(self):
+        self.moves_pending = max(0, self.moves_pending - 1)
+        now = time.perf_counter()
+        if self.move_times:
+            latency = now - self.move_times.popleft()
+            self.command_latency = latency if self.command_latency == 0 else 0.8 * self.command_latency + 0.2 * latency
+        if self.moves_pending == 0:
+            self.move_done_at = now
+
+    def correction_applied(self, correction_x, correction_y):
+        """Record a correction (pixels) sent to the mount, so target motion can be separated from mount motion"""
+        self.applied[0] += correction_x
+        self.applied[1] += correction_y
+
+    def feed_forward(self, now):
+        """
+        Correction (pixels) that cancels the predicted target motion since
+        the previous call, or None while there is no usable prediction.
+        """
+        if self.predictor is None or not self.predictor.ready():
+            self.feed_forward_rate = (0.0, 0.0)
+            self.feed_forward_time = None
+            return None
+        rate = self.predictor.velocity(now)
+        correction = None
+        if self.feed_forward_time is not None:
+            dt = now - self.feed_forward_time
+            correction = (rate[0] * dt, rate[1] * dt)
+        self.feed_forward_rate = rate
+        self.feed_forward_time = now
+        return correction
+
+    def frame_usable(self, exposure_start):
+        """False while the mount moves and for frames exposed before it settled"""
+        return self.moves_pending == 0 and exposure_start >= self.move_done_at + self.settle_time
+
+    def predicted_error(self, error_x, error_y, timestamp, exposure_start, exposure_time):
+        """
+        Feed the measurement to the predictor and return the error expected
+        at the end of the next exposure after a correction: the predicted
+        target motion until then, minus what feed-forward already covers.
+        """
+        if self.predictor is None:
+            return error_x, error_y
+        measured_at = exposure_start + exposure_time / 2
+        self.predictor.update(measured_at, error_x + self.applied[0], error_y + self.applied[1])
+        if not self.predictor.ready():
+            return error_x, error_y
+        lead = (timestamp - measured_at) + self.command_latency + exposure_time
+        now_x, now_y = self.predictor.predict(measured_at)
+        then_x, then_y = self.predictor.predict(measured_at + lead)
+        rate_x, rate_y = self.feed_forward_rate
+        return (error_x + (then_x - now_x) - rate_x * lead,
+                error_y + (then_y - now_y) - rate_y * lead)
+
+    def update(self, error_x, error_y, timestamp, exposure_start, fwhm=0.0, snr=0.0, exposure_time=0.0):
+        """
+        Run one control cycle. Returns (correction_x, correction_y) in pixels,
+        or None if the frame was exposed while the mount was moving. fwhm and
+        snr of the guide star only go into the log. exposure_time (seconds)
+        sets how far ahead the predictor looks.
+        """
+        if not self.frame_usable(exposure_start):
+            self.skipped += 1
+            return None
+
+        dt = timestamp - self.last_time if self.last_time is not None else 0.0
+        self.last_time = timestamp
+        predicted_x, predicted_y = self.predicted_error(error_x, error_y, timestamp, exposure_start, exposure_time)
+        correction_x = self.x.update(predicted_x, dt)
+        correction_y = self.y.update(predicted_y, dt)
+
+        self.cycles += 1
+        self.errors.append((error_x, error_y))
+        if self.log_writer is not None:
+            self.log_writer.writerow([f"{timestamp - self.start_time:.4f}", f"{error_x:.3f}", f"{error_y:.3f}",
+                                      f"{correction_x:.3f}", f"{correction_y:.3f}", f"{dt:.4f}",
+                                      f"{fwhm:.2f}", f"{snr:.1f}", f"{predicted_x:.3f}", f"{predicted_y:.3f}"])
+        return correction_x, correction_y
+
+    def rms(self):
+        """RMS guiding error (x, y, total) in pixels over the recent cycles"""
+        if not self.errors:
+            return 0.0, 0.0, 0.0
+        n = len(self.errors)
+        rms_x = math.sqrt(sum(ex * ex for ex, _ in self.errors) / n)
+        rms_y = math.sqrt(sum(ey * ey for _, ey in self.errors) / n)
+        return rms_x, rms_y, math.hypot(rms_x, rms_y)
+
+    def summary(self):
+        rms_x, rms_y, rms_total = self.rms()
+        return (f"{self.cycles} cycles, {self.skipped} frames skipped (mount moving), "
+                f"RMS error X={rms_x:.2f}px Y={rms_y:.2f}px total={rms_total:.2f}px")
+
+
+class GuideStarSelector:
+    """
+    Picks a guide star from a frame's star catalog and follows it from frame
+    to frame. Catalog positions must already be in display coordinates
+    (full-frame pixels), so the lock survives guide window changes.
+
+    The lock target is where the star should be; the guiding error is the
+    star's position minus the target. When the star is missing (cloud,
+    drifted out of the search radius) the search radius widens with every
+    lost frame; after lost_limit frames another star is picked and the
+    target moves with it so the current pointing error is kept.
+    """
+    def __init__(self, search_radius=20.0, lost_limit=10, min_snr=10.0, isolation=20.0, edge_margin=30.0):
+        self.search_radius = search_radius  # pixels
+        self.lost_limit = lost_limit  # frames
+        self.min_snr = min_snr
+        self.isolation = isolation  # No brighter-than-half neighbour within this many pixels
+        self.edge_margin = edge_margin  # pixels from the frame edge
+        self.saturation = None  # Peak level treated as saturated
+        self.reset()
+
+    def reset(self):
+        self.position = None  # (x, y) of the guide star in the last frame it was found
+        self.target = None  # (x, y) the guide star is guided to
+        self.flux = None
+        self.lost = 0
+
+    def locked(self):
+        return self.position is not None
+
+    def pick(self, stars, bounds, prefer=None):
+        """
+        Index of the best guide star in stars, or None. bounds is the
+        (x0, y0, x1, y1) area covered by the frame; stars inside prefer
+        (same form, e.g. ROI1) win over brighter ones elsewhere.
+        """
+        if len(stars) == 0:
+            return None
+        x, y = stars['x'], stars['y']
+        x0, y0, x1, y1 = bounds
+        ok = (stars['snr'] >= self.min_snr) & \
+             (x >= x0 + self.edge_margin) & (x <= x1 - self.edge_margin) & \
+             (y >= y0 + self.edge_margin) & (y <= y1 - self.edge_margin)
+        if self.saturation is not None:
+            ok &= stars['peak'] < self.saturation
+
+        # Reject stars with a comparable neighbour: their centroids pull on each other
+        distance = np.hypot(x[:, None] - x[None, :], y[:, None] - y[None, :])
+        comparable = stars['flux'][None, :] > 0.5 * stars['flux'][:, None]
+        np.fill_diagonal(comparable, False)
+        ok &= ~np.any(comparable & (distance < self.isolation), axis=1)
+
+        if prefer is not None:
+            px0, py0, px1, py1 = prefer
+            inside = ok & (x >= px0) & (x <= px1) & (y >= py0) & (y <= py1)
+            if np.any(inside):
+                ok = inside
+        if not np.any(ok):
+            return None
+        candidates = np.flatnonzero(ok)
+        return int(candidates[np.argmax(stars['snr'][candidates])])
+
+    def lock(self, star, target=None):
+        """Guide on star; target defaults to its current position"""
+        self.position = (float(star['x']), float(star['y']))
+        self.target = target if target is not None else self.position
+        self.flux = float(star['flux'])
+        self.lost = 0
+
+    def switch(self, star):
+        """Continue on another star, keeping the current guiding error"""
+        offset = (self.target[0] - self.position[0], self.target[1] - self.position[1])
+        self.lock(star, (float(star['x']) + offset[0], float(star['y']) + offset[1]))
+
+    def track(self, stars):
+        """
+        Index of the guide star in this frame's stars, or None if it was not
+        found. Closest star wins, with flux as a tie-breaker.
+        """
+        if not self.locked():
+            return None
+        radius = self.search_radius * (1 + self.lost)
+        if len(stars) > 0:
+            distance = np.hypot(stars['x'] - self.position[0], stars['y'] - self.position[1])
+            flux_ratio = np.abs(np.log(np.maximum(stars['flux'], 1e-3) / max(self.flux, 1e-3)))
+            score = np.where(distance <= radius, distance / radius + 0.5 * flux_ratio, np.inf)
+            index = int(np.argmin(score))
+            if np.isfinite(score[index]):
+                self.position = (float(stars['x'][index]), float(stars['y'][index]))
+                self.flux = 0.9 * self.flux + 0.1 * float(stars['flux'][index])
+                self.lost = 0
+                return index
+        self.lost += 1
+        return None
+
+    def lost_too_long(self):
+        return self.lost > self.lost_limit
+
+    def error(self):
+        """Guide star position minus target, (x, y) in pixels"""
+        return self.position[0] - self.target[0], self.position[1] - self.target[1]
@@ -1,6 +1,7 @@
 #include <WiFi.h>
 #include <WebServer.h>
 #include <Preferences.h>
+#include <WiFiUdp.h>
 
 // Debug output (set to 0 to save ~50KB of program space)
 #define DEBUG_SERIAL 0
@@ -13,6 +14,79 @@ const char* password = "3V@$!VE_Wifi2.4";
 WebServer server(80); // Add this line to declare the server instance
 Preferences preferences;
 
+// **Binary Control Channel**
+// Fixed-size little-endian messages on UDP_PORT, the compact alternative to
+// the HTTP commands (same idea as struct_motor_command in espnow_master).
+// Every reply carries the move status, and a request that repeats the last
+// seq (a client retry) gets the same reply again without being run twice.
+#define UDP_PORT 4210
+WiFiUDP udp;
+
+#define MSG_MOVE 1     // Relative move of both axes by steps1, steps2
+#define MSG_STATUS 2   // Move status and positions only
+#define MSG_SETTING 3  // Setting `code` of motor steps1 to value
+#define MSG_PING 4     // Immediate reply, for round-trip measurements
+#define MSG_SUBSCRIBE 5  // Push telemetry to the sender at value Hz (0 stops)
+#define MSG_TELEMETRY 6  // Pushed struct_telemetry
+#define MSG_JOG 7      // Run at steps1, steps2 steps/s until stopped or not renewed
+
+#define RESULT_OK 0
+#define RESULT_QUEUE_FULL 1
+#define RESULT_INVALID 2
+
+typedef struct __attribute__((packed)) struct_control_request {
+    uint8_t type;
+    uint8_t code;  // MSG_SETTING: 1 velocity, 2 acceleration, 3 backlash, 4 resolution
+    uint16_t seq;  // Echoed in the reply
+    int32_t steps1;
+    int32_t steps2;
+    float value;
+} struct_control_request;  // 16 bytes
+
+typedef struct __attribute__((packed)) struct_control_reply {
+    uint8_t type;
+    uint8_t result;
+    uint16_t seq;
+    uint32_t moveId;  // Move queued by this request, else 0
+    uint32_t running;
+    uint32_t completed;
+    uint16_t queued;
+    uint16_t reserved;
+    int32_t position1;
+    int32_t position2;
+    uint32_t aborted;  // Newest move an emergency stop cut short or dropped
+} struct_control_reply;  // 32 bytes
+
+struct_control_reply lastReply;
+bool haveLastReply = false;
+
+// Telemetry pushed to one subscriber; a subscription lapses unless renewed
+typedef struct __attribute__((packed)) struct_telemetry {
+    uint8_t type;  // MSG_TELEMETRY
+    uint8_t flags;  // Bit i set while axis i moves
+    uint16_t seq;  // Increments every packet, so the client can count losses
+    uint32_t timeMs;  // millis() when sent
+    int32_t position1;
+    int32_t position2;
+    float velocity1;  // Steps/s, signed
+    float velocity2;
+    uint32_t running;
+    uint32_t completed;
+    uint32_t lastMove;  // Newest move ID handed out
+    uint16_t queued;
+    uint16_t reserved;
+    uint32_t aborted;  // As in struct_control_reply
+} struct_telemetry;  // 44 bytes
+
+#define TELEMETRY_LEASE_MS 5000
+#define TELEMETRY_MAX_HZ 50
+IPAddress telemetryIP;
+uint16_t telemetryPort = 0;
+unsigned long telemetryInterval = 0;  // ms, 0 = off
+unsigned long telemetryLeaseStart = 0;
+unsigned long lastTelemetry = 0;
+uint16_t telemetrySeq = 0;
+
 #define MOTOR_COUNT 2
 
 // **Stepper Motor Pin Assignments** 30-pin board
@@ -51,7 +125,7 @@ volatile bool emergencyStop = false;
 //80us = 12500 steps/sec = 3.75k RPM
 
 // **Persistent Data: Position, Resolution**
-long motorPositions[MOTOR_COUNT] = {0, 0}; //steps
+volatile long motorPositions[MOTOR_COUNT] = {0, 0}; //steps, updated by the step timer
 int stepsPerUnit[MOTOR_COUNT] = {200, 200}; // Steps per degree/mm
 String unitType[MOTOR_COUNT] = {"degrees", "degrees"}; 
 
@@ -76,6 +150,77 @@ StepperMotor motors[MOTOR_COUNT] = {
     {STEP_PIN_2, DIR_PIN_2, ENABLE_PIN_2, 15000, 0.1, 0, -1000000, 1000000, 0, false, true},
 };
 
+// **Step Generator**
+// A hardware timer interrupt every STEP_TICK_US runs all axes at once: a
+// phase accumulator sets the step rate of the axis with the most steps and
+// Bresenham error terms step the other axes in proportion, so a two-axis
+// move follows a straight line and both axes finish together. Each step
+// pulse lasts one tick. Moves wait in a small queue; the HTTP handlers only
+// queue them and return the move ID, and /move_status reports progress.
+#define STEP_TICK_US 25
+#define TICK_RATE (1000000 / STEP_TICK_US)
+#define MOVE_QUEUE_SIZE 8
+
+struct Move {
+    unsigned long id;
+    long steps[MOTOR_COUNT];  // Signed, including backlash take-up
+};
+Move moveQueue[MOVE_QUEUE_SIZE];
+int queueHead = 0;  // Next free slot
+int queueTail = 0;  // Next move to run
+unsigned long nextMoveId = 1;
+bool queuedDirection[MOTOR_COUNT] = {true, true};  // Direction of the last queued move, for backlash
+
+struct StepState {
+    volatile bool active;
+    unsigned long id;
+    long total;  // Steps of the longest axis
+    volatile long done;
+    long count[MOTOR_COUNT];  // Steps per axis
+    long error[MOTOR_COUNT];  // Bresenham error terms
+    int dir[MOTOR_COUNT];  // +1 forward, -1 backward
+    uint32_t phase;  // Overflow = one step of the longest axis
+    uint32_t increment;  // Phase per tick (current speed)
+    uint32_t startIncrement;
+    uint32_t maxIncrement;
+    uint32_t accelIncrement;  // Speed change per tick
+    long rampSteps;  // Steps taken while accelerating, needed again to stop
+    bool jog;  // Constant-velocity jog: runs until targetIncrement is 0
+    volatile uint32_t targetIncrement;
+    long jogRate[MOTOR_COUNT];  // Signed steps/s the jog was started with
+};
+StepState stepper = {};
+bool stepHigh[MOTOR_COUNT] = {false, false};
+volatile unsigned long runningMoveId = 0;
+volatile unsigned long completedMoveId = 0;
+volatile unsigned long abortedMoveId = 0;  // Newest move an emergency stop cut short or dropped
+
+// **Jog**
+// "jog:<rate1>,<rate2>" (signed steps/s) runs the axes at constant speed for
+// held keys. The client renews it while the keys are held; without renewal
+// for JOG_TIMEOUT_MS the jog stops, so a lost "stop" cannot run the mount away.
+#define JOG_TIMEOUT_MS 500
+long jogRate[MOTOR_COUNT] = {0, 0};
+unsigned long jogRenewed = 0;
+bool positionsSaved = true;
+hw_timer_t* stepTimer = NULL;
+
+void IRAM_ATTR onStepTimer();
+void updateStepper();
+unsigned long processCommand(String command);
+int processBatch(String batch, unsigned long* id);
+void processSetting(String command);
+bool parseSetting(String command, String &key, int &motorIndex, String &value);
+bool applySetting(String key, int motorIndex, String value);
+void handleUdp();
+void sendTelemetry();
+bool processJog(String command);
+bool parseJog(String command, long &rate1, long &rate2);
+void setJog(long rate1, long rate2);
+void startJog();
+bool parseMove(String command, long steps[MOTOR_COUNT]);
+unsigned long queueMove(long steps[MOTOR_COUNT]);
+
 // **Enhanced Web Interface with Keyboard & Gamepad Support**
 const char webpage[] PROGMEM = R"rawliteral(
 <!DOCTYPE html><html><head>
@@ -242,12 +387,48 @@ void setup() {
     server.on("/command", []() {
         String cmd = server.arg("cmd");
         Serial.println("Received command: " + cmd);
-        processCommand(cmd);
-        server.send(200, "text/plain", "Command processed: " + cmd);
+        long steps[MOTOR_COUNT] = {0};
+        if (!parseMove(cmd, steps)) {
+            server.send(400, "text/plain", "Invalid command: " + cmd);
+            return;
+        }
+        unsigned long id = queueMove(steps);
+        if (id == 0) {
+            server.send(503, "text/plain", "Move queue full");
+            return;
+        }
+        server.send(200, "text/plain", "Command queued: " + cmd + " move " + String(id));
+    });
+
+    // Several commands in one request, separated by ';' (moves and set_* settings)
+    server.on("/command_batch", []() {
+        String cmd = server.arg("cmd");
+        Serial.println("Received batch: " + cmd);
+        unsigned long id = 0;
+        int count = processBatch(cmd, &id);
+        if (count == -2) {
+            server.send(400, "text/plain", "Invalid command in batch: " + cmd);
+            return;
+        }
+        if (count < 0) {
+            server.send(503, "text/plain", "Move queue full");
+            return;
+        }
+        server.send(200, "application/json", "{\"move\":" + String(id) + ",\"commands\":" + String(count) + "}");
+    });
+
+    // Progress of queued moves: a move is done once completed >= its ID; one up to aborted
+    // that had not completed was stopped by an emergency stop
+    server.on("/move_status", []() {
+        char json[160];
+        snprintf(json, sizeof(json), "{\"running\":%lu,\"completed\":%lu,\"aborted\":%lu,\"queued\":%d,\"positions\":[%ld,%ld]}",
+                 runningMoveId, completedMoveId, abortedMoveId, (queueHead - queueTail + MOVE_QUEUE_SIZE) % MOVE_QUEUE_SIZE,
+                 motorPositions[0], motorPositions[1]);
+        server.send(200, "application/json", json);
     });
 
     server.on("/emergency_stop", []() {
-        emergencyStop = true;
+        emergencyStop = true;  // Handled in loop()
         Serial.println("Emergency stop activated!");
         server.send(200, "text/plain", "Emergency stop activated!");
     });
@@ -352,20 +533,22 @@ void setup() {
     });
 
     server.on("/get_positions", []() {
-        String json = "{\"motors\":[";
-        for (int i = 0; i < MOTOR_COUNT; i++) {
-            if (i > 0) json += ",";
-            json += "{\"id\":" + String(i+1);
-            json += ",\"steps\":" + String(motorPositions[i]);
-            json += ",\"resolution\":" + String(stepsPerUnit[i]);
-            json += ",\"unit\":\"" + unitType[i] + "\"}";
+        // One fixed buffer instead of a String grown piece by piece
+        char json[256];
+        int length = snprintf(json, sizeof(json), "{\"motors\":[");
+        for (int i = 0; i < MOTOR_COUNT && length < (int)sizeof(json); i++) {
+            length += snprintf(json + length, sizeof(json) - length,
+                               "%s{\"id\":%d,\"steps\":%ld,\"resolution\":%d,\"unit\":\"%s\"}",
+                               i > 0 ? "," : "", i + 1, motorPositions[i], stepsPerUnit[i], unitType[i].c_str());
         }
-        json += "]}";
+        if (length < (int)sizeof(json)) snprintf(json + length, sizeof(json) - length, "]}");
         server.send(200, "application/json", json);
     });
     
     server.begin();
     Serial.println("Web server started!");
+    udp.begin(UDP_PORT);
+    Serial.printf("Binary control channel on UDP port %d\n", UDP_PORT);
 
     // Configure motor pins
     for (int i = 0; i < MOTOR_COUNT; i++) {
@@ -373,7 +556,20 @@ void setup() {
         pinMode(motors[i].dirPin, OUTPUT);
         pinMode(motors[i].enablePin, OUTPUT);
         digitalWrite(motors[i].enablePin, LOW);  // Enable motors
+        queuedDirection[i] = motors[i].lastDirection;
     }
+
+    // Step generator tick
+#if ESP_ARDUINO_VERSION_MAJOR >= 3
+    stepTimer = timerBegin(1000000);  // 1 MHz
+    timerAttachInterrupt(stepTimer, &onStepTimer);
+    timerAlarm(stepTimer, STEP_TICK_US, true, 0);
+#else
+    stepTimer = timerBegin(0, 80, true);  // 80 MHz / 80 = 1 MHz
+    timerAttachInterrupt(stepTimer, &onStepTimer, true);
+    timerAlarmWrite(stepTimer, STEP_TICK_US, true);
+    timerAlarmEnable(stepTimer);
+#endif
     
     Serial.println("Ready! Open web interface to control motors.");
 }
@@ -381,6 +577,9 @@ void setup() {
 
 void loop() {
     server.handleClient();
+    handleUdp();
+    updateStepper();
+    sendTelemetry();
     
     if (Serial.available()) {
         String command = Serial.readStringUntil('\n');
@@ -473,145 +672,501 @@ void loop() {
     }
 }
 
-void processCommand(String command) {
+// Run a ';'-separated list of commands: settings ("set_velocity:1,15000")
+// right away, and moves ("move:1,F,100" or "1,F,100") added up per axis into
+// one coordinated move, queued after the settings. Every command is checked
+// first, so nothing is applied unless all are valid and the move fits.
+// Returns the number of commands, -1 if the move queue is full or -2 if a
+// command is invalid; *id is the move ID (0 if none).
+int processBatch(String batch, unsigned long* id) {
+    long steps[MOTOR_COUNT] = {0};
+    bool anyMove = false;
+    int count = 0;
+    *id = 0;
+    // Pass 0 checks the commands and adds up the moves, pass 1 applies them
+    for (int pass = 0; pass < 2; pass++) {
+        int start = 0;
+        while (start < (int)batch.length()) {
+            int end = batch.indexOf(';', start);
+            if (end == -1) end = batch.length();
+            String command = batch.substring(start, end);
+            command.trim();
+            start = end + 1;
+            if (command.length() == 0) continue;
+            if (pass == 1) {
+                if (command.startsWith("set_")) {
+                    processSetting(command);
+                } else if (command.startsWith("jog:")) {
+                    processJog(command);
+                }
+                continue;
+            }
+            String key, value;
+            int motorIndex;
+            long rate1, rate2;
+            if (command.startsWith("set_")) {
+                if (!parseSetting(command, key, motorIndex, value)) return -2;
+            } else if (command.startsWith("jog:")) {
+                if (!parseJog(command, rate1, rate2)) return -2;
+            } else if (parseMove(command, steps)) {
+                anyMove = true;
+            } else {
+                return -2;
+            }
+            count++;
+        }
+        if (pass == 0 && anyMove && (queueHead + 1) % MOVE_QUEUE_SIZE == queueTail) {
+            Serial.println("Move queue full");
+            return -1;
+        }
+    }
+    if (anyMove) *id = queueMove(steps);
+    return count;
+}
+
+// "set_<name>:<motor>,<value>" for velocity, acceleration, backlash and resolution
+bool parseSetting(String command, String &key, int &motorIndex, String &value) {
+    int separatorIndex = command.indexOf(':');
+    int commaIndex = command.indexOf(',', separatorIndex);
+    if (separatorIndex == -1 || commaIndex == -1) {
+        Serial.printf("Invalid setting: '%s'\n", command.c_str());
+        return false;
+    }
+    key = command.substring(0, separatorIndex);
+    motorIndex = command.substring(separatorIndex + 1, commaIndex).toInt() - 1;
+    value = command.substring(commaIndex + 1);
+    value.trim();
+    if (key != "set_velocity" && key != "set_acceleration" && key != "set_backlash" && key != "set_resolution") {
+        Serial.printf("Unknown setting: '%s'\n", key.c_str());
+        return false;
+    }
+    if (motorIndex < 0 || motorIndex >= MOTOR_COUNT) {
+        Serial.printf("Invalid motor number %d for %s\n", motorIndex + 1, key.c_str());
+        return false;
+    }
+    return true;
+}
+
+void processSetting(String command) {
+    String key, value;
+    int motorIndex;
+    if (parseSetting(command, key, motorIndex, value)) applySetting(key, motorIndex, value);
+}
+
+bool applySetting(String key, int motorIndex, String value) {
+    if (motorIndex < 0 || motorIndex >= MOTOR_COUNT) {
+        Serial.printf("Invalid motor number %d for %s\n", motorIndex + 1, key.c_str());
+        return false;
+    }
+
+    if (key == "set_velocity") {
+        motors[motorIndex].velocity = value.toInt();
+        preferences.putInt(("motor" + String(motorIndex+1) + "_velo").c_str(), motors[motorIndex].velocity);
+    } else if (key == "set_acceleration") {
+        motors[motorIndex].accelTime = value.toFloat();
+        preferences.putFloat(("motor" + String(motorIndex+1) + "_accel").c_str(), motors[motorIndex].accelTime);
+    } else if (key == "set_backlash") {
+        motors[motorIndex].backlash = value.toInt();
+        preferences.putInt(("motor" + String(motorIndex+1)).c_str(), motors[motorIndex].backlash);
+    } else if (key == "set_resolution") {
+        stepsPerUnit[motorIndex] = value.toFloat();
+        preferences.putFloat(("motor" + String(motorIndex+1) + "_res").c_str(), value.toFloat());
+    } else {
+        Serial.printf("Unknown setting: '%s'\n", key.c_str());
+        return false;
+    }
+    Serial.printf("Motor %d %s = %s\n", motorIndex + 1, key.c_str(), value.c_str());
+    return true;
+}
+
+// Answer one binary control message, if one has arrived
+void handleUdp() {
+    int size = udp.parsePacket();
+    if (size == 0) return;
+    struct_control_request request;
+    if (size != sizeof(request)) {
+        udp.flush();
+        return;
+    }
+    udp.read((uint8_t*)&request, sizeof(request));
+
+    if (request.type == MSG_SUBSCRIBE) {
+        // Handled apart from the retry cache: renewing is harmless to repeat
+        float rate = request.value > TELEMETRY_MAX_HZ ? TELEMETRY_MAX_HZ : request.value;
+        telemetryIP = udp.remoteIP();
+        telemetryPort = udp.remotePort();
+        telemetryInterval = rate >= 1 ? (unsigned long)(1000 / rate) : 0;
+        telemetryLeaseStart = millis();
+        sendTelemetry();
+        return;
+    }
+
+    if (!(haveLastReply && request.seq == lastReply.seq && request.type == lastReply.type)) {
+        struct_control_reply reply = {};
+        reply.type = request.type;
+        reply.seq = request.seq;
+        reply.result = RESULT_OK;
+        if (request.type == MSG_MOVE) {
+            long steps[MOTOR_COUNT] = {request.steps1, request.steps2};
+            if (steps[0] != 0 || steps[1] != 0) {
+                reply.moveId = queueMove(steps);
+                if (reply.moveId == 0) reply.result = RESULT_QUEUE_FULL;
+            }
+        } else if (request.type == MSG_SETTING) {
+            const char* keys[] = {"", "set_velocity", "set_acceleration", "set_backlash", "set_resolution"};
+            bool ok = request.code >= 1 && request.code <= 4 &&
+                      applySetting(keys[request.code], request.steps1 - 1, String(request.value, 4));
+            if (!ok) reply.result = RESULT_INVALID;
+        } else if (request.type == MSG_JOG) {
+            setJog(request.steps1, request.steps2);
+        } else if (request.type != MSG_STATUS && request.type != MSG_PING) {
+            reply.result = RESULT_INVALID;
+        }
+        lastReply = reply;
+        haveLastReply = true;
+    }
+
+    // Status as of now, also for a repeated request
+    lastReply.running = runningMoveId;
+    lastReply.completed = completedMoveId;
+    lastReply.aborted = abortedMoveId;
+    lastReply.queued = (queueHead - queueTail + MOVE_QUEUE_SIZE) % MOVE_QUEUE_SIZE;
+    lastReply.position1 = motorPositions[0];
+    lastReply.position2 = motorPositions[1];
+    udp.beginPacket(udp.remoteIP(), udp.remotePort());
+    udp.write((const uint8_t*)&lastReply, sizeof(lastReply));
+    udp.endPacket();
+}
+
+// Push position, velocity and move progress to the subscriber when due
+void sendTelemetry() {
+    if (telemetryInterval == 0) return;
+    unsigned long now = millis();
+    if (now - telemetryLeaseStart > TELEMETRY_LEASE_MS) {
+        telemetryInterval = 0;
+        Serial.println("Telemetry subscription lapsed");
+        return;
+    }
+    if (now - lastTelemetry < telemetryInterval && telemetrySeq != 0) return;
+    lastTelemetry = now;
+
+    struct_telemetry packet = {};
+    packet.type = MSG_TELEMETRY;
+    packet.seq = ++telemetrySeq;
+    packet.timeMs = now;
+    packet.position1 = motorPositions[0];
+    packet.position2 = motorPositions[1];
+    if (stepper.active) {
+        // Speed of the longest axis; the others step in proportion
+        float rate = (float)stepper.increment * TICK_RATE / 4294967296.0;
+        packet.velocity1 = rate * stepper.count[0] / stepper.total * stepper.dir[0];
+        packet.velocity2 = rate * stepper.count[1] / stepper.total * stepper.dir[1];
+        packet.flags = (stepper.count[0] ? 1 : 0) | (stepper.count[1] ? 2 : 0);
+    }
+    packet.running = runningMoveId;
+    packet.completed = completedMoveId;
+    packet.aborted = abortedMoveId;
+    packet.lastMove = nextMoveId - 1;
+    packet.queued = (queueHead - queueTail + MOVE_QUEUE_SIZE) % MOVE_QUEUE_SIZE;
+    udp.beginPacket(telemetryIP, telemetryPort);
+    udp.write((const uint8_t*)&packet, sizeof(packet));
+    udp.endPacket();
+}
+
+// Add a "move:1,F,100" or "1,F,100" command to signed per-axis steps
+bool parseMove(String command, long steps[MOTOR_COUNT]) {
     int motorNum;
     char direction;
-    int steps;
-
-    Serial.println("Processing command: " + command); // Debugging
+    int count;
 
     // Strip "move:" prefix if present (for web interface commands)
     if (command.startsWith("move:")) {
-        command = command.substring(5); // Remove "move:" prefix
-        Serial.println("Stripped prefix, command is now: " + command);
-    }
-
-    if (sscanf(command.c_str(), "%d,%c,%d", &motorNum, &direction, &steps) == 3) {
-        Serial.printf("Parsed command: Motor %d, Direction %c, Steps %d\n",
-                      motorNum, direction, steps);
-
-        if (motorNum >= 1 && motorNum <= MOTOR_COUNT) {
-            int motorIndex = motorNum - 1;
-            int velo = motors[motorIndex].velocity;
-            int bac = motors[motorIndex].backlash;
-            float acc = motors[motorIndex].accelTime;
-            bool newDirection = (direction == 'F' || direction == 'f');
-
-            // Backlash Compensation - apply when direction changes
-            if (motors[motorIndex].lastDirection != newDirection && motors[motorIndex].backlash > 0) {
-                Serial.printf("Direction changed - Applying Backlash Compensation: %d steps\n", motors[motorIndex].backlash);
-                // Set direction for backlash compensation (in the new direction)
-                digitalWrite(motors[motorIndex].dirPin, newDirection ? HIGH : LOW);
-                // Move backlash steps in the new direction to take up slack
-                // Use a fast speed (higher than normal) and no acceleration for backlash compensation
-                int backlashSpeed = velo > 2000 ? velo : 2000; // Use at least 2000 steps/sec for backlash
-                moveSteps(motorIndex, motors[motorIndex].backlash, backlashSpeed, 0.0);
-                // Update position for backlash compensation
-                motorPositions[motorIndex] += newDirection ? motors[motorIndex].backlash : -motors[motorIndex].backlash;
-                preferences.putLong(("motor" + String(motorIndex+1) + "_position").c_str(), motorPositions[motorIndex]);
-            }
-
-            // Set direction for main movement
-            digitalWrite(motors[motorIndex].dirPin, newDirection ? HIGH : LOW);
+        command = command.substring(5);
+    }
 
-            moveSteps(motorIndex, steps, velo, acc);
-            // Update position for main movement
-            motorPositions[motorIndex] += newDirection ? steps : -steps;
-            preferences.putLong(("motor" + String(motorIndex+1) + "_position").c_str(), motorPositions[motorIndex]);
-            
-            motors[motorIndex].active = true;
-            motors[motorIndex].lastDirection = newDirection;
-        } else {
-            Serial.printf("Invalid motor number: %d (must be 1-%d)\n", motorNum, MOTOR_COUNT);
-        }
-    } else {
+    if (sscanf(command.c_str(), "%d,%c,%d", &motorNum, &direction, &count) != 3) {
         Serial.printf("Invalid Command Format! Expected format: 'motor,direction,steps' or 'move:motor,direction,steps'\n");
         Serial.printf("Received: '%s'\n", command.c_str());
         Serial.printf("Example: '1,B,2000' or 'move:1,B,2000'\n");
+        return false;
+    }
+    if (motorNum < 1 || motorNum > MOTOR_COUNT) {
+        Serial.printf("Invalid motor number: %d (must be 1-%d)\n", motorNum, MOTOR_COUNT);
+        return false;
     }
+    bool forward = (direction == 'F' || direction == 'f');
+    steps[motorNum - 1] += forward ? count : -count;
+    return true;
 }
 
-void moveSteps(int motorIndex, int steps, int maxSpeed, float accelTime) {
-    digitalWrite(motors[motorIndex].enablePin, LOW); // Ensure motor is enabled
-    #if DEBUG_SERIAL
-    Serial.printf("Motor %d | Steps: %d | Max Speed: %d | Accel Time %f\n", motorIndex + 1, steps, maxSpeed, accelTime);
-    #endif
-
-    // If acceleration time is zero, skip acceleration/deceleration and run at max speed
-    if (accelTime == 0.0 || accelTime < 0.001) {
-        double minDelay = (1.0 / maxSpeed) * 1000000; // Convert to microseconds
-        for (int i = 0; i < steps; i++) {
-            digitalWrite(motors[motorIndex].stepPin, HIGH);
-            delayMicroseconds(minDelay);
-            digitalWrite(motors[motorIndex].stepPin, LOW);
-            delayMicroseconds(minDelay);
+// Queue a move of signed steps per axis; returns its ID, or 0 if the queue is full
+unsigned long queueMove(long steps[MOTOR_COUNT]) {
+    int next = (queueHead + 1) % MOVE_QUEUE_SIZE;
+    if (next == queueTail) {
+        Serial.println("Move queue full");
+        return 0;
+    }
+    Move &move = moveQueue[queueHead];
+    move.id = nextMoveId++;
+    for (int i = 0; i < MOTOR_COUNT; i++) {
+        move.steps[i] = steps[i];
+        if (steps[i] == 0) continue;
+        // Backlash Compensation - take up the slack when the direction changes
+        bool forward = steps[i] > 0;
+        if (queuedDirection[i] != forward && motors[i].backlash > 0) {
+            Serial.printf("Motor %d direction changed - adding %d backlash steps\n", i + 1, motors[i].backlash);
+            move.steps[i] += forward ? motors[i].backlash : -motors[i].backlash;
         }
-        return;
+        queuedDirection[i] = forward;
     }
+    queueHead = next;
+    return move.id;
+}
 
-    // Constants
-    const int max_M = steps/2;  // Max upper limit for M
-    const double sum_constant = 2000e-6;  // 2000 * 10^-6 aboslute max delay (min speed)
-    const float min_value = 1.0/maxSpeed;  // 80 * 10^-6 is absolute min delay (max speed)
-    double R_target = accelTime/2;  // Desired sum target, divide by two because off by factor of 2 somehow
-        Serial.print("minDelay d: ");
-        Serial.print(min_value*1000000, 10);
-        Serial.println(" micro seconds");
-    int optimal_M = -1;
-    double optimal_t = -1.0;
-    double computed_sum = 0.0;
-    
-    for (int M = max_M; M > 0; M--) { // Iterate from max_M downwards to find the largest valid M
-        double sum_i_part = (M * (M + 1)) / 2.0; // Compute sum of i from 0 to M using formula M*(M+1)/2
-        double sum_constant_part = (M + 1) * sum_constant;
-        double t_value = (sum_constant_part - R_target) / sum_i_part; // Solve for t
-        double min_value_check = sum_constant - M * t_value; // Check minimum value constraint
-
-        if (t_value > 0 && min_value_check >= min_value) {
-            optimal_M = M;
-            optimal_t = t_value;
-            
-            computed_sum = 0.0; // Compute actual sum for verification
-            for (int i = 0; i <= M; i++) {
-                computed_sum += (sum_constant - i * optimal_t);
+// Single move command from the serial console; returns the move ID or 0
+unsigned long processCommand(String command) {
+    long steps[MOTOR_COUNT] = {0};
+    Serial.println("Processing command: " + command); // Debugging
+    if (!parseMove(command, steps)) return 0;
+    return queueMove(steps);
+}
+
+// Step pin levels from the interrupt (digitalWrite is interrupt-safe)
+void IRAM_ATTR onStepTimer() {
+    // End the pulses started on the previous tick
+    for (int i = 0; i < MOTOR_COUNT; i++) {
+        if (stepHigh[i]) {
+            digitalWrite(motors[i].stepPin, LOW);
+            stepHigh[i] = false;
+        }
+    }
+    if (!stepper.active) return;
+
+    uint32_t before = stepper.phase;
+    stepper.phase += stepper.increment;
+    if (stepper.phase < before) {
+        // Phase overflow: one step of the longest axis, the others in proportion
+        for (int i = 0; i < MOTOR_COUNT; i++) {
+            stepper.error[i] += stepper.count[i];
+            if (stepper.error[i] >= stepper.total) {
+                stepper.error[i] -= stepper.total;
+                digitalWrite(motors[i].stepPin, HIGH);
+                stepHigh[i] = true;
+                motorPositions[i] += stepper.dir[i];
             }
-            break;  // Stop once a valid M is found
+        }
+        stepper.done++;
+        if (!stepper.jog && stepper.done >= stepper.total) {
+            stepper.active = false;
+            completedMoveId = stepper.id;
+            runningMoveId = 0;
+            return;
         }
     }
 
-    #if DEBUG_SERIAL
-    if (optimal_M == -1) Serial.println("No valid solution found.");
-    #endif
-    optimal_t = optimal_t*1000000;
-    double maxDelay = sum_constant*1000000; // Start slow
-    double stepDelay = maxDelay;
-    int decelSteps = optimal_M;
-    int accelSteps = optimal_M;
-    int cruiseSteps = steps - (optimal_M + optimal_M); // Remaining steps
-    double minDelay = min_value*1000000;
-
-    // **Acceleration Phase**
-    for (int i = 0; i < accelSteps; i++) {
-        stepDelay = maxDelay - i*optimal_t; // Decrease delay
-        digitalWrite(motors[motorIndex].stepPin, HIGH);
-        delayMicroseconds(stepDelay);
-        digitalWrite(motors[motorIndex].stepPin, LOW);
-        delayMicroseconds(stepDelay);
+    if (stepper.jog) {
+        // Ramp towards the jog speed; a target of 0 slows to the start rate and ends the jog
+        uint32_t target = stepper.targetIncrement;
+        if (target == 0) {
+            if (stepper.increment > stepper.startIncrement + stepper.accelIncrement) {
+                stepper.increment -= stepper.accelIncrement;
+            } else {
+                stepper.active = false;
+                completedMoveId = stepper.id;
+                runningMoveId = 0;
+            }
+        } else if (stepper.increment + stepper.accelIncrement < target) {
+            stepper.increment += stepper.accelIncrement;
+        } else if (stepper.increment > target + stepper.accelIncrement) {
+            stepper.increment -= stepper.accelIncrement;
+        } else {
+            stepper.increment = target;
+        }
+        return;
     }
-    
-    for (int i = 0; i < cruiseSteps; i++) { // **Cruise Phase (Constant Speed)**
-        digitalWrite(motors[motorIndex].stepPin, HIGH);
-        delayMicroseconds(stepDelay);
-        digitalWrite(motors[motorIndex].stepPin, LOW);
-        delayMicroseconds(stepDelay);
-    } 
-    
-    for (int i = 0; i < decelSteps; i++) { // **Deceleration Phase**
-        stepDelay = minDelay + i*optimal_t; // Increase delay
-        digitalWrite(motors[motorIndex].stepPin, HIGH);
-        delayMicroseconds(stepDelay);
-        digitalWrite(motors[motorIndex].stepPin, LOW);
-        delayMicroseconds(stepDelay);
+
+    // Trapezoidal speed profile: decelerate over as many steps as the ramp up took
+    long remaining = stepper.total - stepper.done;
+    if (remaining <= stepper.rampSteps) {
+        if (stepper.increment > stepper.startIncrement + stepper.accelIncrement) {
+            stepper.increment -= stepper.accelIncrement;
+        } else {
+            stepper.increment = stepper.startIncrement;
+        }
+    } else if (stepper.increment < stepper.maxIncrement) {
+        stepper.increment += stepper.accelIncrement;
+        if (stepper.increment > stepper.maxIncrement) stepper.increment = stepper.maxIncrement;
+        stepper.rampSteps = stepper.done;
+    }
+}
+
+// Step rate (steps/sec) as phase increment per tick
+uint32_t rateToIncrement(double rate) {
+    return (uint32_t)(rate / TICK_RATE * 4294967296.0);
+}
+
+// Called from loop(): start the next queued move, save positions, handle emergency stop
+void updateStepper() {
+    if (emergencyStop) {
+        stepper.active = false;
+        queueTail = queueHead;
+        jogRate[0] = jogRate[1] = 0;
+        // The running and queued moves did not complete: report them apart
+        if (nextMoveId - 1 > completedMoveId) abortedMoveId = nextMoveId - 1;
+        runningMoveId = 0;
+        emergencyStop = false;
+        positionsSaved = false;
+        Serial.println("Motion stopped, move queue cleared");
+    }
+    if ((jogRate[0] != 0 || jogRate[1] != 0) && millis() - jogRenewed > JOG_TIMEOUT_MS) {
+        jogRate[0] = jogRate[1] = 0;
+        Serial.println("Jog not renewed, stopping");
+    }
+    if (stepper.active && stepper.jog) {
+        // Same directions and axis ratio (only the speed changed): ramp to the new speed without stopping.
+        // A new direction or ratio needs new step counts: ramp down, and restart once stopped
+        bool sameLine = true;
+        long longest = 0;
+        for (int i = 0; i < MOTOR_COUNT; i++) {
+            if ((jogRate[i] > 0) != (stepper.jogRate[i] > 0) || (jogRate[i] < 0) != (stepper.jogRate[i] < 0)) sameLine = false;
+            if (labs(jogRate[i]) > longest) longest = labs(jogRate[i]);
+        }
+        // Ratios within 1% (cross product against dot product), so rounded rates still count as the same line
+        int64_t cross = (int64_t)jogRate[0] * stepper.jogRate[1] - (int64_t)jogRate[1] * stepper.jogRate[0];
+        int64_t dot = (int64_t)jogRate[0] * stepper.jogRate[0] + (int64_t)jogRate[1] * stepper.jogRate[1];
+        if ((cross < 0 ? -cross : cross) * 100 > dot) sameLine = false;
+        stepper.targetIncrement = sameLine ? rateToIncrement(longest) : 0;
+    }
+    if (stepper.active) return;
+
+    if (!positionsSaved) {
+        for (int i = 0; i < MOTOR_COUNT; i++) {
+            preferences.putLong(("motor" + String(i+1) + "_position").c_str(), motorPositions[i]);
+        }
+        positionsSaved = true;
+    }
+    if (queueTail == queueHead) {
+        if (jogRate[0] != 0 || jogRate[1] != 0) startJog();
+        return;
     }
+
+    Move &move = moveQueue[queueTail];
+    queueTail = (queueTail + 1) % MOVE_QUEUE_SIZE;
+
+    long total = 0;
+    double maxRate = TICK_RATE / 2;  // A pulse and a gap take two ticks
+    float accelTime = 0;
+    for (int i = 0; i < MOTOR_COUNT; i++) {
+        long count = labs(move.steps[i]);
+        stepper.count[i] = count;
+        stepper.dir[i] = move.steps[i] >= 0 ? 1 : -1;
+        if (count == 0) continue;
+        bool forward = move.steps[i] > 0;
+        digitalWrite(motors[i].enablePin, LOW); // Ensure motor is enabled
+        digitalWrite(motors[i].dirPin, forward ? HIGH : LOW);
+        motors[i].active = true;
+        motors[i].lastDirection = forward;
+        if (count > total) total = count;
+        // The old blocking loop held each pin level for 1/velocity, one step per 2/velocity
+        // seconds; keep that rate so tuned velocities move the same. Slowest axis sets the pace.
+        double rate = motors[i].velocity / 2.0;
+        if (rate < maxRate) maxRate = rate;
+        if (motors[i].accelTime > accelTime) accelTime = motors[i].accelTime;
+    }
+    if (total == 0) {
+        completedMoveId = move.id;
+        return;
+    }
+
+    double startRate = 250.0;  // 2000 us per level, as the old profile started
+    if (startRate > maxRate || accelTime < 0.001) startRate = maxRate;
+    stepper.total = total;
+    for (int i = 0; i < MOTOR_COUNT; i++) {
+        stepper.error[i] = total / 2;
+    }
+    stepper.done = 0;
+    stepper.phase = 0;
+    stepper.startIncrement = rateToIncrement(startRate);
+    stepper.maxIncrement = rateToIncrement(maxRate);
+    stepper.increment = stepper.startIncrement;
+    double ticks = accelTime * TICK_RATE;
+    uint32_t accel = ticks >= 1 ? (uint32_t)((stepper.maxIncrement - stepper.startIncrement) / ticks) : 0;
+    stepper.accelIncrement = accel > 0 ? accel : 1;
+    stepper.rampSteps = 0;
+    stepper.jog = false;
+    stepper.id = move.id;
+    runningMoveId = move.id;
+    positionsSaved = false;
+    delayMicroseconds(5);  // Direction setup time before the first pulse
+    stepper.active = true;
+}
+
+// "jog:<rate1>,<rate2>" in signed steps/s; "jog:0,0" stops
+bool processJog(String command) {
+    long rate1, rate2;
+    if (!parseJog(command, rate1, rate2)) return false;
+    setJog(rate1, rate2);
+    return true;
+}
+
+bool parseJog(String command, long &rate1, long &rate2) {
+    if (sscanf(command.c_str() + 4, "%ld,%ld", &rate1, &rate2) != 2) {
+        Serial.printf("Invalid jog: '%s'\n", command.c_str());
+        return false;
+    }
+    return true;
 }
 
+// Set (or renew) the jog rates, limited to each motor's speed; updateStepper() follows them
+void setJog(long rate1, long rate2) {
+    long rates[MOTOR_COUNT] = {rate1, rate2};
+    for (int i = 0; i < MOTOR_COUNT; i++) {
+        long limit = motors[i].velocity / 2;  // Same rate as moves
+        if (rates[i] > limit) rates[i] = limit;
+        if (rates[i] < -limit) rates[i] = -limit;
+        jogRate[i] = rates[i];
+    }
+    jogRenewed = millis();
+}
+
+// Start a jog at jogRate as one endless Bresenham move: the fastest axis sets the phase rate
+void startJog() {
+    long total = 0;
+    for (int i = 0; i < MOTOR_COUNT; i++) {
+        long count = labs(jogRate[i]);
+        stepper.count[i] = count;
+        stepper.dir[i] = jogRate[i] >= 0 ? 1 : -1;
+        stepper.jogRate[i] = jogRate[i];
+        if (count == 0) continue;
+        bool forward = jogRate[i] > 0;
+        digitalWrite(motors[i].enablePin, LOW);
+        digitalWrite(motors[i].dirPin, forward ? HIGH : LOW);
+        motors[i].active = true;
+        motors[i].lastDirection = forward;
+        queuedDirection[i] = forward;
+        if (count > total) total = count;
+    }
+    if (total == 0) return;
+    float accelTime = motors[0].accelTime > motors[1].accelTime ? motors[0].accelTime : motors[1].accelTime;
+    double startRate = 250.0;
+    if (startRate > total || accelTime < 0.001) startRate = total;
+    stepper.total = total;
+    for (int i = 0; i < MOTOR_COUNT; i++) {
+        stepper.error[i] = total / 2;
+    }
+    stepper.done = 0;
+    stepper.phase = 0;
+    stepper.startIncrement = rateToIncrement(startRate);
+    stepper.maxIncrement = rateToIncrement(total);
+    stepper.targetIncrement = stepper.maxIncrement;
+    stepper.increment = stepper.startIncrement;
+    double ticks = accelTime * TICK_RATE;
+    uint32_t accel = ticks >= 1 ? (uint32_t)((stepper.maxIncrement - stepper.startIncrement) / ticks) : 0;
+    stepper.accelIncrement = accel > 0 ? accel : 1;
+    stepper.jog = true;
+    stepper.id = nextMoveId++;
+    runningMoveId = stepper.id;
+    positionsSaved = false;
+    delayMicroseconds(5);
+    stepper.active = true;
+}
@@ -0,0 +1,712 @@
+import json
+import struct
+import time
+from collections import OrderedDict, deque
+from urllib.parse import urlencode, urlparse
+
+import numpy as np
+from PyQt5.QtCore import QObject, QTimer, QUrl, pyqtSignal
+from PyQt5.QtNetwork import (QNetworkAccessManager, QNetworkRequest, QNetworkReply, QUdpSocket, QHostAddress,
+                             QHostInfo, QAbstractSocket)
+
+
+resolved_hosts = {}  # ESP32 host name -> QHostAddress
+looked_up_hosts = set()  # Host names being looked up, or not found
+current_host = None  # Host of the last base_url asked for
+
+
+def host_address(base_url):
+    """
+    Address of the host in base_url, or a null QHostAddress while a host name
+    is looked up in the background. A name is looked up once; one that was
+    not found is only looked up again after the URL has changed.
+    """
+    global current_host
+    host = urlparse(base_url).hostname or ""
+    if host != current_host:
+        current_host = host
+        looked_up_hosts.clear()
+    address = resolved_hosts.get(host)
+    if address is not None:
+        return address
+    address = QHostAddress(host)
+    if not address.isNull():
+        resolved_hosts[host] = address
+    elif host and host not in looked_up_hosts:
+        looked_up_hosts.add(host)
+        QHostInfo.lookupHost(host, lambda info: host_found(host, info))
+    return address
+
+
+def host_found(host, info):
+    addresses = [address for address in info.addresses() if address.protocol() == QAbstractSocket.IPv4Protocol]
+    if info.error() != QHostInfo.NoError or not addresses:
+        print(f"ESP32 address error: {host}: {info.errorString()}")
+        return
+    resolved_hosts[host] = addresses[0]
+
+
+class MotorCommand:
+    """One queued command; several calls may have been merged into it"""
+    def __init__(self, name, motor, value):
+        self.name = name  # "move", "jog" or an ESP32 setting such as "set_backlash"
+        self.motor = motor
+        self.value = value  # Signed steps for moves, (Alt, Azi) steps/s for jogs
+        self.callbacks = []
+        self.error_callbacks = []
+
+    def text(self):
+        """The command in the ESP32 syntax, or "" for a move that cancelled out"""
+        if self.name == "move":
+            if not self.value:
+                return ""
+            return f"move:{self.motor},{'F' if self.value > 0 else 'B'},{abs(int(self.value))}"
+        if self.name == "jog":
+            return f"jog:{self.value[0]},{self.value[1]}"
+        return f"{self.name}:{self.motor},{self.value}"
+
+
+class MotorClient(QObject):
+    """
+    Queued command channel to the ESP32 motor controller.
+
+    Commands wait in a queue with one entry per (command, motor): a new move
+    for a motor that is still queued is added to it (one net move per axis),
+    and a new setting replaces the queued value. Whenever no request is in
+    flight, everything queued goes out as one /command_batch request.
+    Nothing is dropped, however fast commands arrive, and the UI thread
+    never waits.
+
+    The ESP32 applies the batch's settings, queues its moves as one
+    coordinated move of both axes and replies at once with the move ID. /move_status is then polled until the move
+    has completed, and up to max_moves batches can be moving or queued on
+    the ESP32 at a time (later commands keep merging here meanwhile).
+
+    Each call's callback gets the reply text once its move is done (or at
+    once for settings); error_callback gets the error string if the batch
+    failed.
+
+    This class talks HTTP; the transport is confined to send_batch(),
+    request_status() and ping(), which report back through batch_done(),
+    batch_full(), batch_failed(), status_done() and status_failed(). Every
+    round trip is timed for latency_summary().
+    """
+    name = "HTTP"
+
+    def __init__(self, base_url, timeout=3000, poll_interval=20, max_moves=2, parent=None):
+        super().__init__(parent)
+        self.base_url = base_url  # Callable returning e.g. "http://192.168.1.100"
+        self.network_manager = QNetworkAccessManager(self)
+        self.network_manager.setTransferTimeout(timeout)  # The ESP32 replies before moving
+        self.queue = OrderedDict()  # (name, motor) -> MotorCommand
+        self.reply = None  # HTTP batch request in flight
+        self.sending = False  # A batch is in flight
+        self.in_flight = []  # Its commands
+        self.moving = []  # (move ID, commands, reply text) queued or running on the ESP32
+        self.max_moves = max_moves
+        self.status_reply = None
+        self.status_pending = False
+        self.ping_reply = None
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setSingleShot(True)
+        self.poll_timer.setInterval(poll_interval)
+        self.poll_timer.timeout.connect(self.poll_status)
+        self.positions = None  # Motor positions (steps) from the last status
+        self.mount_state = None  # MountState; while its telemetry is fresh, moves finish without polling
+        self.restarts_seen = 0  # mount_state.restarts when the moves in self.moving were queued
+        self.closing = False
+        self.batches = 0
+        self.commands = 0
+        self.coalesced = 0
+        self.round_trips = deque(maxlen=1000)  # Seconds, every request and ping
+        self.pings_left = 0
+
+    def move(self, motor, steps, callback=None, error_callback=None):
+        """Queue a relative move of motor by signed steps (positive = forward)"""
+        self.enqueue("move", motor, int(steps), callback, error_callback, add=True)
+
+    def jog(self, rate_alt, rate_azi, callback=None, error_callback=None):
+        """
+        Run both axes at constant signed speeds (steps/s) until the next jog;
+        (0, 0) stops. The ESP32 stops a jog that is not renewed within 0.5 s,
+        so call this again periodically while it should continue.
+        """
+        self.enqueue("jog", 0, (int(rate_alt), int(rate_azi)), callback, error_callback, add=False)
+
+    def setting(self, name, motor, value, callback=None, error_callback=None):
+        """Queue an ESP32 setting, e.g. ("set_backlash", 1, 30)"""
+        self.enqueue(name, motor, value, callback, error_callback, add=False)
+
+    def enqueue(self, name, motor, value, callback, error_callback, add):
+        if self.closing:
+            if error_callback:
+                error_callback("Closing")
+            return
+        command = self.queue.get((name, motor))
+        if command is None:
+            command = self.queue[(name, motor)] = MotorCommand(name, motor, value)
+        else:
+            command.value = command.value + value if add else value
+            self.coalesced += 1
+        if callback:
+            command.callbacks.append(callback)
+        if error_callback:
+            command.error_callbacks.append(error_callback)
+        # Send after the current event, so commands issued together share a batch
+        QTimer.singleShot(0, self.send_next)
+
+    def busy(self):
+        """True while commands are queued, a batch is in flight or moves are not finished"""
+        return self.sending or bool(self.queue) or bool(self.moving)
+
+    def send_next(self):
+        # A jog (start, stop or keep-alive) is not held back by moves in progress
+        moves_full = len(self.moving) >= self.max_moves and ("jog", 0) not in self.queue
+        if self.sending or not self.queue or self.closing or moves_full:
+            return
+        commands = list(self.queue.values())
+        self.queue.clear()
+        if not any(command.text() for command in commands):
+            # Everything cancelled out: nothing to send, but the callers are done
+            self.finish(commands, "Nothing to send", None)
+            return
+
+        self.sending = True
+        self.in_flight = commands
+        self.batches += 1
+        self.commands += len(commands)
+        self.send_batch(commands)
+
+    def send_batch(self, commands):
+        batch = ";".join(command.text() for command in commands if command.text())
+        url = f"{self.base_url()}/command_batch?" + urlencode({"cmd": batch})
+        self.reply = self.network_manager.get(QNetworkRequest(QUrl(url)))
+        self.reply.setProperty("sent_at", time.perf_counter())
+        self.reply.finished.connect(self.on_finished)
+
+    def on_finished(self):
+        reply = self.reply
+        self.reply = None
+        if self.closing:
+            reply.deleteLater()
+            return
+        status = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute)
+        if status == 503:
+            self.record_round_trip(reply.property("sent_at"))
+            self.batch_full()
+        elif reply.error() == QNetworkReply.NoError:
+            self.record_round_trip(reply.property("sent_at"))
+            result = reply.readAll().data().decode('utf-8')
+            try:
+                move = json.loads(result).get("move", 0)
+            except (ValueError, AttributeError):
+                move = 0  # Older firmware replies with text once the moves are done
+            self.batch_done(move, result)
+        else:
+            self.batch_failed(reply.errorString())
+        reply.deleteLater()
+
+    def batch_done(self, move, result):
+        """The ESP32 accepted the batch in flight; move is its move ID, or 0 if it queued no move"""
+        commands = self.take_in_flight()
+        if move:
+            if not self.moving and self.mount_state is not None:
+                self.restarts_seen = self.mount_state.restarts
+            self.moving.append((move, commands, result))
+            self.poll_timer.start()
+        else:
+            self.finish(commands, result, None)
+        self.send_next()
+
+    def batch_full(self):
+        """ESP32 move queue full: put the commands back in front and retry after the next status"""
+        for command in reversed(self.take_in_flight()):
+            self.requeue(command)
+        self.poll_timer.start()
+
+    def batch_failed(self, error):
+        commands = self.take_in_flight()
+        print(f"ESP32 Error: {error}")
+        print("Make sure the ESP32 is on the network and the IP is correct.")
+        self.finish(commands, None, error)
+        self.send_next()
+
+    def take_in_flight(self):
+        commands = self.in_flight
+        self.sending = False
+        self.in_flight = []
+        return commands
+
+    def requeue(self, command):
+        """Put a command back at the front of the queue, merged with anything queued since"""
+        key = (command.name, command.motor)
+        queued = self.queue.pop(key, None)
+        if queued is not None:
+            command.value = command.value + queued.value if command.name == "move" else queued.value
+            command.callbacks += queued.callbacks
+            command.error_callbacks += queued.error_callbacks
+        self.queue[key] = command
+        self.queue.move_to_end(key, last=False)
+
+    def poll_status(self):
+        """Ask the ESP32 which moves have completed"""
+        if self.status_pending or self.closing:
+            return
+        if not self.moving:
+            self.send_next()  # Retry after a full queue
+            return
+        if self.mount_state is not None and self.mount_state.fresh():
+            self.status_done(self.mount_state.status())
+            return
+        self.status_pending = True
+        self.request_status()
+
+    def request_status(self):
+        self.status_reply = self.network_manager.get(QNetworkRequest(QUrl(f"{self.base_url()}/move_status")))
+        self.status_reply.setProperty("sent_at", time.perf_counter())
+        self.status_reply.finished.connect(self.on_status)
+
+    def on_status(self):
+        reply = self.status_reply
+        self.status_reply = None
+        if self.closing:
+            reply.deleteLater()
+            return
+        if reply.error() == QNetworkReply.NoError:
+            self.record_round_trip(reply.property("sent_at"))
+            try:
+                status = json.loads(reply.readAll().data().decode('utf-8'))
+            except ValueError as e:
+                print(f"ESP32 status error: {e}")
+                status = None
+            self.status_done(status)
+        else:
+            self.status_failed(reply.errorString())
+        reply.deleteLater()
+
+    def status_done(self, status):
+        """status: dict with running, completed, aborted, queued and positions as /move_status returns it"""
+        self.status_pending = False
+        try:
+            self.positions = status.get("positions")
+            restarts = status.get("restarts", self.restarts_seen)
+            if restarts != self.restarts_seen:
+                # The ESP32 restarted and lost its queue: moves newer than its last one never finish
+                self.restarts_seen = restarts
+                lost = [entry for entry in self.moving if entry[0] > status.get("last", 0)]
+                for entry in lost:
+                    self.moving.remove(entry)
+                    print(f"ESP32 {self.name}: restarted, move {entry[0]} lost")
+                    self.finish(entry[1], None, "ESP32 restarted")
+            # Moves up to "aborted" still waiting here were stopped by an emergency stop, not completed
+            stopped = [entry for entry in self.moving if entry[0] <= status.get("aborted", 0)]
+            for entry in stopped:
+                self.moving.remove(entry)
+                print(f"ESP32 {self.name}: move {entry[0]} stopped")
+                self.finish(entry[1], None, "Emergency stop")
+            # Nothing running or queued also means done (e.g. older firmware, or a restart seen by polling),
+            # for moves the status knows about ("last" is the newest move ID it has seen)
+            idle = not status.get("running") and not status.get("queued")
+            done = [entry for entry in self.moving
+                    if entry[0] <= status.get("completed", 0) or (idle and entry[0] <= status.get("last", entry[0]))]
+        except AttributeError:
+            done = []
+        for entry in done:
+            self.moving.remove(entry)
+            self.finish(entry[1], entry[2], None)
+        self.send_next()
+        if self.moving:
+            self.poll_timer.start()
+
+    def status_failed(self, error):
+        # Without status the moves' outcome is unknown; report them as failed
+        self.status_pending = False
+        print(f"ESP32 Error: {error}")
+        moving, self.moving = self.moving, []
+        for entry in moving:
+            self.finish(entry[1], None, error)
+        self.send_next()
+
+    def finish(self, commands, result, error):
+        for command in commands:
+            for callback in (command.callbacks if error is None else command.error_callbacks):
+                try:
+                    callback(result if error is None else error)
+                except Exception as e:
+                    print(f"Motor command callback error: {e}")
+
+    def abort(self, notify=False):
+        """
+        Drop the queue and abort the requests in flight (on shutdown). With
+        notify, every pending command's error_callback gets "Aborted", so
+        callers waiting on a move (the guider) carry on when the client is
+        replaced.
+        """
+        self.closing = True
+        pending = list(self.queue.values()) + self.in_flight
+        for entry in self.moving:
+            pending += entry[1]
+        self.queue.clear()
+        self.in_flight = []
+        self.moving = []
+        self.poll_timer.stop()
+        self.pings_left = 0
+        self.abort_requests()
+        if notify:
+            self.finish(pending, None, "Aborted")
+
+    def abort_requests(self):
+        for reply in (self.reply, self.status_reply, self.ping_reply):
+            if reply is not None and not reply.isFinished():
+                reply.abort()
+
+    def summary(self):
+        return (f"{self.commands} motor commands in {self.batches} {self.name} requests, "
+                f"{self.coalesced} merged, round trip {self.latency_summary()}")
+
+    def ping(self):
+        """Send one request that only measures the round trip; calls ping_done() when answered"""
+        self.ping_reply = self.network_manager.get(QNetworkRequest(QUrl(f"{self.base_url()}/move_status")))
+        self.ping_reply.setProperty("sent_at", time.perf_counter())
+        self.ping_reply.finished.connect(self.on_ping)
+
+    def on_ping(self):
+        reply = self.ping_reply
+        self.ping_reply = None
+        ok = reply.error() == QNetworkReply.NoError
+        if ok:
+            self.record_round_trip(reply.property("sent_at"))
+        reply.deleteLater()
+        self.ping_done(ok)
+
+    def measure_latency(self, count=20):
+        """Send count pings one after another and print the round-trip statistics"""
+        if self.pings_left or self.closing:
+            return
+        self.round_trips.clear()
+        self.pings_left = count
+        self.ping()
+
+    def ping_done(self, ok):
+        if not self.pings_left or self.closing:
+            return
+        self.pings_left -= 1
+        if not ok:
+            print(f"ESP32 {self.name} ping failed")
+        if self.pings_left:
+            self.ping()
+        else:
+            print(f"ESP32 {self.name} round trip: {self.latency_summary()}")
+
+    def record_round_trip(self, sent_at):
+        if sent_at is not None:
+            self.round_trips.append(time.perf_counter() - sent_at)
+
+    def latency_summary(self):
+        if not self.round_trips:
+            return "not measured"
+        times = np.array(self.round_trips) * 1000
+        return (f"median {np.median(times):.1f} ms, 95% {np.percentile(times, 95):.1f} ms, "
+                f"max {times.max():.1f} ms ({len(times)} requests)")
+
+
+class UdpMotorClient(MotorClient):
+    """
+    MotorClient over the ESP32's binary UDP channel (port 4210).
+
+    Requests are 16 bytes (type, code, seq, steps1, steps2, value) and
+    replies 32 bytes (type, result, seq, move ID, running, completed,
+    queued, positions, aborted), little-endian, so a command costs one small
+    datagram each way instead of an HTTP connection. One request is
+    outstanding at a time and resent with the same seq if unanswered; the
+    ESP32 answers a repeated seq from its cached reply, so a retried move
+    never runs twice. A batch goes out as one packet per setting followed
+    by one move packet for both axes.
+    """
+    name = "UDP"
+    port = 4210
+    retry_interval = 0.1  # Seconds before an unanswered request is resent
+    max_tries = 5
+
+    MSG_MOVE = 1
+    MSG_STATUS = 2
+    MSG_SETTING = 3
+    MSG_PING = 4
+    MSG_SUBSCRIBE = 5
+    MSG_TELEMETRY = 6
+    MSG_JOG = 7
+    REQUEST = struct.Struct('<BBHiif')
+    REPLY = struct.Struct('<BBHIIIHHiiI')
+    SETTING_CODES = {"set_velocity": 1, "set_acceleration": 2, "set_backlash": 3, "set_resolution": 4}
+
+    def __init__(self, base_url, timeout=3000, poll_interval=20, max_moves=2, parent=None):
+        super().__init__(base_url, timeout, poll_interval, max_moves, parent)
+        self.socket = QUdpSocket(self)
+        self.socket.readyRead.connect(self.on_datagrams)
+        self.seq = 0
+        self.requests = deque()  # (type, code, steps1, steps2, value, handler) waiting to be sent
+        self.current = None  # [seq, packet, handler, sent_at, first_sent_at, tries]
+        self.retry_timer = QTimer(self)
+        self.retry_timer.setInterval(int(self.retry_interval * 1000))
+        self.retry_timer.timeout.connect(self.check_retry)
+        self.batch_requests = 0  # Packets of the batch in flight still unanswered
+        self.batch_error = None
+        self.batch_state = None  # Reply to the batch's move packet
+
+    def request(self, message_type, handler, code=0, steps1=0, steps2=0, value=0.0):
+        """Queue a request; handler(reply tuple) on the answer, handler(None) after the last retry"""
+        self.requests.append((message_type, code, steps1, steps2, value, handler))
+        self.send_request()
+
+    def send_request(self):
+        if self.current is not None or not self.requests or self.closing:
+            return
+        message_type, code, steps1, steps2, value, handler = self.requests.popleft()
+        self.seq = (self.seq + 1) % 65536
+        packet = self.REQUEST.pack(message_type, code, self.seq, steps1, steps2, value)
+        now = time.perf_counter()
+        self.current = [self.seq, packet, handler, now, now, 1]
+        self.send_datagram(packet)
+        self.retry_timer.start()
+
+    def check_retry(self):
+        if self.current is None:
+            self.retry_timer.stop()
+            return
+        now = time.perf_counter()
+        if now - self.current[3] < self.retry_interval:
+            return
+        if self.current[5] >= self.max_tries:
+            handler = self.current[2]
+            self.current = None
+            self.retry_timer.stop()
+            handler(None)
+            self.send_request()
+            return
+        self.current[3] = now
+        self.current[5] += 1
+        self.send_datagram(self.current[1])
+
+    def send_datagram(self, packet):
+        # Until the host name is looked up the packet is not sent, and the retries cover it
+        address = host_address(self.base_url())
+        if not address.isNull():
+            self.socket.writeDatagram(packet, address, self.port)
+
+    def on_datagrams(self):
+        while self.socket.hasPendingDatagrams():
+            data, _, _ = self.socket.readDatagram(self.socket.pendingDatagramSize())
+            if len(data) != self.REPLY.size or self.current is None:
+                continue
+            reply = self.REPLY.unpack(data)
+            if reply[2] != self.current[0]:
+                continue  # Late answer to an earlier try
+            # A retried request is timed from its last send
+            self.record_round_trip(self.current[3])
+            handler = self.current[2]
+            self.current = None
+            self.retry_timer.stop()
+            handler(reply)
+            self.send_request()
+
+    def send_batch(self, commands):
+        steps = [0, 0]
+        settings = []
+        jog = None
+        for command in commands:
+            if not command.text():
+                continue
+            if command.name == "move" and command.motor in (1, 2):
+                steps[command.motor - 1] += int(command.value)
+            elif command.name == "jog":
+                jog = command.value
+            elif command.name in self.SETTING_CODES and command.motor in (1, 2):
+                settings.append(command)
+            else:
+                print(f"ESP32 {self.name}: {command.text()} not supported, skipped")
+        self.batch_requests = len(settings) + (jog is not None) + 1
+        self.batch_error = None
+        self.batch_state = None
+        for command in settings:
+            try:
+                value = float(command.value)
+            except (TypeError, ValueError):
+                value = float("nan")
+            self.request(self.MSG_SETTING, self.on_batch_reply, self.SETTING_CODES[command.name], command.motor, 0, value)
+        if jog is not None:
+            self.request(self.MSG_JOG, self.on_batch_reply, 0, jog[0], jog[1])
+        self.request(self.MSG_MOVE, self.on_batch_reply, 0, steps[0], steps[1])
+
+    def on_batch_reply(self, reply):
+        if not self.sending:
+            return
+        self.batch_requests -= 1
+        if reply is None:
+            self.batch_error = "No reply from the ESP32"
+        elif reply[0] == self.MSG_SETTING and reply[1] != 0:
+            print(f"ESP32 {self.name}: setting rejected")
+        elif reply[0] == self.MSG_MOVE:
+            self.batch_state = reply
+        if self.batch_requests:
+            return
+        if self.batch_error is not None:
+            self.batch_failed(self.batch_error)
+        elif self.batch_state[1] == 1:
+            self.batch_full()
+        else:
+            self.positions = list(self.batch_state[8:10])
+            move = self.batch_state[3]
+            self.batch_done(move, json.dumps({"move": move, "commands": len(self.in_flight)}))
+
+    def request_status(self):
+        self.request(self.MSG_STATUS, self.on_status_reply)
+
+    def on_status_reply(self, reply):
+        if self.closing:
+            return
+        if reply is None:
+            self.status_failed("No reply from the ESP32")
+            return
+        _, _, _, _, running, completed, queued, _, position1, position2, aborted = reply
+        self.status_done({"running": running, "completed": completed, "aborted": aborted, "queued": queued,
+                          "positions": [position1, position2]})
+
+    def ping(self):
+        self.request(self.MSG_PING, lambda reply: self.ping_done(reply is not None))
+
+    def abort_requests(self):
+        self.requests.clear()
+        self.current = None
+        self.retry_timer.stop()
+        self.socket.close()
+
+
+class MountState:
+    """
+    Latest telemetry from the ESP32, cached so the guider, the UI and the
+    trajectory log can read the mount position without a request.
+
+    Positions and velocities are in steps and steps/s (Alt, Azi);
+    received_at is the perf_counter time the packet arrived.
+    """
+    max_age = 0.2  # Seconds after which the cache no longer counts as current
+
+    def __init__(self):
+        self.positions = None
+        self.velocities = (0.0, 0.0)
+        self.moving = (False, False)
+        self.running = 0
+        self.completed = 0
+        self.aborted = 0  # Newest move an emergency stop cut short or dropped
+        self.last_move = 0
+        self.queued = 0
+        self.device_time = None  # ESP32 millis() of the packet
+        self.received_at = None
+        self.packets = 0
+        self.lost = 0
+        self.seq = None
+        self.restarts = 0  # ESP32 restarts seen (millis() went back)
+
+    def update(self, seq, flags, device_time, positions, velocities, running, completed, last_move, queued, aborted=0):
+        if self.device_time is not None and device_time + 1000 < self.device_time:
+            # Restarted: its sequence and move IDs start again
+            self.restarts += 1
+        elif self.seq is not None:
+            gap = (seq - self.seq - 1) % 65536
+            if gap >= 32768:
+                return  # Duplicate or late packet, older than the state we have
+            self.lost += gap
+        self.seq = seq
+        self.positions = positions
+        self.velocities = velocities
+        self.moving = (bool(flags & 1), bool(flags & 2))
+        self.running = running
+        self.completed = completed
+        self.aborted = aborted
+        self.last_move = last_move
+        self.queued = queued
+        self.device_time = device_time
+        self.received_at = time.perf_counter()
+        self.packets += 1
+
+    def age(self):
+        if self.received_at is None:
+            return float("inf")
+        return time.perf_counter() - self.received_at
+
+    def fresh(self):
+        return self.age() < self.max_age
+
+    def position_at(self, t):
+        """Positions (steps) at perf_counter time t, extrapolated at the reported velocities"""
+        dt = min(max(t - self.received_at, 0.0), self.max_age)
+        return tuple(int(round(p + v * dt)) for p, v in zip(self.positions, self.velocities))
+
+    def status(self):
+        """The state as a /move_status reply"""
+        return {"running": self.running, "completed": self.completed, "aborted": self.aborted, "queued": self.queued,
+                "last": self.last_move, "restarts": self.restarts, "positions": list(self.positions)}
+
+    def describe(self):
+        if self.positions is None:
+            return "No telemetry"
+        moving = " moving" if any(self.moving) else ""
+        stale = f" ({self.age():.1f} s old)" if not self.fresh() else ""
+        return f"Alt {self.positions[0]}, Azi {self.positions[1]} steps{moving}{stale}"
+
+
+class TelemetryClient(QObject):
+    """
+    Subscribes to the ESP32 telemetry push (UDP, see UdpMotorClient) and
+    keeps a MountState up to date. The ESP32 drops a subscription after 5 s,
+    so it is renewed every `renew_interval` seconds; this also follows IP
+    changes and ESP32 restarts. updated is emitted for every packet.
+    """
+    updated = pyqtSignal()
+
+    port = UdpMotorClient.port
+    renew_interval = 2.0
+    TELEMETRY = struct.Struct('<BBHIiiffIIIHHI')
+
+    def __init__(self, base_url, rate=25, parent=None):
+        super().__init__(parent)
+        self.base_url = base_url
+        self.rate = rate  # Packets per second requested, up to 50
+        self.state = MountState()
+        self.socket = QUdpSocket(self)
+        self.socket.readyRead.connect(self.on_datagrams)
+        self.renew_timer = QTimer(self)
+        self.renew_timer.timeout.connect(self.subscribe)
+
+    def start(self):
+        self.subscribe()
+        self.renew_timer.start(int(self.renew_interval * 1000))
+
+    def stop(self):
+        self.renew_timer.stop()
+        self.send_subscribe(0)
+
+    def subscribe(self):
+        self.send_subscribe(self.rate)
+
+    def send_subscribe(self, rate):
+        address = host_address(self.base_url())
+        if address.isNull():
+            return
+        packet = UdpMotorClient.REQUEST.pack(UdpMotorClient.MSG_SUBSCRIBE, 0, 0, 0, 0, float(rate))
+        self.socket.writeDatagram(packet, address, self.port)
+
+    def on_datagrams(self):
+        while self.socket.hasPendingDatagrams():
+            data, _, _ = self.socket.readDatagram(self.socket.pendingDatagramSize())
+            if len(data) != self.TELEMETRY.size or data[0] != UdpMotorClient.MSG_TELEMETRY:
+                continue
+            (_, flags, seq, device_time, position1, position2, velocity1, velocity2,
+             running, completed, last_move, queued, _, aborted) = self.TELEMETRY.unpack(data)
+            self.state.update(seq, flags, device_time, (position1, position2), (velocity1, velocity2),
+                              running, completed, last_move, queued, aborted)
+            self.updated.emit()
+
+
+# Names shown in the transport selector
+MOTOR_TRANSPORTS = {"HTTP": MotorClient, "UDP": UdpMotorClient}
@@ -0,0 +1,190 @@
+from collections import deque
+
+import numpy as np
+
+
+def best_fit_curve(x, y, t, degree=2):
+    """
+    Create a best fit curve function given arrays of x positions, y positions, and time t.
+
+    Parameters:
+        x (array-like): Array of x positions.
+        y (array-like): Array of y positions.
+        t (array-like): Time array corresponding to x and y positions.
+        degree (int): Degree of the polynomial fit (default is 2 for quadratic).
+
+    Returns:
+        tuple: Two functions (fx, fy) that predict x and y positions given time.
+    """
+    # Fit polynomial to x(t) and y(t)
+    x_coeffs = np.polyfit(t, x, degree)
+    y_coeffs = np.polyfit(t, y, degree)
+
+    # Create polynomial functions
+    fx = np.poly1d(x_coeffs)
+    fy = np.poly1d(y_coeffs)
+    return fx, fy
+
+
+class KalmanPredictor:
+    """
+    Kalman filter on the target's x and y position with a constant-velocity
+    (order=1) or constant-acceleration (order=2) motion model.
+
+    Both axes use the same motion model, time steps and noise levels, so
+    they share one covariance matrix and the state is a (order+1, 2) array
+    with x in the first column and y in the second.
+
+    process_noise is the spectral density of the unmodelled acceleration
+    (order 1) or jerk (order 2), in px^2/s^3 or px^2/s^5; measurement_noise
+    is the centroid error in px.
+    """
+    def __init__(self, order=1, process_noise=1.0, measurement_noise=0.5):
+        self.order = order
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.reset()
+
+    def reset(self):
+        self.state = None
+        self.covariance = None
+        self.time = None
+        self.updates = 0
+
+    def ready(self):
+        """True once the velocity (and acceleration) are estimated from data"""
+        return self.updates > self.order + 1
+
+    def transition(self, dt):
+        n = self.order + 1
+        F = np.eye(n)
+        F[0, 1] = dt
+        if n == 3:
+            F[0, 2] = dt * dt / 2
+            F[1, 2] = dt
+        q = self.process_noise
+        if n == 2:
+            Q = q * np.array([[dt ** 3 / 3, dt ** 2 / 2],
+                              [dt ** 2 / 2, dt]])
+        else:
+            Q = q * np.array([[dt ** 5 / 20, dt ** 4 / 8, dt ** 3 / 6],
+                              [dt ** 4 / 8, dt ** 3 / 3, dt ** 2 / 2],
+                              [dt ** 3 / 6, dt ** 2 / 2, dt]])
+        return F, Q
+
+    def update(self, t, x, y):
+        """Add a measured position at time t (seconds)"""
+        r = self.measurement_noise ** 2
+        if self.state is None:
+            self.state = np.zeros((self.order + 1, 2))
+            self.state[0] = (x, y)
+            self.covariance = np.diag([r] + [1e4] * self.order)
+            self.time = t
+            self.updates = 1
+            return
+
+        dt = max(t - self.time, 0.0)
+        F, Q = self.transition(dt)
+        state = F @ self.state
+        covariance = F @ self.covariance @ F.T + Q
+
+        # H = [1, 0, ...]: only the position is measured
+        innovation = np.array([x, y]) - state[0]
+        gain = covariance[:, 0] / (covariance[0, 0] + r)
+        self.state = state + np.outer(gain, innovation)
+        self.covariance = covariance - np.outer(gain, covariance[0])
+        self.time = t
+        self.updates += 1
+
+    def predict(self, t):
+        """Position (x, y) expected at time t"""
+        F, _ = self.transition(t - self.time)
+        position = F[0] @ self.state
+        return float(position[0]), float(position[1])
+
+    def velocity(self, t=None):
+        """Velocity (vx, vy) in px/s, at time t if given"""
+        if t is None or self.order == 1:
+            return float(self.state[1, 0]), float(self.state[1, 1])
+        velocity = self.state[1] + self.state[2] * (t - self.time)
+        return float(velocity[0]), float(velocity[1])
+
+
+class PolynomialPredictor:
+    """
+    Least-squares polynomial through the last window positions
+    (best_fit_curve), as an alternative to the Kalman filter for smooth,
+    well-sampled paths. Times are taken relative to the latest sample so
+    the fit stays well conditioned.
+    """
+    def __init__(self, degree=2, window=20):
+        self.degree = degree
+        self.samples = deque(maxlen=window)
+        self.fx = None
+        self.fy = None
+
+    def reset(self):
+        self.samples.clear()
+        self.fx = None
+        self.fy = None
+
+    def ready(self):
+        return len(self.samples) > self.degree + 1
+
+    def update(self, t, x, y):
+        self.samples.append((t, x, y))
+        if self.ready():
+            t_data, x_data, y_data = np.array(self.samples).T
+            self.fx, self.fy = best_fit_curve(x_data, y_data, t_data - t_data[-1], self.degree)
+
+    def predict(self, t):
+        t_last = self.samples[-1][0]
+        if self.fx is None:
+            return self.samples[-1][1], self.samples[-1][2]
+        return float(self.fx(t - t_last)), float(self.fy(t - t_last))
+
+    def velocity(self, t=None):
+        if self.fx is None:
+            return 0.0, 0.0
+        dt = 0.0 if t is None else t - self.samples[-1][0]
+        return float(self.fx.deriv()(dt)), float(self.fy.deriv()(dt))
+
+
+# Names shown in the guiding settings
+PREDICTORS = ["Off", "Kalman (velocity)", "Kalman (acceleration)", "Polynomial"]
+
+
+def create_predictor(name):
+    """Predictor for a PREDICTORS entry, or None when prediction is off"""
+    if name == "Kalman (velocity)":
+        return KalmanPredictor(order=1)
+    if name == "Kalman (acceleration)":
+        return KalmanPredictor(order=2)
+    if name == "Polynomial":
+        return PolynomialPredictor()
+    return None
+
+
+if __name__ == '__main__':
+    # Track a target accelerating across the sensor, measured with noisy centroids at 5 Hz
+    rng = np.random.default_rng(0)
+    t = np.arange(0, 20, 0.2)
+    true_x = 100 + 5 * t + 0.4 * t ** 2
+    true_y = 300 - 8 * t
+    measured_x = true_x + rng.normal(0, 0.5, len(t))
+    measured_y = true_y + rng.normal(0, 0.5, len(t))
+    lead = 0.5  # Predict half a second ahead
+
+    for name in PREDICTORS[1:]:
+        predictor = create_predictor(name)
+        errors = []
+        for i in range(len(t)):
+            predictor.update(t[i], measured_x[i], measured_y[i])
+            if predictor.ready() and i + 1 < len(t):
+                px, py = predictor.predict(t[i] + lead)
+                ex = 100 + 5 * (t[i] + lead) + 0.4 * (t[i] + lead) ** 2
+                ey = 300 - 8 * (t[i] + lead)
+                errors.append(np.hypot(px - ex, py - ey))
+        print(f"{name:<22} {lead}s-ahead RMS error {np.sqrt(np.mean(np.square(errors))):.2f} px")
+    hold = np.hypot(np.diff(true_x) * lead / 0.2, np.diff(true_y) * lead / 0.2)
+    print(f"{'No prediction':<22} {lead}s-ahead RMS error {np.sqrt(np.mean(hold ** 2)):.2f} px")
@@ -0,0 +1,155 @@
+import numpy as np
+from scipy import ndimage
+
+from star_measure import STAR_DTYPE, measure_stars
+
+
+# Frame star catalog: the star_measure fields plus the detection footprint
+CATALOG_DTYPE = np.dtype(STAR_DTYPE.descr + [('npix', np.int32)])
+
+
+class StarDetector:
+    """
+    Finds the stars in a whole frame and returns them as a CATALOG_DTYPE
+    array, brightest first, positions in pixels of the frame array
+    (x = column, y = row).
+
+    Detection runs on a 2x2 binned copy of the frame (a quarter of the
+    pixels, twice the SNR per pixel), made with two whole-row adds into
+    preallocated buffers:
+
+    - background and noise per tile from a subsampled median/MAD, refreshed
+      every background_interval frames and compared against the binned frame
+      tile by tile, without a full-size background image
+    - the few pixels above threshold are grouped by connected-component
+      labelling of a coarse cell grid (scipy.ndimage.label on cells of
+      cell x cell binned pixels), so labelling does not scan the full frame
+    - flux-weighted centroid and size per component with bincount
+
+    The brightest max_stars components are then measured at full resolution
+    with star_measure in one batch. Measurements below min_snr, or sharper
+    than max_sharpness (peak/flux; a Gaussian of 1.5 px FWHM has 0.4) are
+    hot pixels or noise and are dropped.
+    """
+    def __init__(self, tile=64, threshold=5.0, min_pixels=2, max_stars=50, box=11, fit=False,
+                 cell=4, background_interval=10, min_snr=5.0, max_sharpness=0.4):
+        self.tile = tile  # Background tile size in binned pixels
+        self.threshold = threshold  # Detection threshold in background sigmas
+        self.min_pixels = min_pixels  # Smaller components (binned pixels) are hot pixels or noise
+        self.max_stars = max_stars
+        self.box = box  # Full-resolution measurement stamp size
+        self.fit = fit  # Refine the catalog with the Gaussian fit
+        self.cell = cell  # Grouping cell size in binned pixels; closer detections merge
+        self.background_interval = background_interval  # Frames between background updates
+        self.min_snr = min_snr
+        self.max_sharpness = max_sharpness
+        self.structure = np.ones((3, 3), dtype=bool)  # 8-connectivity
+        self.frames = 0
+        self.level = None
+        self.noise = None
+        self.row_sum = None  # Preallocated binning buffers
+        self.binned = None
+
+    def luminance(self, image):
+        """2D view to detect on: the green channel of BGR frames, else the frame itself"""
+        return image[..., 1] if image.ndim == 3 else image
+
+    def bin_image(self, image):
+        """2x2 sum of a uint8/uint16 frame, reusing the same buffers every frame"""
+        height, width = image.shape[0] // 2, image.shape[1] // 2
+        dtype = np.uint16 if image.dtype.itemsize == 1 else np.uint32
+        if self.binned is None or self.binned.shape != (height, width) or self.binned.dtype != dtype:
+            self.row_sum = np.empty((height, width * 2), dtype=dtype)
+            self.binned = np.empty((height, width), dtype=dtype)
+            self.level = None
+        image = image[:height * 2, :width * 2]
+        np.add(image[0::2], image[1::2], out=self.row_sum, dtype=dtype)
+        return np.add(self.row_sum[:, 0::2], self.row_sum[:, 1::2], out=self.binned)
+
+    def update_background(self, tiles):
+        """Per-tile background and noise from every 8th pixel of each tile"""
+        rows, cols = tiles.shape[0], tiles.shape[2]
+        sample = tiles[:, ::8, :, ::8].transpose(0, 2, 1, 3).reshape(rows, cols, -1).astype(np.float32)
+        level = np.median(sample, axis=2)
+        noise = 1.4826 * np.median(np.abs(sample - level[:, :, None]), axis=2)
+        self.level = level
+        self.noise = np.maximum(noise, 0.5)
+
+    def detect(self, image):
+        empty = np.zeros(0, dtype=CATALOG_DTYPE)
+        luminance = self.luminance(image)
+        binned = self.bin_image(luminance)
+        if min(binned.shape) < 8:
+            return empty
+        # Tiles of about self.tile pixels that cover the frame to within a few pixels
+        rows = max(1, binned.shape[0] // self.tile)
+        cols = max(1, binned.shape[1] // self.tile)
+        th, tw = binned.shape[0] // rows, binned.shape[1] // cols
+        tiles = binned[:rows * th, :cols * tw].reshape(rows, th, cols, tw)
+
+        if self.level is None or self.level.shape != (rows, cols) or self.frames % self.background_interval == 0:
+            self.update_background(tiles)
+        self.frames += 1
+
+        # Threshold tile by tile; the few pixels past the last tile are ignored
+        limit = (self.level + self.threshold * self.noise)[:, None, :, None]
+        mask = (tiles > limit).reshape(rows * th, cols * tw)
+        index = np.flatnonzero(mask)
+        if len(index) == 0:
+            return empty
+        row, col = np.divmod(index, mask.shape[1])
+
+        # Group the detected pixels: label the coarse cells they fall in
+        cells = np.zeros((-(-rows * th // self.cell), -(-cols * tw // self.cell)), dtype=bool)
+        cells[row // self.cell, col // self.cell] = True
+        cell_labels, count = ndimage.label(cells, structure=self.structure)
+        label = cell_labels[row // self.cell, col // self.cell]
+
+        # Per-component statistics over the detected pixels only
+        signal = binned[row, col] - self.level[row // th, col // tw]
+        npix = np.bincount(label, minlength=count + 1)[1:]
+        flux = np.bincount(label, signal, minlength=count + 1)[1:]
+        keep = np.flatnonzero((npix >= self.min_pixels) & (flux > 0))
+        if len(keep) == 0:
+            return empty
+        keep = keep[np.argsort(flux[keep])[::-1][:self.max_stars]]
+        cx = np.bincount(label, signal * col, minlength=count + 1)[1:][keep] / flux[keep]
+        cy = np.bincount(label, signal * row, minlength=count + 1)[1:][keep] / flux[keep]
+
+        # Binned centroid -> full-resolution pixel, then measure there
+        stars = measure_stars(luminance, cx * 2 + 0.5, cy * 2 + 0.5, box=self.box, fit=self.fit)
+
+        catalog = np.zeros(len(keep), dtype=CATALOG_DTYPE)
+        for name in STAR_DTYPE.names:
+            catalog[name] = stars[name]
+        catalog['npix'] = npix[keep] * 4
+        real = (catalog['snr'] >= self.min_snr) & (catalog['peak'] < self.max_sharpness * catalog['flux'])
+        return catalog[real]
+
+
+if __name__ == '__main__':
+    # Detection speed and completeness on a simulated full 4096x3000 frame
+    import sys
+    import time
+    from camera_backend import SimulatedCamera
+
+    width, height = 4096, 3000
+    if len(sys.argv) > 1:
+        width, height = (int(v) for v in sys.argv[1].split('x'))
+    camera = SimulatedCamera(width=width, height=height, num_stars=40)
+    image = camera.render(0.0, 'Mono8')
+
+    detector = StarDetector()
+    detector.detect(image)
+    start = time.perf_counter()
+    for _ in range(10):
+        catalog = detector.detect(image)
+    elapsed = (time.perf_counter() - start) / 10
+
+    # Match against the stars the simulator drew
+    truth = camera.star_xy
+    distance = np.hypot(catalog['x'][:, None] - truth[None, :, 0], catalog['y'][:, None] - truth[None, :, 1])
+    matched = distance.min(axis=1) < 2
+    print(f"{width}x{height}: {len(catalog)} stars in {elapsed * 1000:.1f} ms/frame, "
+          f"{int(matched.sum())} within 2 px of a simulated star")
+    print(catalog[:5])
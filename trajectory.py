@@ -0,0 +1,192 @@
+import os
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+# One row per recorded position
+TRAJECTORY_DTYPE = np.dtype([
+    ('time', np.float64),  # Unix time, seconds
+    ('x', np.float32),  # Pixels
+    ('y', np.float32),
+    ('motor1', np.int32),  # Motor positions, steps (Alt, Azi): ESP32 telemetry, else commanded
+    ('motor2', np.int32),
+    ('flux', np.float32),
+    ('source', np.uint8),  # GUIDE_STAR or ZOOM_REGION
+])
+
+GUIDE_STAR = 0
+ZOOM_REGION = 1
+
+
+class TrajectoryStore:
+    """
+    Append-only trajectory log on disk with the latest rows in memory.
+
+    Rows go into fixed-size chunk files (chunk_00000.npy, ...) created as
+    memory maps, so appending is O(1), the OS writes the data out as it
+    goes, and a crash loses at most the pages not yet flushed. Unused rows
+    of the last chunk have time 0, which is how a reopened store finds its
+    end. The newest `window` rows are also kept in a ring buffer for the
+    plots and predictors.
+
+    Rows are expected in time order; range() binary-searches the time
+    column of only the chunks that overlap the requested interval.
+    """
+    chunk_size = 65536  # Rows per chunk file (2 MB)
+    flush_interval = 5.0  # Seconds between explicit flushes of the open chunk
+    cached_chunks = 4  # Closed chunks kept mapped for range queries
+
+    def __init__(self, directory, window=4096, readonly=False):
+        self.directory = directory
+        self.readonly = readonly
+        self.ring = np.zeros(window, dtype=TRAJECTORY_DTYPE)
+        self.ring_count = 0  # Rows ever written to the ring
+        self.chunk_times = []  # (first, last) time of every chunk
+        self.chunk = None  # Memory map of the chunk being appended to
+        self.chunk_rows = 0
+        self.cache = OrderedDict()  # chunk index -> read-only memory map
+        self.last_flush = time.time()
+        if not readonly:
+            os.makedirs(directory, exist_ok=True)
+        self.load_index()
+
+    def chunk_path(self, index):
+        return os.path.join(self.directory, f"chunk_{index:05d}.npy")
+
+    def load_index(self):
+        """Find existing chunks and where the last one ends"""
+        index = 0
+        while os.path.exists(self.chunk_path(index)):
+            data = np.load(self.chunk_path(index), mmap_mode='r')
+            used = int(np.argmax(data['time'] == 0)) if data['time'][-1] == 0 else len(data)
+            if used:
+                self.chunk_times.append((float(data['time'][0]), float(data['time'][used - 1])))
+                tail = data[max(0, used - len(self.ring)):used]
+                self.push_ring(tail)
+            else:
+                self.chunk_times.append((np.inf, -np.inf))
+            self.chunk_rows = used
+            index += 1
+        if self.readonly and self.chunk_times:
+            pass  # chunk_rows is where the last chunk ends
+        elif self.chunk_times and self.chunk_rows < self.chunk_size:
+            # Continue filling the last chunk
+            self.chunk = np.load(self.chunk_path(len(self.chunk_times) - 1), mmap_mode='r+')
+        else:
+            self.chunk_rows = self.chunk_size  # Next append starts a new chunk
+
+    def __len__(self):
+        if not self.chunk_times:
+            return 0
+        return (len(self.chunk_times) - 1) * self.chunk_size + self.chunk_rows
+
+    def push_ring(self, rows):
+        for row in rows[-len(self.ring):]:
+            self.ring[self.ring_count % len(self.ring)] = row
+            self.ring_count += 1
+
+    def new_chunk(self):
+        if self.chunk is not None:
+            self.chunk.flush()
+        index = len(self.chunk_times)
+        self.chunk = np.lib.format.open_memmap(self.chunk_path(index), mode='w+',
+                                               dtype=TRAJECTORY_DTYPE, shape=(self.chunk_size,))
+        self.chunk_times.append((np.inf, -np.inf))
+        self.chunk_rows = 0
+
+    def append(self, timestamp, x, y, motor1=0, motor2=0, flux=0.0, source=GUIDE_STAR):
+        """Add one row; timestamp is Unix time"""
+        if self.readonly:
+            raise RuntimeError("Trajectory store is read-only")
+        if self.chunk_rows >= self.chunk_size:
+            self.new_chunk()
+        row = (timestamp, x, y, motor1, motor2, flux, source)
+        self.chunk[self.chunk_rows] = row
+        self.ring[self.ring_count % len(self.ring)] = row
+        self.ring_count += 1
+        first, _ = self.chunk_times[-1]
+        self.chunk_times[-1] = (min(first, timestamp), timestamp)
+        self.chunk_rows += 1
+        if self.chunk_rows % 256 == 0 and time.time() - self.last_flush > self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.chunk is not None:
+            self.chunk.flush()
+        self.last_flush = time.time()
+
+    def close(self):
+        self.flush()
+        self.chunk = None
+        self.cache.clear()
+
+    def recent(self, count=None):
+        """The newest rows (up to the window size), oldest first"""
+        size = len(self.ring)
+        available = min(self.ring_count, size)
+        count = available if count is None else min(count, available)
+        end = self.ring_count % size
+        if count <= end:
+            return self.ring[end - count:end].copy()
+        return np.concatenate([self.ring[size - (count - end):], self.ring[:end]])
+
+    def chunk_data(self, index):
+        """Valid rows of chunk index (a memory-map view, not a copy)"""
+        if index == len(self.chunk_times) - 1 and self.chunk is not None:
+            return self.chunk[:self.chunk_rows]
+        data = self.cache.pop(index, None)
+        if data is None:
+            data = np.load(self.chunk_path(index), mmap_mode='r')
+        self.cache[index] = data
+        while len(self.cache) > self.cached_chunks:
+            self.cache.popitem(last=False)
+        rows = self.chunk_rows if index == len(self.chunk_times) - 1 else self.chunk_size
+        return data[:rows]
+
+    def range(self, start, end, source=None):
+        """Rows with start <= time < end, optionally only one source, as a new array"""
+        parts = []
+        for index, (first, last) in enumerate(self.chunk_times):
+            if last < start or first >= end:
+                continue
+            data = self.chunk_data(index)
+            times = data['time']
+            lo, hi = np.searchsorted(times, [start, end])
+            part = data[lo:hi]
+            if source is not None:
+                part = part[part['source'] == source]
+            parts.append(np.array(part))
+        if not parts:
+            return np.zeros(0, dtype=TRAJECTORY_DTYPE)
+        return np.concatenate(parts)
+
+
+if __name__ == '__main__':
+    # Append and query speed for a multi-hour run (50 Hz for 4 hours = 720k rows)
+    import shutil
+    import tempfile
+
+    directory = tempfile.mkdtemp()
+    try:
+        store = TrajectoryStore(directory)
+        rows = 720000
+        t0 = time.time()
+        start = time.perf_counter()
+        for i in range(rows):
+            store.append(t0 + i * 0.02, i % 100, i % 50, i, -i, 1000.0)
+        elapsed = time.perf_counter() - start
+        print(f"{rows} appends: {elapsed / rows * 1e6:.2f} µs each, {len(store.chunk_times)} chunks")
+
+        start = time.perf_counter()
+        for _ in range(100):
+            hour = store.range(t0 + 3600, t0 + 7200)
+        print(f"1-hour range query: {(time.perf_counter() - start) * 10:.2f} ms, {len(hour)} rows")
+        store.close()
+
+        # A new store on the same directory picks up where the old one ended
+        reopened = TrajectoryStore(directory)
+        print(f"Reopened: {len(reopened)} rows, newest {reopened.recent(1)['time'][0] - t0:.2f} s")
+    finally:
+        shutil.rmtree(directory)
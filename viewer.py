@@ -25,6 +25,7 @@
 # - Real-time image display using QLabel
 # - Camera controls (start/stop acquisition)
 # - Proper resource cleanup
+# - Camera backends: FLIR via PySpin, or the star-field simulator (camera_backend.py)
 #
 # NOTE: PyQt5 or PyQt6 must be installed. Install with: pip install PyQt5
 #
@@ -33,15 +34,18 @@
 # Need help? Check out our forum at: https://teledynevisionsolutions.zendesk.com/hc/en-us/community/topics
 
 import sys
+import time
 import platform
 import numpy as np
-import PySpin
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QPushButton, QMessageBox, QComboBox, 
                              QCheckBox, QGroupBox, QSlider, QSpinBox, QDoubleSpinBox)
-from PyQt5.QtCore import QThread, pyqtSignal, Qt, QMutex
+from PyQt5.QtCore import QThread, pyqtSignal, Qt, QMutex, QSize
 from PyQt5.QtGui import QImage, QPixmap
 
+from camera_backend import PySpin, PySpinCamera, SimulatedCamera, CameraError, CameraTimeout
+from framepool import FramePool
+
 
 class StreamMode:
     """
@@ -65,18 +69,27 @@ else:
 class CameraAcquisitionThread(QThread):
     """
     Worker thread for camera acquisition to avoid blocking the UI.
+
+    Frames are handed to the GUI through a single-slot mailbox: a new frame
+    overwrites one the GUI has not taken yet (counted as dropped), and
+    frame_available is only emitted when the slot was empty, so the event
+    queue never holds more than one notification however slow the display.
+    The camera writes straight into framepool buffers: one being filled,
+    one in the mailbox and one on its way to the screen.
     """
-    image_ready = pyqtSignal(np.ndarray)
+    frame_available = pyqtSignal()  # Collect the frame with take_frame()
     error_occurred = pyqtSignal(str)
     acquisition_started = pyqtSignal()
     acquisition_stopped = pyqtSignal()
     balance_range_available = pyqtSignal(float, float)  # min, max
 
-    def __init__(self, cam):
+    pool_size = 3
+
+    def __init__(self, camera):
         super().__init__()
-        self.cam = cam
+        self.camera = camera  # camera_backend.CameraBackend
+        self.cam = None  # PySpin camera handle, only set for FLIR cameras
         self.is_running = False
-        self.processor = None
         self.nodemap = None
         self.color_mode = True  # True for color, False for mono
         self.mode_mutex = QMutex()  # Mutex to protect color_mode access
@@ -86,6 +99,12 @@ class CameraAcquisitionThread(QThread):
         self.balance_min = 0.0
         self.balance_max = 10.0
         self.balance_channel_names = {}  # Maps our names ('Red', 'Green', 'Blue') to camera's actual names
+        self.frame_mutex = QMutex()  # Protects the mailbox and counters
+        self.latest_frame = None  # framepool.FrameBuffer not yet taken by the GUI
+        self.pool = None  # Created from the first frame, replaced when the frame size or format changes
+        self.produced = 0
+        self.displayed = 0
+        self.dropped = 0  # Overwritten in the mailbox before the GUI took them
 
     def set_stream_mode(self):
         """
@@ -122,58 +141,44 @@ class CameraAcquisitionThread(QThread):
         """
         try:
             # Initialize camera
-            self.cam.Init()
-            
-            # Get nodemap
-            self.nodemap = self.cam.GetNodeMap()
-            
-            # Set stream mode
-            if not self.set_stream_mode():
-                self.error_occurred.emit("Failed to set stream mode")
+            if not self.camera.open():
+                self.error_occurred.emit("Unable to open camera")
                 return False
+            self.cam = getattr(self.camera, 'cam', None)
 
-            # Set buffer handling mode to NewestOnly for live view
-            sNodemap = self.cam.GetTLStreamNodeMap()
-            node_bufferhandling_mode = PySpin.CEnumerationPtr(sNodemap.GetNode('StreamBufferHandlingMode'))
-            if PySpin.IsReadable(node_bufferhandling_mode) and PySpin.IsWritable(node_bufferhandling_mode):
-                node_newestonly = node_bufferhandling_mode.GetEntryByName('NewestOnly')
-                if PySpin.IsReadable(node_newestonly):
-                    node_newestonly_mode = node_newestonly.GetValue()
-                    node_bufferhandling_mode.SetIntValue(node_newestonly_mode)
-
-            # Set acquisition mode to continuous
-            node_acquisition_mode = PySpin.CEnumerationPtr(self.nodemap.GetNode('AcquisitionMode'))
-            if not PySpin.IsReadable(node_acquisition_mode) or not PySpin.IsWritable(node_acquisition_mode):
-                self.error_occurred.emit("Unable to set acquisition mode to continuous")
-                return False
+            if self.cam is not None:
+                # Get nodemap
+                self.nodemap = self.cam.GetNodeMap()
 
-            node_acquisition_mode_continuous = node_acquisition_mode.GetEntryByName('Continuous')
-            if not PySpin.IsReadable(node_acquisition_mode_continuous):
-                self.error_occurred.emit("Unable to set acquisition mode to continuous")
-                return False
+                # Set stream mode
+                if not self.set_stream_mode():
+                    self.error_occurred.emit("Failed to set stream mode")
+                    return False
 
-            acquisition_mode_continuous = node_acquisition_mode_continuous.GetValue()
-            node_acquisition_mode.SetIntValue(acquisition_mode_continuous)
+                self.camera.processor.SetColorProcessing(PySpin.SPINNAKER_COLOR_PROCESSING_ALGORITHM_HQ_LINEAR)
 
-            # Create image processor
-            self.processor = PySpin.ImageProcessor()
-            self.processor.SetColorProcessing(PySpin.SPINNAKER_COLOR_PROCESSING_ALGORITHM_HQ_LINEAR)
+                # Initialize color balance nodes (returns min/max if available)
+                balance_range = self.init_color_balance_nodes()
 
-            # Initialize color balance nodes (returns min/max if available)
-            balance_range = self.init_color_balance_nodes()
-            
-            # Emit signal with balance range info for UI update
-            if balance_range:
-                min_val, max_val = balance_range
-                self.balance_range_available.emit(min_val, max_val)
+                # Emit signal with balance range info for UI update
+                if balance_range:
+                    min_val, max_val = balance_range
+                    self.balance_range_available.emit(min_val, max_val)
+
+            # Free-running continuous acquisition for live view
+            # (the backend already set buffer handling to NewestOnly)
+            self.camera.set_trigger(False)
+            if not self.camera.set_acquisition_mode('Continuous'):
+                self.error_occurred.emit("Unable to set acquisition mode to continuous")
+                return False
 
             # Begin acquisition
-            self.cam.BeginAcquisition()
+            self.camera.begin_acquisition()
             self.is_running = True
             self.acquisition_started.emit()
             return True
 
-        except PySpin.SpinnakerException as ex:
+        except Exception as ex:
             self.error_occurred.emit(f"Error starting acquisition: {ex}")
             return False
 
@@ -367,17 +372,82 @@ class CameraAcquisitionThread(QThread):
         self.balance_mutex.unlock()
         return value
 
+    def fill_buffer(self, frame, image_data):
+        """
+        Make sure image_data ends up in a pool buffer. Normally the camera
+        already wrote it into frame; otherwise (first frame, new size or
+        color mode) the pool is rebuilt and the image copied once.
+        """
+        if frame is not None and image_data is frame.array:
+            return frame
+        if frame is not None:
+            frame.release()
+        if self.pool is None or not self.pool.matches(image_data.shape, image_data.dtype):
+            self.pool = FramePool(image_data.shape, image_data.dtype, self.pool_size)
+        frame = self.pool.acquire()
+        np.copyto(frame.array, image_data)
+        return frame
+
+    def post_frame(self, frame):
+        """
+        Put a frame in the mailbox, replacing (and releasing) one the GUI has
+        not taken yet.
+        """
+        frame.info['received_at'] = time.perf_counter()
+        self.frame_mutex.lock()
+        replaced = self.latest_frame
+        self.latest_frame = frame
+        self.produced += 1
+        if replaced is not None:
+            self.dropped += 1
+        self.frame_mutex.unlock()
+        if replaced is not None:
+            replaced.release()
+        else:
+            self.frame_available.emit()
+
+    def take_frame(self):
+        """
+        Take the newest frame out of the mailbox (GUI thread). The caller
+        owns the returned framepool.FrameBuffer and must release() it.
+        :return: the frame or None if the mailbox is empty
+        """
+        self.frame_mutex.lock()
+        frame = self.latest_frame
+        self.latest_frame = None
+        if frame is not None:
+            self.displayed += 1
+        self.frame_mutex.unlock()
+        return frame
+
+    def counters(self):
+        """
+        :return: (produced, displayed, dropped) frame counts
+        """
+        self.frame_mutex.lock()
+        counts = (self.produced, self.displayed, self.dropped)
+        self.frame_mutex.unlock()
+        return counts
+
     def stop_acquisition(self):
         """
         Stop acquisition and cleanup.
         """
         self.is_running = False
+        # A frame left in the mailbox goes back to the pool
+        self.frame_mutex.lock()
+        frame = self.latest_frame
+        self.latest_frame = None
+        self.frame_mutex.unlock()
+        if frame is not None:
+            frame.release()
         try:
-            if self.cam.IsStreaming():
-                self.cam.EndAcquisition()
-            self.cam.DeInit()
+            self.camera.end_acquisition()
+            self.camera.close()
+            self.cam = None
+            self.nodemap = None
             self.acquisition_stopped.emit()
-        except PySpin.SpinnakerException as ex:
+        except CameraError as ex:
             self.error_occurred.emit(f"Error stopping acquisition: {ex}")
 
     def run(self):
@@ -388,54 +458,31 @@ class CameraAcquisitionThread(QThread):
             return
 
         while self.is_running:
+            frame = None
             try:
-                # Get next image with timeout
-                image_result = self.cam.GetNextImage(1000)
-
-                if image_result.IsIncomplete():
-                    image_result.Release()
-                    continue
-
                 # Get current mode (thread-safe)
                 color_mode = self.get_color_mode()
-                
-                # Convert image based on selected mode
-                if color_mode:
-                    # Convert to RGB8 for color display
-                    try:
-                        # Try RGB8 first (if available)
-                        if hasattr(PySpin, 'PixelFormat_RGB8'):
-                            image_converted = self.processor.Convert(image_result, PySpin.PixelFormat_RGB8)
-                            image_data = image_converted.GetNDArray()
-                            image_converted.Release()
-                        elif hasattr(PySpin, 'PixelFormat_BGR8'):
-                            # Fallback to BGR8
-                            image_converted = self.processor.Convert(image_result, PySpin.PixelFormat_BGR8)
-                            image_data = image_converted.GetNDArray()
-                            image_converted.Release()
-                        else:
-                            # Use original format if no color format available
-                            image_data = image_result.GetNDArray()
-                    except (PySpin.SpinnakerException, AttributeError):
-                        # Fallback to original image format if conversion fails
-                        image_data = image_result.GetNDArray()
-                else:
-                    # Convert to Mono8 for grayscale display
-                    try:
-                        image_converted = self.processor.Convert(image_result, PySpin.PixelFormat_Mono8)
-                        image_data = image_converted.GetNDArray()
-                        image_converted.Release()
-                    except PySpin.SpinnakerException:
-                        # Fallback to original image format if conversion fails
-                        image_data = image_result.GetNDArray()
-
-                # Emit signal with image data
-                self.image_ready.emit(image_data)
-
-                # Release image
-                image_result.Release()
-
-            except PySpin.SpinnakerException as ex:
+
+                # Get next image with timeout, converted for the selected mode
+                # (RGB8 for color display, Mono8 for grayscale display) and
+                # written into a pool buffer when one of the right size is free
+                frame = self.pool.acquire() if self.pool is not None else None
+                image_data = self.camera.get_next_image(1000, "RGB8" if color_mode else "Mono8",
+                                                        frame.array if frame is not None else None)
+                if image_data is None:
+                    if frame is not None:
+                        frame.release()
+                    continue  # Incomplete frame
+
+                self.post_frame(self.fill_buffer(frame, image_data))
+
+            except CameraTimeout:
+                if frame is not None:
+                    frame.release()
+                continue
+            except CameraError as ex:
+                if frame is not None:
+                    frame.release()
                 if self.is_running:  # Only emit error if we're supposed to be running
                     self.error_occurred.emit(f"Error acquiring image: {ex}")
                 break
@@ -451,9 +498,12 @@ class LiveViewWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.system = None
-        self.cam_list = None
-        self.cam = None
+        self.camera_entries = []  # (label, backend factory) for the camera combo box
         self.acquisition_thread = None
+        self.display_geometry_key = None  # (image width, height, label width, height) the geometry was computed for
+        self.display_step = 1
+        self.display_size = None
+        self.display_cost = 0.0  # Smoothed time display_image takes, seconds
         self.init_ui()
         self.init_camera_system()
 
@@ -563,13 +613,19 @@ class LiveViewWindow(QMainWindow):
         
         main_layout.addWidget(self.image_label)
 
-        # Status bar
+        # Status bar, with the frame counters on the right
         self.statusBar().showMessage("Ready")
+        self.frames_label = QLabel("")
+        self.statusBar().addPermanentWidget(self.frames_label)
 
     def init_camera_system(self):
         """
         Initialize the Spinnaker system and detect cameras.
         """
+        if PySpin is None:
+            self.statusBar().showMessage("PySpin not installed - only the simulator is available")
+            self.refresh_cameras()
+            return
         try:
             self.system = PySpin.System.GetInstance()
             version = self.system.GetLibraryVersion()
@@ -585,60 +641,44 @@ class LiveViewWindow(QMainWindow):
         Refresh the list of available cameras.
         """
         try:
-            # Clear existing camera list
-            if self.cam_list:
-                self.cam_list.Clear()
-            
-            # Get camera list
-            self.cam_list = self.system.GetCameras()
-            num_cameras = self.cam_list.GetSize()
-
-            # Update combo box
-            self.camera_combo.clear()
-            if num_cameras == 0:
-                self.camera_combo.addItem("No cameras detected")
-                self.start_button.setEnabled(False)
-            else:
-                for i in range(num_cameras):
-                    cam = self.cam_list[i]
-                    nodemap_tldevice = cam.GetTLDeviceNodeMap()
-                    node_device_serial_number = PySpin.CStringPtr(nodemap_tldevice.GetNode('DeviceSerialNumber'))
-                    device_serial_number = "Unknown"
-                    if PySpin.IsReadable(node_device_serial_number):
-                        device_serial_number = node_device_serial_number.GetValue()
-                    
-                    node_device_model = PySpin.CStringPtr(nodemap_tldevice.GetNode('DeviceModelName'))
-                    device_model = "Unknown"
-                    if PySpin.IsReadable(node_device_model):
-                        device_model = node_device_model.GetValue()
-                    
-                    self.camera_combo.addItem(f"Camera {i}: {device_model} ({device_serial_number})")
-                self.start_button.setEnabled(True)
+            descriptions = PySpinCamera.enumerate()
+        except Exception as ex:
+            descriptions = []
+            QMessageBox.critical(self, "Error", f"Failed to refresh cameras: {ex}")
 
-            self.statusBar().showMessage(f"Found {num_cameras} camera(s)")
+        self.camera_entries = []
+        for i, description in enumerate(descriptions):
+            self.camera_entries.append((f"Camera {i}: {description}", lambda i=i: PySpinCamera(index=i)))
+        # The star-field simulator is always available
+        self.camera_entries.append(("Simulator", SimulatedCamera))
 
-        except PySpin.SpinnakerException as ex:
-            QMessageBox.critical(self, "Error", f"Failed to refresh cameras: {ex}")
+        # Update combo box
+        self.camera_combo.clear()
+        for label, _ in self.camera_entries:
+            self.camera_combo.addItem(label)
+        self.start_button.setEnabled(True)
+
+        self.statusBar().showMessage(f"Found {len(descriptions)} camera(s)")
 
     def start_acquisition(self):
         """
         Start camera acquisition.
         """
-        if self.camera_combo.currentIndex() == -1 or self.cam_list.GetSize() == 0:
+        if self.camera_combo.currentIndex() == -1:
             QMessageBox.warning(self, "Warning", "No camera selected")
             return
 
         try:
-            # Get selected camera
-            cam_index = self.camera_combo.currentIndex()
-            self.cam = self.cam_list[cam_index]
+            # Create the selected camera backend
+            _, factory = self.camera_entries[self.camera_combo.currentIndex()]
+            camera = factory()
 
             # Create and start acquisition thread
-            self.acquisition_thread = CameraAcquisitionThread(self.cam)
+            self.acquisition_thread = CameraAcquisitionThread(camera)
             # Set initial color mode from checkbox
             self.acquisition_thread.set_color_mode(self.color_mode_checkbox.isChecked())
             
-            self.acquisition_thread.image_ready.connect(self.display_image)
+            self.acquisition_thread.frame_available.connect(self.on_frame_available)
             self.acquisition_thread.error_occurred.connect(self.handle_error)
             self.acquisition_thread.acquisition_started.connect(self.on_acquisition_started)
             self.acquisition_thread.acquisition_stopped.connect(self.on_acquisition_stopped)
@@ -647,7 +687,7 @@ class LiveViewWindow(QMainWindow):
             self.acquisition_thread.start()
             self.statusBar().showMessage("Starting acquisition...")
 
-        except PySpin.SpinnakerException as ex:
+        except CameraError as ex:
             QMessageBox.critical(self, "Error", f"Failed to start acquisition: {ex}")
 
     def stop_acquisition(self):
@@ -731,35 +771,73 @@ class LiveViewWindow(QMainWindow):
             else:
                 self.statusBar().showMessage(f"Failed to set {color} balance")
 
+    def on_frame_available(self):
+        """
+        Display the newest frame in the acquisition thread's mailbox.
+        """
+        if self.acquisition_thread is None:
+            return
+        frame = self.acquisition_thread.take_frame()
+        if frame is None:
+            return
+        received_at = frame.info['received_at']  # Read before release: the buffer's info is reset on reuse
+        try:
+            self.display_image(frame.array)
+        finally:
+            frame.release()  # The pixmap holds its own copy
+        latency_ms = (time.perf_counter() - received_at) * 1000
+        produced, displayed, dropped = self.acquisition_thread.counters()
+        self.frames_label.setText(f"Frames: {produced} produced, {displayed} displayed, "
+                                  f"{dropped} dropped | latency {latency_ms:.0f} ms, "
+                                  f"display {self.display_cost * 1000:.1f} ms")
+
+    def update_display_geometry(self, width, height):
+        """
+        Work out how a width x height image is fitted into the label. Only
+        recomputed when the image or label size changes.
+        """
+        key = (width, height, self.image_label.width(), self.image_label.height())
+        if key == self.display_geometry_key:
+            return
+        self.display_geometry_key = key
+        self.display_size = QSize(width, height).scaled(self.image_label.size(), Qt.KeepAspectRatio)
+        # Keep every n-th row and column first so the smooth resample only
+        # sees at most twice the displayed size
+        self.display_step = max(1, min(width // max(self.display_size.width(), 1),
+                                       height // max(self.display_size.height(), 1)))
+
     def display_image(self, image_data):
         """
-        Display image from camera.
+        Display image from camera. The camera delivers RGB8, so the array is
+        wrapped as a QImage without a copy or channel swap; large frames are
+        decimated before the one smooth resample to the label size.
         """
         try:
-            # Convert numpy array to QImage
+            start = time.perf_counter()
             height, width = image_data.shape[:2]
-            
+            self.update_display_geometry(width, height)
+            if self.display_step > 1:
+                step = self.display_step
+                image_data = np.ascontiguousarray(image_data[::step, ::step])
+                height, width = image_data.shape[:2]
+
+            # Wrap the numpy buffer (image_data stays referenced until the pixmap has copied it)
             if len(image_data.shape) == 2:
                 # Grayscale image
-                q_image = QImage(image_data.data, width, height, width, QImage.Format_Grayscale8)
+                q_image = QImage(image_data.data, width, height, image_data.strides[0], QImage.Format_Grayscale8)
             elif len(image_data.shape) == 3:
                 # Color image
                 if image_data.shape[2] == 3:
-                    q_image = QImage(image_data.data, width, height, width * 3, QImage.Format_RGB888).rgbSwapped()
+                    q_image = QImage(image_data.data, width, height, image_data.strides[0], QImage.Format_RGB888)
                 else:
-                    q_image = QImage(image_data.data, width, height, width * 4, QImage.Format_RGBA8888)
+                    q_image = QImage(image_data.data, width, height, image_data.strides[0], QImage.Format_RGBA8888)
             else:
                 return
 
-            # Convert to pixmap and scale to fit label
-            pixmap = QPixmap.fromImage(q_image)
-            scaled_pixmap = pixmap.scaled(
-                self.image_label.size(), 
-                Qt.KeepAspectRatio, 
-                Qt.SmoothTransformation
-            )
-            
-            self.image_label.setPixmap(scaled_pixmap)
+            if q_image.size() != self.display_size:
+                q_image = q_image.scaled(self.display_size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+            self.image_label.setPixmap(QPixmap.fromImage(q_image))
+            self.display_cost = 0.9 * self.display_cost + 0.1 * (time.perf_counter() - start)
 
         except Exception as ex:
             self.statusBar().showMessage(f"Error displaying image: {ex}")
@@ -779,22 +857,7 @@ class LiveViewWindow(QMainWindow):
         if self.acquisition_thread and self.acquisition_thread.isRunning():
             self.stop_acquisition()
             self.acquisition_thread.wait(3000)  # Wait up to 3 seconds
-
-        # Cleanup camera
-        if self.cam:
-            try:
-                if self.cam.IsInitialized():
-                    self.cam.DeInit()
-            except:
-                pass
-            del self.cam
-
-        # Cleanup camera list
-        if self.cam_list:
-            try:
-                self.cam_list.Clear()
-            except:
-                pass
+        # The acquisition thread closes its camera backend on exit
 
         # Cleanup system
         if self.system:
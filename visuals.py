@@ -4,6 +4,10 @@ from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLa
 import pyqtgraph as pg
 from PyQt5 import QtCore
 
+# Images are (row, column[, channel]) arrays as the camera delivers them; with
+# the y axis pointing down, view coordinates are sensor (column, row)
+pg.setConfigOptions(imageAxisOrder='row-major')
+
 class CustomViewBox(pg.ViewBox):
     def __init__(self):
         pg.ViewBox.__init__(self)
@@ -82,6 +86,7 @@ class ImagePlotWidget(QWidget):
         
         # Add image plot with CustomViewBox
         self.image_plot = self.graphics_layout.addPlot(viewBox=custom_vb, enableMouse=False)
+        self.image_plot.invertY(True)
         self.image_item = pg.ImageItem(self.image_data)
         self.image_plot.addItem(self.image_item)
         self.image_plot.addItem(self.ROI1)
@@ -133,6 +138,12 @@ class ImagePlotWidget(QWidget):
         
         bottom_layout.addWidget(self.roi1_image_view, 1)
         bottom_layout.addWidget(self.roi2_image_view, 1)
+
+        # Guiding error over time, below the zoom views
+        self.trajectory_plot = TrajectoryPlot()
+        self.trajectory_plot.setMinimumHeight(120)
+        self.trajectory_plot.setMaximumHeight(200)
+        self.layout.addWidget(self.trajectory_plot)
         
         self.setLayout(self.layout)
         self.setWindowTitle("PyQtGraph RGB Image Widget with Projections")
@@ -149,14 +160,15 @@ class ImagePlotWidget(QWidget):
         roi1_bounds = self.ROI1.getArraySlice(self.image_data, self.image_item)[0]
         roi2_bounds = self.ROI2.getArraySlice(self.image_data, self.image_item)[0]
         
+        # Slices of the frame (views, no copies); ImageView shows them row 0 at the top like the main image
         if roi1_bounds is not None:
             roi1_data = self.image_data[roi1_bounds]
-            # Flip the ROI image vertically
-            self.roi1_image_view.setImage(np.fliplr(roi1_data))
+            if roi1_data.size:  # Empty when the ROI is outside a camera window
+                self.roi1_image_view.setImage(roi1_data)
         if roi2_bounds is not None:
             roi2_data = self.image_data[roi2_bounds]
-            # Flip the ROI image vertically
-            self.roi2_image_view.setImage(np.fliplr(roi2_data))
+            if roi2_data.size:
+                self.roi2_image_view.setImage(roi2_data)
     
     def update_star_crosshair(self, x, y, visible=True):
         """Update the position of the red crosshair showing the tracked star
@@ -195,34 +207,153 @@ class ImagePlotWidget(QWidget):
                 
                 # Check if coordinates are within image bounds
                 if self.image_data is not None:
-                    # Image has been rotated 90° clockwise, so dimensions are swapped
-                    # After rotation: shape[0] is the X dimension (width), shape[1] is the Y dimension (height)
-                    width, height = self.image_data.shape[0], self.image_data.shape[1]
+                    height, width = self.image_data.shape[:2]
                     
-                    # Round to integer pixel coordinates
-                    ix, iy = int(round(x)), int(round(y))
+                    # Array indices under the mouse; the image may be a binned camera
+                    # window placed at its full-frame position
+                    item_point = self.image_item.mapFromParent(mouse_point)
+                    ix, iy = int(round(item_point.x())), int(round(item_point.y()))
                     
                     # Check bounds with tolerance for edge pixels
                     if 0 <= ix < width and 0 <= iy < height:
                         # Get pixel value(s)
-                        # After rotation, indexing is [x, y] not [y, x]
                         if len(self.image_data.shape) == 3:  # Color image
-                            pixel = self.image_data[ix, iy]
+                            pixel = self.image_data[iy, ix]
                             if self.image_data.shape[2] == 3:  # RGB/BGR
                                 pixel_str = f"RGB=({pixel[0]}, {pixel[1]}, {pixel[2]})"
                             else:
                                 pixel_str = f"Value={pixel}"
                         else:  # Grayscale
-                            pixel = self.image_data[ix, iy]
+                            pixel = self.image_data[iy, ix]
                             pixel_str = f"Value={pixel:.0f}" if isinstance(pixel, (np.floating, float)) else f"Value={pixel}"
                         
                         # Update label with both float and integer coords
-                        self.coord_label.setText(f"X={ix}, Y={iy}  |  {pixel_str}")
+                        self.coord_label.setText(f"X={int(round(x))}, Y={int(round(y))}  |  {pixel_str}")
                     else:
                         # Show the coordinates even if outside bounds
-                        self.coord_label.setText(f"X={ix}, Y={iy}  |  Outside image bounds (size: {width}x{height})")
+                        self.coord_label.setText(f"X={int(round(x))}, Y={int(round(y))}  |  Outside image bounds (size: {width}x{height})")
             else:
                 self.coord_label.setText("Hover over image to see coordinates and pixel value")
         except Exception as e:
             # Silently handle any errors to avoid crashing the UI
-            pass
\ No newline at end of file
+            pass
+
+class TrajectoryPlot(pg.PlotWidget):
+    """
+    Time series of guiding errors (or any few values per frame) that stays
+    responsive over hours of data.
+
+    Points go into growable arrays and, every `block` points, into min/max
+    summaries of the finished block, so appending never touches old data.
+    Redraws run from a timer at most max_fps times a second and only when
+    something changed. A redraw shows the visible time range: raw points if
+    there are few enough for the plot width, otherwise the block min/max
+    pairs, merged further so there are about two points per pixel column
+    (peaks and dips of single frames stay visible at any zoom).
+
+    The x range follows all data until the plot is zoomed or panned; the
+    "A" button returns to following.
+    """
+    block = 64  # Points per min/max summary
+
+    def __init__(self, names=("Error X", "Error Y"), colors=('c', 'm'), max_fps=30, parent=None):
+        super().__init__(parent)
+        self.names = names
+        self.setLabel('bottom', "Time (s)")
+        self.setLabel('left', "Guiding error (px)")
+        self.showGrid(x=True, y=True, alpha=0.3)
+        self.addLegend(offset=(5, 5))
+        self.curves = [self.plot(pen=pg.mkPen(color, width=1), name=name) for name, color in zip(names, colors)]
+        self.clear_data()
+
+        # Zooming or panning shows more detail of the new range
+        self.getViewBox().sigXRangeChanged.connect(self.on_range_changed)
+
+        # Redraw at the display refresh rate or max_fps, whichever is lower
+        screen = QApplication.primaryScreen()
+        refresh = screen.refreshRate() if screen is not None else 60.0
+        self.redraw_timer = QtCore.QTimer(self)
+        self.redraw_timer.timeout.connect(self.redraw)
+        self.redraw_timer.start(int(1000 / max(1.0, min(max_fps, refresh))))
+
+    def clear_data(self):
+        n = len(self.names)
+        self.times = np.zeros(4096)
+        self.values = np.zeros((4096, n))
+        self.count = 0
+        self.block_times = np.zeros(64)
+        self.block_min = np.zeros((64, n))
+        self.block_max = np.zeros((64, n))
+        self.blocks = 0
+        self.start_time = None
+        self.dirty = True
+
+    def append(self, timestamp, *values):
+        """Add one point per curve; timestamp in seconds (any clock)"""
+        if self.start_time is None:
+            self.start_time = timestamp
+        if self.count == len(self.times):
+            self.times = np.resize(self.times, 2 * self.count)
+            self.values = np.resize(self.values, (2 * self.count, len(self.names)))
+        self.times[self.count] = timestamp - self.start_time
+        self.values[self.count] = values
+        self.count += 1
+
+        if self.count % self.block == 0:
+            if self.blocks == len(self.block_times):
+                self.block_times = np.resize(self.block_times, 2 * self.blocks)
+                self.block_min = np.resize(self.block_min, (2 * self.blocks, len(self.names)))
+                self.block_max = np.resize(self.block_max, (2 * self.blocks, len(self.names)))
+            block = self.values[self.count - self.block:self.count]
+            self.block_times[self.blocks] = self.times[self.count - self.block // 2]
+            self.block_min[self.blocks] = block.min(axis=0)
+            self.block_max[self.blocks] = block.max(axis=0)
+            self.blocks += 1
+        self.dirty = True
+
+    def following(self):
+        return self.getViewBox().state['autoRange'][0] is not False
+
+    def on_range_changed(self):
+        if not self.following():
+            self.dirty = True
+
+    def display_data(self, start, end, columns):
+        """(x, y) arrays for the points between times start and end, decimated to about 2 per column"""
+        lo, hi = np.searchsorted(self.times[:self.count], [start, end])
+        lo, hi = max(0, lo - 1), min(self.count, hi + 1)
+        if hi - lo <= 2 * columns:
+            return self.times[lo:hi], self.values[lo:hi]
+
+        # Whole blocks from the summaries, the unfinished last block as raw points
+        first, last = lo // self.block, min(-(-hi // self.block), self.blocks)
+        raw_from = max(lo, last * self.block)
+        times = self.block_times[first:last]
+        low, high = self.block_min[first:last], self.block_max[first:last]
+        group = -(-len(times) // columns)
+        if group > 1:
+            starts = np.arange(0, len(times), group)
+            times = times[starts]
+            low = np.minimum.reduceat(low, starts, axis=0)
+            high = np.maximum.reduceat(high, starts, axis=0)
+        # Each group becomes a vertical min-max segment
+        x = np.concatenate([np.repeat(times, 2), self.times[raw_from:hi]])
+        y = np.concatenate([np.stack([low, high], axis=1).reshape(-1, len(self.names)),
+                            self.values[raw_from:hi]])
+        return x, y
+
+    def redraw(self):
+        if not self.dirty or not self.isVisible():
+            return
+        self.dirty = False
+        if self.count == 0:
+            for curve in self.curves:
+                curve.setData([], [])
+            return
+        if self.following():
+            start, end = self.times[0], self.times[self.count - 1]
+        else:
+            start, end = self.getViewBox().viewRange()[0]
+        x, y = self.display_data(start, end, max(100, self.width()))
+        for i, curve in enumerate(self.curves):
+            curve.setData(x, y[:, i])